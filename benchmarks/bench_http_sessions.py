@@ -0,0 +1,113 @@
+"""
+Requests per second of Client.send_post_request against a local http stub, before and after the pooled sessions.
+
+"before" opens a ClientSession per request like Client used to, "after" goes through Client.send_post_request and
+the shared SessionRegistry. The stub runs on its own thread and event loop, so it doesn't compete with the client
+for the loop. It speaks plain http on localhost: real rpc nodes and apis add a TLS handshake (and a proxy one) to
+every new connection, so the gap there is larger than measured here.
+
+Run from the repository root:
+    python -m benchmarks.bench_http_sessions --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable
+
+import aiohttp
+from aiohttp import web
+
+import core  # noqa: F401
+from core import Client
+from core.sessions import sessions
+
+PRIVATE_KEY = "0x" + "11" * 32
+PAYLOAD = {"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []}
+
+
+class StubServer:
+    """
+    Answers every POST with a small json body, from a background thread.
+    """
+
+    def __init__(self) -> None:
+        self.url = None
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    @staticmethod
+    async def _handle(request: web.Request) -> web.Response:
+        await request.read()
+        return web.json_response({"jsonrpc": "2.0", "id": 1, "result": "0x1"})
+
+    async def _start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}/"
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *args) -> None:
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+async def _post_with_new_session(url: str) -> None:
+    # Client.send_post_request before the session registry: a new session, connector and connection per call
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url=url, json=PAYLOAD, timeout=100) as response:
+            response.raise_for_status()
+            await response.json()
+
+
+async def _measure(send: Callable[[], Awaitable], requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await send()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    return requests / (time.perf_counter() - started)
+
+
+async def run(url: str, requests: int, concurrency: int) -> None:
+    client = Client(private_key=PRIVATE_KEY)
+
+    async def post_pooled() -> None:
+        if await client.send_post_request(url=url, data=PAYLOAD, use_proxy=False) is None:
+            raise Exception("request failed")
+
+    before = await _measure(lambda: _post_with_new_session(url), requests=requests, concurrency=concurrency)
+    after = await _measure(post_pooled, requests=requests, concurrency=concurrency)
+    await sessions.close()
+
+    print(f"{requests} POSTs, {concurrency} in flight")
+    print(f"before (session per request): {before:8.0f} req/s")
+    print(f"after (pooled session):       {after:8.0f} req/s ({after / before:.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with StubServer() as stub:
+        asyncio.run(run(url=stub.url, requests=args.requests, concurrency=args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
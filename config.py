@@ -2,15 +2,17 @@
 НАСТРОЙКА СЕТЕЙ
 """
 
-BASE_RPC_ENDPOINT = "https://base-mainnet.public.blastapi.io"
-ETHEREUM_RPC_ENDPOINT = "https://rpc.ankr.com/eth"
-ARBITRUM_RPC_ENDPOINT = "https://rpc.ankr.com/arbitrum"
-OPTIMISM_RPC_ENDPOINT = "https://rpc.ankr.com/optimism"
-ZKSYNC_RPC_ENDPOINT = "https://mainnet.era.zksync.io"
-BSC_RPC_ENDPOINT = "wss://bsc-rpc.publicnode.com"
-POLYGON_RPC_ENDPOINT = "https://1rpc.io/matic"
-LINEA_RPC_ENDPOINT = "https://linea.drpc.org"
-ZKERA_RPC_ENDPOINT = "https://mainnet.era.zksync.io"
+# Список RPC для каждой сети. Запросы идут на самый быстрый и стабильный из них, медленные запросы на чтение
+# дублируются на второй RPC, а RPC, который подряд отвечает ошибками, временно исключается.
+# Можно указывать и websocket RPC (wss://): через них новые блоки приходят сами, без постоянных запросов
+BASE_RPC_ENDPOINTS = ["https://base-mainnet.public.blastapi.io", "https://base.llamarpc.com"]
+ETHEREUM_RPC_ENDPOINTS = ["https://rpc.ankr.com/eth", "https://eth.llamarpc.com"]
+ARBITRUM_RPC_ENDPOINTS = ["https://rpc.ankr.com/arbitrum", "https://arb1.arbitrum.io/rpc"]
+OPTIMISM_RPC_ENDPOINTS = ["https://rpc.ankr.com/optimism", "https://mainnet.optimism.io"]
+BSC_RPC_ENDPOINTS = ["wss://bsc-rpc.publicnode.com", "https://bsc-rpc.publicnode.com", "https://rpc.ankr.com/bsc"]
+POLYGON_RPC_ENDPOINTS = ["https://1rpc.io/matic", "https://polygon-rpc.com"]
+LINEA_RPC_ENDPOINTS = ["https://linea.drpc.org", "https://rpc.linea.build"]
+ZKERA_RPC_ENDPOINTS = ["https://mainnet.era.zksync.io"]
 
 """
 ОБЩИЕ НАСТРОЙКИ
@@ -21,12 +23,37 @@ GAS_THRESHOLD = 15
 # Промежуток времени ожидания между проверками текущего Gwei
 GAS_DELAY_RANGE = [30, 30]
 
-# Промежуток времени ожидания между проверками поступления средств
-WAIT_FOR_DEPOSIT_DELAY_RANGE = [60, 60]
+# Максимальное время ожидания поступления средств на кошелек после вывода (в секундах)
+WAIT_FOR_DEPOSIT_TIMEOUT = 1800
 
 # Диапазон для задержки между транзакциями
 TX_DELAY_RANGE = [10, 15]
 
+# Количество новых блоков без подтверждения, после которого зависшая транзакция отправляется заново с тем же nonce
+# и более высокой комиссией (0 - не заменять зависшие транзакции)
+TX_REPLACEMENT_BLOCKS = 10
+
+# Во сколько раз поднимается комиссия при каждой замене зависшей транзакции (не меньше 1.1)
+TX_REPLACEMENT_FEE_MULTIPLIER = 1.2
+
+# Во сколько раз комиссия замены может максимально превышать изначальную комиссию транзакции
+TX_REPLACEMENT_MAX_FEE_MULTIPLIER = 3
+
+# Максимальное количество кошельков, которые обрабатываются одновременно.
+# При USE_MOBILE_PROXY или MANUAL_TRANSFERS_MODE кошельки всегда обрабатываются по одному
+MAX_CONCURRENT_WALLETS = 10
+
+# Максимальное количество кошельков, которые одновременно отправляют транзакции в одной сети
+MAX_CONCURRENT_WALLETS_PER_CHAIN = 5
+
+# Размер апрува токенов для бриджа (варианты: exact, min, max).
+# exact - ровно сумма бриджа, min - сумма бриджа, но не меньше APPROVAL_MIN_AMOUNT токенов, max - бесконечный апрув.
+# При min и max следующие бриджи этого токена не будут требовать новый апрув
+APPROVAL_POLICY = "exact"
+
+# Минимальный размер апрува в токенах при APPROVAL_POLICY = "min"
+APPROVAL_MIN_AMOUNT = 1000
+
 # Если True, то все бриджи будут только нативными токенами, если False - будут бриджиться только USDC, но самый первый
 # бридж будет из нативного токена в usdc. В вармапе если не было вывода с окх, то будет бридж сразу из usdc.
 # В коллекторе если True - будет собирать нативный токен со всех сетей в FINISH_CHAIN, если False - usdc со всех сетей
@@ -0,0 +1,163 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from eth_typing import ChecksumAddress
+from web3 import AsyncWeb3
+
+from core.models.chain import Chain
+from core.models.token import Token
+from logger import logger
+from .constants import (
+    ARRIVAL_POLL_INTERVAL,
+    ARRIVAL_MAX_LOG_RANGE,
+    ARRIVAL_LOG_ADDRESSES_PER_QUERY,
+    ERC20_TRANSFER_TOPIC,
+)
+from .erc20 import encode_address
+from .heads import heads
+from .multicall import get_balances
+from .providers import get_w3
+
+
+@dataclass
+class PendingArrival:
+    address: ChecksumAddress
+    token: Token
+    initial_balance: float
+    futures: List[asyncio.Future] = field(default_factory=list)
+    checked: bool = False
+
+
+class ChainArrivalWatcher:
+    """
+    Resolves bridge arrivals of every pending wallet on one chain with shared queries per tick:
+    new arrivals and native tokens are checked with one batched balance read, ERC-20 tokens are
+    then followed with one `eth_getLogs` query for `Transfer` events to all pending addresses.
+    A tick follows the shared new heads of the chain, so nothing is asked while the chain has no new block.
+    """
+
+    def __init__(self, chain: Chain, poll_interval: float = ARRIVAL_POLL_INTERVAL) -> None:
+        self.chain = chain
+        self.poll_interval = poll_interval
+        self._pending: Dict[Tuple[ChecksumAddress, str], PendingArrival] = {}
+        self._from_block: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def w3(self) -> AsyncWeb3:
+        return get_w3(chain=self.chain)
+
+    def watch(self, address: ChecksumAddress, token: Token, initial_balance: float) -> asyncio.Future:
+        key = (address, token.symbol)
+        if key not in self._pending:
+            self._pending[key] = PendingArrival(address=address, token=token, initial_balance=initial_balance)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key].futures.append(future)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    def _resolve(self, key: Tuple[ChecksumAddress, str]) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        for future in pending.futures:
+            if not future.done():
+                future.set_result(True)
+
+    async def _check_balances(self, pending: List[PendingArrival]) -> None:
+        balances = await get_balances(chain=self.chain, requests=[(item.address, item.token) for item in pending])
+        for item, balance in zip(pending, balances):
+            item.checked = True
+            if balance is not None and item.token.from_wei(balance) > item.initial_balance:
+                self._resolve((item.address, item.token.symbol))
+
+    async def _check_transfer_logs(self, pending: List[PendingArrival], from_block: int, to_block: int) -> None:
+        token_addresses = list({AsyncWeb3.to_checksum_address(item.token.contract_address) for item in pending})
+        recipients = {"0x" + encode_address(item.address): item for item in pending}
+        topics = list(recipients)
+
+        for i in range(0, len(topics), ARRIVAL_LOG_ADDRESSES_PER_QUERY):
+            logs = await self.w3.eth.get_logs({
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "address": token_addresses,
+                "topics": [ERC20_TRANSFER_TOPIC, None, topics[i:i + ARRIVAL_LOG_ADDRESSES_PER_QUERY]],
+            })
+            for log in logs:
+                item = recipients.get(AsyncWeb3.to_hex(log["topics"][2]))
+                if item is not None and log["address"].lower() == item.token.contract_address.lower():
+                    self._resolve((item.address, item.token.symbol))
+
+    async def _tick(self, latest_block: int) -> None:
+        balance_checks = [item for item in self._pending.values() if item.token.is_native or not item.checked]
+        if balance_checks:
+            await self._check_balances(pending=balance_checks)
+
+        erc20 = [item for item in self._pending.values() if not item.token.is_native and item.checked]
+        if erc20 and self._from_block is not None and self._from_block <= latest_block:
+            from_block = max(self._from_block, latest_block - ARRIVAL_MAX_LOG_RANGE)
+            try:
+                await self._check_transfer_logs(pending=erc20, from_block=from_block, to_block=latest_block)
+            except Exception as e:
+                logger.debug(f"Couldn't query transfer logs on {self.chain.name}, checking balances instead: {e}")
+                await self._check_balances(pending=erc20)
+
+        self._from_block = latest_block + 1
+
+    async def _run(self) -> None:
+        while self._pending:
+            # wallets that stopped waiting (e.g. timed out) are not checked anymore
+            for key, item in list(self._pending.items()):
+                item.futures = [future for future in item.futures if not future.done()]
+                if not item.futures:
+                    del self._pending[key]
+            if not self._pending:
+                break
+
+            # checks run at most every `poll_interval` seconds and only once the chain has a new block
+            checked_block = self._from_block - 1 if self._from_block is not None else None
+            head = await heads.wait_for_block(chain=self.chain, after=checked_block, timeout=self.poll_interval)
+            if head is None:
+                continue
+
+            try:
+                await self._tick(latest_block=head.number)
+            except Exception as e:
+                logger.debug(f"Arrival check failed on {self.chain.name}: {e}")
+            await asyncio.sleep(self.poll_interval)
+        self._from_block = None
+
+
+class ArrivalWatcher:
+    def __init__(self) -> None:
+        self._watchers: Dict[str, ChainArrivalWatcher] = {}
+
+    def _get_watcher(self, chain: Chain) -> ChainArrivalWatcher:
+        if chain.name not in self._watchers:
+            self._watchers[chain.name] = ChainArrivalWatcher(chain=chain)
+        return self._watchers[chain.name]
+
+    async def wait_for_arrival(
+        self,
+        chain: Chain,
+        address: ChecksumAddress,
+        token: Token,
+        initial_balance: float,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Waits until the `token` balance of `address` on `chain` grows above `initial_balance`.
+        Returns False if it didn't happen within `timeout` seconds.
+        """
+        future = self._get_watcher(chain).watch(address=address, token=token, initial_balance=initial_balance)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+
+
+arrival_watcher = ArrivalWatcher()
@@ -1,33 +1,199 @@
-from typing import Dict, Any, Union, Optional
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple, Union, Optional
 
 from ccxt import AuthenticationError
 from ccxt.async_support import okx
 
-from config import WAIT_FOR_DEPOSIT_DELAY_RANGE, OKX_API_KEY, OKX_API_SECRET, OKX_API_PASSWORD
+from config import OKX_API_KEY, OKX_API_SECRET, OKX_API_PASSWORD
 from core.constants import (
     CEX_WITHDRAW_TRIES,
     CEX_WITHDRAW_DELAY_RANGE,
-    CEX_WAIT_FOR_WITHDRAWAL_FINAL_STATUS_ATTEMPTS,
-    CEX_WAIT_FOR_WITHDRAWAL_FINAL_STATUS_DELAY_RANGE
+    CEX_WITHDRAWAL_POLL_INTERVAL,
+    CEX_WITHDRAWAL_FINAL_STATUS_TIMEOUT,
+    OKX_MARKETS_CACHE_PATH,
+    OKX_MARKETS_CACHE_TTL,
+    OKX_SUB_ACCOUNT_CONCURRENCY,
+    OKX_EMPTY_SUB_ACCOUNT_TTL,
+    OKX_SUB_ACCOUNT_LIST_TTL,
 )
-from core.exceptions import WithdrawalCancelledError
+from core.cache import TTLCache
+from core.sessions import sessions
 from logger import logger
 from core import Client
 from utils import sleep, find_token
 
+_EXCHANGE: Optional[okx] = None
+_MARKETS_LOCK = asyncio.Lock()
+
+# (sub-account, currency) pairs known to be empty, so the next sweeps don't ask for them again
+EMPTY_SUB_ACCOUNTS = TTLCache(maxsize=4096, ttl=OKX_EMPTY_SUB_ACCOUNT_TTL)
+SUB_ACCOUNTS_CACHE = TTLCache(maxsize=1, ttl=OKX_SUB_ACCOUNT_LIST_TTL)
+# one sweep per currency at a time, wallets arriving meanwhile reuse its result
+_SWEEP_LOCKS: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+# amounts wallets have checked the funding balance for but not withdrawn yet
+_RESERVED: Dict[str, float] = defaultdict(float)
+
+
+def _get_config() -> Dict[str, Any]:
+    return {
+        "apiKey": OKX_API_KEY,
+        "secret": OKX_API_SECRET,
+        "password": OKX_API_PASSWORD,
+        "enableRateLimit": True,
+        # requests go through the shared keep-alive session, which ccxt leaves open on close()
+        "session": sessions.get_session(),
+    }
+
+
+def _read_markets_cache(file_path: str = OKX_MARKETS_CACHE_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        if time.time() - os.path.getmtime(file_path) > OKX_MARKETS_CACHE_TTL:
+            return None
+        with open(file_path) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_markets_cache(exchange: okx, file_path: str = OKX_MARKETS_CACHE_PATH) -> None:
+    try:
+        with open(file_path, "w") as cache_file:
+            json.dump({"markets": exchange.markets, "currencies": exchange.currencies}, cache_file, default=str)
+    except OSError as e:
+        logger.debug(f"[OKX] Couldn't cache markets: {e}")
+
+
+async def get_exchange() -> okx:
+    """
+    Returns the okx client shared by every wallet: one http session and one rate limiter for the whole process,
+    with markets loaded once (from the disk cache while it's fresh).
+    """
+    global _EXCHANGE
+    if _EXCHANGE is None:
+        _EXCHANGE = okx(config=_get_config())
+
+    if not _EXCHANGE.markets:
+        async with _MARKETS_LOCK:
+            if not _EXCHANGE.markets:
+                cache = _read_markets_cache()
+                if cache is not None:
+                    _EXCHANGE.set_markets(cache["markets"], cache["currencies"])
+                else:
+                    await _EXCHANGE.load_markets()
+                    _write_markets_cache(_EXCHANGE)
+    return _EXCHANGE
+
+
+async def close_exchange() -> None:
+    global _EXCHANGE
+    if _EXCHANGE is not None:
+        await _EXCHANGE.close()
+        _EXCHANGE = None
+
+
+# states of okx withdrawal history records, everything else is still in progress
+OKX_WITHDRAWAL_SUCCESS_STATE = "2"
+OKX_WITHDRAWAL_FAILED_STATES = {"-1": "failed", "-2": "cancelled"}
+OKX_WITHDRAWAL_HISTORY_PAGE_SIZE = 100
+
+
+class WithdrawalTracker:
+    """
+    Waits for the final status of every pending okx withdrawal with one poller.
+
+    Each tick pages through the latest withdrawal history once for all pending `wdId`s, only asks for the ones
+    it didn't reach separately, then wakes the wallets whose withdrawal is final.
+    """
+
+    def __init__(self, poll_interval: float = CEX_WITHDRAWAL_POLL_INTERVAL) -> None:
+        self.poll_interval = poll_interval
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, withdrawal_id: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(withdrawal_id, []).append(future)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    def _resolve(self, withdrawal_id: str, state: str) -> None:
+        if state in OKX_WITHDRAWAL_FAILED_STATES:
+            logger.error(f"[OKX] Withdrawal {withdrawal_id} {OKX_WITHDRAWAL_FAILED_STATES[state]}")
+        for future in self._pending.pop(withdrawal_id, []):
+            if not future.done():
+                future.set_result(state == OKX_WITHDRAWAL_SUCCESS_STATE)
+
+    async def _fetch_states(self, exchange: okx) -> Dict[str, str]:
+        states = {}
+        params = {"limit": str(OKX_WITHDRAWAL_HISTORY_PAGE_SIZE)}
+        # enough pages to reach the oldest pending withdrawal if the history holds nothing else
+        for _ in range(len(self._pending) // OKX_WITHDRAWAL_HISTORY_PAGE_SIZE + 1):
+            page = (await exchange.private_get_asset_withdrawal_history(params=params))["data"]
+            states.update({item["wdId"]: item["state"] for item in page})
+            if len(page) < OKX_WITHDRAWAL_HISTORY_PAGE_SIZE or all(wd_id in states for wd_id in self._pending):
+                break
+            params["after"] = page[-1]["ts"]
+        return states
+
+    async def _tick(self) -> None:
+        exchange = await get_exchange()
+        states = await self._fetch_states(exchange)
+
+        for withdrawal_id in list(self._pending):
+            if withdrawal_id not in states:
+                response = await exchange.private_get_asset_withdrawal_history(params={"wdId": withdrawal_id})
+                if not response["data"]:
+                    continue
+                states[withdrawal_id] = response["data"][0]["state"]
+
+            state = states[withdrawal_id]
+            if state == OKX_WITHDRAWAL_SUCCESS_STATE or state in OKX_WITHDRAWAL_FAILED_STATES:
+                self._resolve(withdrawal_id=withdrawal_id, state=state)
+
+    async def _run(self) -> None:
+        while self._pending:
+            # wallets that stopped waiting (e.g. timed out) are not polled anymore
+            for withdrawal_id, futures in list(self._pending.items()):
+                self._pending[withdrawal_id] = [future for future in futures if not future.done()]
+                if not self._pending[withdrawal_id]:
+                    del self._pending[withdrawal_id]
+            if not self._pending:
+                break
+
+            try:
+                await self._tick()
+            except Exception as e:
+                logger.error(f"[OKX] Couldn't fetch withdrawal history: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def wait_for_final_status(
+        self, withdrawal_id: str, timeout: Optional[float] = CEX_WITHDRAWAL_FINAL_STATUS_TIMEOUT
+    ) -> bool:
+        try:
+            return await asyncio.wait_for(self.watch(withdrawal_id), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+
+
+withdrawal_tracker = WithdrawalTracker()
+
 
 class Okx:
     def __init__(self, client: Client) -> None:
         self.client = client
-        self.exchange = okx(config=self._get_config())
-
-    def _get_config(self) -> Dict[str, Any]:
-        return {
-            "apiKey": OKX_API_KEY,
-            "secret": OKX_API_SECRET,
-            "password": OKX_API_PASSWORD,
-            "enableRateLimit": True,
-        }
+        self._reserved: Optional[Tuple[str, float]] = None
+
+    def _release_reservation(self) -> None:
+        if self._reserved is not None:
+            symbol, amount = self._reserved
+            _RESERVED[symbol] -= amount
+            self._reserved = None
 
     async def withdraw(
         self,
@@ -37,66 +203,68 @@ class Okx:
     ) -> bool:
         token = find_token(tokens=self.client.chain.tokens, symbol=self.client.chain.coin_symbol)
         logger.info(f"[OKX] Trying to withdraw {amount} {token.symbol.upper()} to {self.client.chain.name.upper()}")
-        async with self.exchange as exchange:
-            try:
-                initial_balance = await self.client.get_token_balance(token)
-
-                withdrawal_data = await exchange.withdraw(
-                    code=token.symbol.upper(),
-                    amount=amount,
-                    address=self.client.address,
-                    params={
-                        "toAddress": self.client.address,
-                        "chainName": f"{token.symbol.upper()}-{self.client.chain.okx_chain_name}",
-                        "dest": 4,
-                        "fee": self.client.chain.okx_withdrawal_fee,
-                        "pwd": "-",
-                        "amt": amount,
-                        "network": self.client.chain.okx_chain_name,
-                    },
+        try:
+            exchange = await get_exchange()
+            initial_balance = await self.client.get_token_balance(token)
+
+            withdrawal_data = await exchange.withdraw(
+                code=token.symbol.upper(),
+                amount=amount,
+                address=self.client.address,
+                params={
+                    "toAddress": self.client.address,
+                    "chainName": f"{token.symbol.upper()}-{self.client.chain.okx_chain_name}",
+                    "dest": 4,
+                    "fee": self.client.chain.okx_withdrawal_fee,
+                    "pwd": "-",
+                    "amt": amount,
+                    "network": self.client.chain.okx_chain_name,
+                },
+            )
+
+            withdrawal_id = withdrawal_data["info"]["wdId"]
+            self._release_reservation()
+        except Exception as e:
+            error_message = str(e)
+            if (
+                "Withdrawal address is not allowlisted for verification exemption"
+                in error_message
+            ):
+                logger.error(f"[OKX] Address {self.client} is not allowlisted")
+            elif "Insufficient balance" in error_message:
+                logger.error(f"[OKX] Insufficient funds for withdrawal")
+            else:
+                logger.error(
+                    f"[OKX] Error while withdrawing {amount} {token.symbol} to {self.client}: {error_message}"
                 )
 
-                withdrawal_id = withdrawal_data["info"]["wdId"]
-            except Exception as e:
-                error_message = str(e)
-                if (
-                    "Withdrawal address is not allowlisted for verification exemption"
-                    in error_message
-                ):
-                    logger.error(f"[OKX] Address {self.client} is not allowlisted")
-                elif "Insufficient balance" in error_message:
-                    logger.error(f"[OKX] Insufficient funds for withdrawal")
-                else:
-                    logger.error(
-                        f"[OKX] Error while withdrawing {amount} {token.symbol} to {self.client}: {error_message}"
-                    )
-
-                if retry_count < CEX_WITHDRAW_TRIES:
-                    logger.info(
-                        f"[OKX] Withdrawal unsuccessful, waiting for the next try"
-                    )
-                    await sleep(
-                        delay_range=CEX_WITHDRAW_DELAY_RANGE, send_message=False
-                    )
-                    return await self.withdraw(
-                        retry_count=retry_count + 1, amount=amount
-                    )
-                else:
-                    logger.error(
-                        f"[OKX] Withdrawal failed, attempt limit exceeded: {e}"
-                    )
-                    return False
-            if wait_for_funds:
-                tokens_delivered = await self._watch_for_delivery(
-                    withdrawal_id=withdrawal_id, initial_balance=initial_balance
+            if retry_count < CEX_WITHDRAW_TRIES:
+                logger.info(
+                    f"[OKX] Withdrawal unsuccessful, waiting for the next try"
+                )
+                await sleep(
+                    delay_range=CEX_WITHDRAW_DELAY_RANGE, send_message=False, label="okx"
+                )
+                return await self.withdraw(
+                    retry_count=retry_count + 1, amount=amount
                 )
-                if tokens_delivered:
-                    logger.success(
-                        f"[OKX] Successfully withdrew {amount} {token.symbol}"
-                    )
-                    return True
+            else:
+                logger.error(
+                    f"[OKX] Withdrawal failed, attempt limit exceeded: {e}"
+                )
+                self._release_reservation()
                 return False
-            return True
+        if wait_for_funds:
+            tokens_delivered = await self._watch_for_delivery(
+                withdrawal_id=withdrawal_id, initial_balance=initial_balance
+            )
+            if tokens_delivered:
+                logger.success(
+                    f"[OKX] Successfully withdrew {amount} {token.symbol}"
+                )
+                return True
+            return False
+        return True
 
     async def _watch_for_delivery(
         self, withdrawal_id: str, initial_balance: Union[int, float]
@@ -104,94 +272,114 @@ class Okx:
         withdrawal_finalized = await self._wait_for_withdrawal_final_status(
             withdrawal_id=withdrawal_id
         )
-        withdrawal_received = await self.client.wait_for_deposit(
-            initial_balance=initial_balance,
-            checkup_sleep_time_range=WAIT_FOR_DEPOSIT_DELAY_RANGE
-        )
-        return withdrawal_finalized and withdrawal_received
+        if not withdrawal_finalized:
+            return False
+        return await self.client.wait_for_deposit(initial_balance=initial_balance)
 
     async def _wait_for_withdrawal_final_status(self, withdrawal_id: str) -> bool:
-        attempt_count = 1
         logger.info(f"[OKX] Waiting for withdrawal final status")
-        while attempt_count < CEX_WAIT_FOR_WITHDRAWAL_FINAL_STATUS_ATTEMPTS:
-            async with self.exchange as exchange:
-                try:
-                    status = await exchange.private_get_asset_deposit_withdraw_status(
-                        params={"wdId": withdrawal_id}
-                    )
-
-                    if "Cancelation complete" in status["data"][0]["state"]:
-                        raise WithdrawalCancelledError
-                    if "Withdrawal complete" not in status["data"][0]["state"]:
-                        attempt_count += 1
-                        await sleep(
-                            delay_range=CEX_WAIT_FOR_WITHDRAWAL_FINAL_STATUS_DELAY_RANGE,
-                            send_message=False,
-                            pr_bar=False,
-                        )
-                    else:
-                        logger.info("[OKX] Withdrawal sent from OKX")
-                        return True
-                except Exception as e:
-                    logger.error(f"[OKX] {e}")
-                    return False
-        logger.error(f"[OKX] Max attempts reached. Withdrawal status not finalized")
+        if await withdrawal_tracker.wait_for_final_status(withdrawal_id=withdrawal_id):
+            logger.info("[OKX] Withdrawal sent from OKX")
+            return True
+        logger.error(f"[OKX] Withdrawal status not finalized")
         return False
 
+    async def _get_funding_balance(self, symbol: str) -> float:
+        exchange = await get_exchange()
+        data = await exchange.private_get_asset_balances(params={"ccy": symbol})
+        return float(data["data"][0]["availBal"]) if data["data"] else 0.0
+
+    async def _get_sub_accounts(self) -> List[str]:
+        sub_accounts = SUB_ACCOUNTS_CACHE.get("sub_accounts")
+        if sub_accounts is None:
+            exchange = await get_exchange()
+            response = await exchange.private_get_users_subaccount_list()
+            sub_accounts = [sub_acc["subAcct"] for sub_acc in response["data"]]
+            SUB_ACCOUNTS_CACHE.set("sub_accounts", sub_accounts)
+        return sub_accounts
+
     async def _transfer_from_sub_account(self, name, symbol: str) -> bool:
-        async with self.exchange as exchange:
-            try:
-                data = await exchange.private_get_asset_subaccount_balances(
-                    params={"subAcct": name, "ccy": symbol}
-                )
-                amount = data["data"][0]["availBal"]
-            except Exception as e:
-                logger.error(f"[OKX] Failed to fetch sub-account's balances: {e}")
-                return False
+        try:
+            exchange = await get_exchange()
+            data = await exchange.private_get_asset_subaccount_balances(
+                params={"subAcct": name, "ccy": symbol}
+            )
+            amount = data["data"][0]["availBal"] if data["data"] else "0"
+        except Exception as e:
+            logger.error(f"[OKX] Failed to fetch sub-account's balances: {e}")
+            return False
 
-            if amount != "0":
-                await exchange.load_markets()
-                currency = exchange.currency(symbol)
-
-                data = {
-                    "ccy": currency["id"],
-                    "amt": exchange.currency_to_precision(symbol, amount),
-                    "from": "6",
-                    "to": "6",
-                    "type": "2",
-                    "subAcct": name,
-                }
-                try:
-                    await exchange.private_post_asset_transfer(data)
-                    logger.info(
-                        f"[OKX] Withdrew {amount} {symbol} from sub-account with name {name} to main account successfully"
-                    )
-                    return True
-                except Exception as e:
-                    error_message = str(e)
-                    if "Parameter amt  error" in error_message:
-                        logger.debug(
-                            f"[OKX] Balance of sub-account {name} is too small"
-                        )
-                        return True
-                    else:
-                        logger.error(
-                            f"Couldn't withdraw {symbol} from sub-account with name {name} to main account: {e}"
-                        )
-                        return False
-
-    async def transfer_from_sub_accounts(self, symbol: str = "ETH") -> bool:
-        async with self.exchange as exchange:
-            try:
-                response = await exchange.private_get_users_subaccount_list()
-                sub_accounts = response["data"]
+        if float(amount) == 0:
+            EMPTY_SUB_ACCOUNTS.set((name, symbol), True)
+            return True
 
-                for sub_acc in sub_accounts:
-                    await self._transfer_from_sub_account(sub_acc["subAcct"], symbol)
+        currency = exchange.currency(symbol)
+
+        data = {
+            "ccy": currency["id"],
+            "amt": exchange.currency_to_precision(symbol, amount),
+            "from": "6",
+            "to": "6",
+            "type": "2",
+            "subAcct": name,
+        }
+        try:
+            await exchange.private_post_asset_transfer(data)
+            logger.info(
+                f"[OKX] Withdrew {amount} {symbol} from sub-account with name {name} to main account successfully"
+            )
+            EMPTY_SUB_ACCOUNTS.set((name, symbol), True)
+            return True
+        except Exception as e:
+            error_message = str(e)
+            if "Parameter amt  error" in error_message:
+                logger.debug(
+                    f"[OKX] Balance of sub-account {name} is too small"
+                )
+                EMPTY_SUB_ACCOUNTS.set((name, symbol), True)
                 return True
-            except AuthenticationError:
-                logger.error(f"[OKX] Invalid OK-ACCESS-KEY")
-                return False
-            except Exception as e:
-                logger.error(f"[OKX] Couldn't withdraw from from sub-accounts: {e}")
+            else:
+                logger.error(
+                    f"Couldn't withdraw {symbol} from sub-account with name {name} to main account: {e}"
+                )
                 return False
+
+    async def transfer_from_sub_accounts(self, symbol: str = "ETH", amount: Optional[float] = None) -> bool:
+        """
+        Moves `symbol` from every sub-account to the funding account of the main one.
+
+        With `amount` the sweep is skipped while the funding balance still covers it on top of the withdrawals
+        other wallets are about to make, and `amount` is reserved until this wallet's withdrawal is submitted.
+        Sub-accounts are swept concurrently, and the ones found empty are not asked again for a while.
+        """
+        try:
+            needed = None
+            if amount is not None:
+                needed = amount + float(self.client.chain.okx_withdrawal_fee)
+
+            async with _SWEEP_LOCKS[symbol]:
+                if needed is not None and await self._get_funding_balance(symbol) >= _RESERVED[symbol] + needed:
+                    logger.debug(f"[OKX] Funding balance covers the withdrawal, sub-accounts are not swept")
+                else:
+                    sub_accounts = [
+                        name for name in await self._get_sub_accounts() if (name, symbol) not in EMPTY_SUB_ACCOUNTS
+                    ]
+                    semaphore = asyncio.Semaphore(OKX_SUB_ACCOUNT_CONCURRENCY)
+
+                    async def sweep(name: str) -> bool:
+                        async with semaphore:
+                            return await self._transfer_from_sub_account(name=name, symbol=symbol)
+
+                    await asyncio.gather(*[sweep(name) for name in sub_accounts])
+
+                if needed is not None:
+                    self._release_reservation()
+                    self._reserved = (symbol, needed)
+                    _RESERVED[symbol] += needed
+            return True
+        except AuthenticationError:
+            logger.error(f"[OKX] Invalid OK-ACCESS-KEY")
+            return False
+        except Exception as e:
+            logger.error(f"[OKX] Couldn't withdraw from from sub-accounts: {e}")
+            return False
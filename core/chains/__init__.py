@@ -5,4 +5,12 @@ from .ethereum import ETHEREUM_CHAIN
 from .linea import LINEA_CHAIN
 from .optimism import OPTIMISM_CHAIN
 from .polygon import POLYGON_CHAIN
-from .zkera import ZKERA_CHAIN
\ No newline at end of file
+from .zkera import ZKERA_CHAIN
+
+# every supported chain by name, built once at import
+CHAINS = {
+    chain.name: chain
+    for chain in (
+        ARBITRUM_CHAIN, BASE_CHAIN, BSC_CHAIN, OPTIMISM_CHAIN, POLYGON_CHAIN, LINEA_CHAIN, ZKERA_CHAIN, ETHEREUM_CHAIN
+    )
+}
@@ -1,5 +1,5 @@
-from config import ARBITRUM_RPC_ENDPOINT
-from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS
+from config import ARBITRUM_RPC_ENDPOINTS
+from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS, MULTICALL3_ADDRESS
 from core.models.chain import Chain
 from core.models.enums import ChainName, TokenName, TokenPriceApiId
 from core.models.token import Token
@@ -29,8 +29,10 @@ ARBITRUM_CHAIN = Chain(
     chain_id=42161,
     coin_symbol=TokenName.ETH.value,
     explorer="https://arbiscan.io/",
-    rpc=ARBITRUM_RPC_ENDPOINT,
+    rpcs=ARBITRUM_RPC_ENDPOINTS,
     okx_chain_name="Arbitrum One",
     okx_withdrawal_fee="0.0001",
-    tokens={ETH_TOKEN.symbol: ETH_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN}
+    tokens={ETH_TOKEN.symbol: ETH_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN},
+    eip1559=True,
+    multicall_address=MULTICALL3_ADDRESS
 )
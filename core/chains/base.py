@@ -1,5 +1,5 @@
-from config import BASE_RPC_ENDPOINT
-from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS
+from config import BASE_RPC_ENDPOINTS
+from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS, MULTICALL3_ADDRESS
 from core.models.chain import Chain
 from core.models.enums import ChainName, TokenName, TokenPriceApiId
 from core.models.token import Token
@@ -28,8 +28,10 @@ BASE_CHAIN = Chain(
     chain_id=8453,
     coin_symbol=TokenName.ETH.value,
     explorer="https://basescan.org/",
-    rpc=BASE_RPC_ENDPOINT,
+    rpcs=BASE_RPC_ENDPOINTS,
     okx_chain_name="Base",
     okx_withdrawal_fee="0.00004",
-    tokens={ETH_TOKEN.symbol: ETH_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN}
+    tokens={ETH_TOKEN.symbol: ETH_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN},
+    eip1559=True,
+    multicall_address=MULTICALL3_ADDRESS
 )
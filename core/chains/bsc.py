@@ -1,5 +1,5 @@
-from config import BSC_RPC_ENDPOINT
-from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS
+from config import BSC_RPC_ENDPOINTS
+from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS, MULTICALL3_ADDRESS
 from core.models.chain import Chain
 from core.models.enums import ChainName, TokenName, TokenPriceApiId
 from core.models.token import Token
@@ -28,8 +28,9 @@ BSC_CHAIN = Chain(
     chain_id=56,
     coin_symbol=TokenName.BNB.value,
     explorer="https://bscscan.com/",
-    rpc=BSC_RPC_ENDPOINT,
+    rpcs=BSC_RPC_ENDPOINTS,
     okx_chain_name="BSC",
     okx_withdrawal_fee="0.002",
-    tokens={BNB_TOKEN.symbol: BNB_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN}
+    tokens={BNB_TOKEN.symbol: BNB_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN},
+    multicall_address=MULTICALL3_ADDRESS
 )
@@ -1,5 +1,5 @@
-from config import ETHEREUM_RPC_ENDPOINT
-from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS
+from config import ETHEREUM_RPC_ENDPOINTS
+from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS, MULTICALL3_ADDRESS
 from core.models.chain import Chain
 from core.models.enums import TokenName, TokenPriceApiId, ChainName
 from core.models.token import Token
@@ -28,9 +28,11 @@ ETHEREUM_CHAIN = Chain(
     chain_id=1,
     coin_symbol=TokenName.ETH.value,
     explorer="https://etherscan.io/",
-    rpc=ETHEREUM_RPC_ENDPOINT,
+    rpcs=ETHEREUM_RPC_ENDPOINTS,
     tokens={ETH_TOKEN.symbol: ETH_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN},
     okx_withdrawal_fee="0.0008",
-    okx_chain_name="ERC20"
+    okx_chain_name="ERC20",
+    eip1559=True,
+    multicall_address=MULTICALL3_ADDRESS
 )
 
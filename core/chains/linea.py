@@ -1,5 +1,5 @@
-from config import LINEA_RPC_ENDPOINT
-from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS
+from config import LINEA_RPC_ENDPOINTS
+from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS, MULTICALL3_ADDRESS
 from core.models.chain import Chain
 from core.models.enums import TokenName, TokenPriceApiId, ChainName
 from core.models.token import Token
@@ -28,8 +28,10 @@ LINEA_CHAIN = Chain(
     chain_id=59144,
     coin_symbol=TokenName.ETH.value,
     explorer="https://lineascan.build/",
-    rpc=LINEA_RPC_ENDPOINT,
+    rpcs=LINEA_RPC_ENDPOINTS,
     tokens={ETH_TOKEN.symbol: ETH_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN},
     okx_withdrawal_fee="0.0002",
-    okx_chain_name="Linea"
+    okx_chain_name="Linea",
+    eip1559=True,
+    multicall_address=MULTICALL3_ADDRESS
 )
@@ -1,5 +1,5 @@
-from config import POLYGON_RPC_ENDPOINT
-from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS
+from config import POLYGON_RPC_ENDPOINTS
+from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS, MULTICALL3_ADDRESS
 from core.models.chain import Chain
 from core.models.enums import ChainName, TokenName, TokenPriceApiId
 from core.models.token import Token
@@ -28,8 +28,10 @@ POLYGON_CHAIN = Chain(
     chain_id=137,
     coin_symbol=TokenName.MATIC.value,
     explorer="https://polygonscan.com/",
-    rpc=POLYGON_RPC_ENDPOINT,
+    rpcs=POLYGON_RPC_ENDPOINTS,
     okx_chain_name="Polygon",
     okx_withdrawal_fee="0.1",
-    tokens={MATIC_TOKEN.symbol: MATIC_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN}
+    tokens={MATIC_TOKEN.symbol: MATIC_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN},
+    eip1559=True,
+    multicall_address=MULTICALL3_ADDRESS
 )
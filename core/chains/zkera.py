@@ -1,5 +1,5 @@
-from config import ZKERA_RPC_ENDPOINT
-from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS
+from config import ZKERA_RPC_ENDPOINTS
+from core.constants import ERC20_CONTRACT_ABI, ZERO_ADDRESS, MULTICALL3_ZKSYNC_ADDRESS
 from core.models.chain import Chain
 from core.models.enums import TokenName, TokenPriceApiId, ChainName
 from core.models.token import Token
@@ -28,8 +28,9 @@ ZKERA_CHAIN = Chain(
     chain_id=324,
     coin_symbol=TokenName.ETH.value,
     explorer="https://explorer.zksync.io/",
-    rpc=ZKERA_RPC_ENDPOINT,
+    rpcs=ZKERA_RPC_ENDPOINTS,
     tokens={ETH_TOKEN.symbol: ETH_TOKEN, USDC_TOKEN.symbol: USDC_TOKEN},
     okx_withdrawal_fee="0.000041",
-    okx_chain_name="zkSync Era"
+    okx_chain_name="zkSync Era",
+    multicall_address=MULTICALL3_ZKSYNC_ADDRESS
 )
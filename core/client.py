@@ -1,33 +1,50 @@
-import asyncio
 import binascii
 import random
 import re
 import sys
+from functools import lru_cache
 from typing import Any, Dict, Iterable, List, Optional, Union
 
 import aiohttp
-from aiohttp_proxy import ProxyConnector
 from eth_account import Account
 from eth_typing import ChecksumAddress
 from hexbytes import HexBytes
 from web3 import AsyncWeb3
-from web3.contract.async_contract import AsyncContract
+from web3.types import TxReceipt
 
-from config import TX_DELAY_RANGE
 from core.models.token import Token
 from logger import logger
-from utils import sleep, find_token
+from utils import find_token
 
+from config import APPROVAL_POLICY, APPROVAL_MIN_AMOUNT, WAIT_FOR_DEPOSIT_TIMEOUT
 from core.models.chain import Chain
 from .constants import (
+    MAX_UINT256,
     GAS_LIMIT_MULTIPLIER,
     GAS_PRICE_MULTIPLIER,
     PROXY_PATTERN,
     TOKEN_PRICE_FETCH_URL,
     VERIFY_TX_TIMEOUT,
 )
+from .arrivals import arrival_watcher
 from .decorators import retry_on_fail
-from .exceptions import NoRPCEndpointSpecifiedError
+from .erc20 import get_erc20
+from .gas import gas_oracle
+from .multicall import get_balances
+from .nonce import nonce_manager, is_already_known, is_nonce_error, is_nonce_too_low
+from .providers import get_w3
+from .lifecycle import tx_manager
+from .receipts import TX_CONFIRMED, TX_PENDING, TX_REPLACED, TX_DROPPED
+from .sessions import sessions
+from .storage import get_storage
+
+
+PROXY_REGEX = re.compile(pattern=PROXY_PATTERN)
+
+
+@lru_cache(maxsize=None)
+def _derive_address(private_key: str) -> ChecksumAddress:
+    return AsyncWeb3.to_checksum_address(value=Account.from_key(private_key=private_key).address)
 
 
 class Client:
@@ -36,9 +53,7 @@ class Client:
         self.chain: Optional[Chain] = chain
         self.proxy: str = self._set_proxy(proxy=proxy)
         self.w3: Optional[AsyncWeb3] = self._init_w3(chain=chain)
-        self.address: ChecksumAddress = AsyncWeb3.to_checksum_address(
-            value=Account.from_key(private_key=private_key).address
-        )
+        self.address: ChecksumAddress = _derive_address(private_key=private_key)
 
     def __str__(self):
         return self.address
@@ -46,21 +61,14 @@ class Client:
     def _set_proxy(self, proxy: str) -> Optional[str]:
         if proxy is None:
             return None
-        pattern = re.compile(pattern=PROXY_PATTERN)
-        if pattern.match(proxy):
+        if PROXY_REGEX.match(proxy):
             return proxy
         logger.error(f"Invalid proxy format. The correct format is 'username:password@ip_address:port'.")
         sys.exit(1)
 
-    def _get_proxy_connector(self) -> Optional[ProxyConnector]:
-        if self.proxy:
-            proxy_url = f"http://{self.proxy}"
-            return ProxyConnector.from_url(url=proxy_url)
-        return None
-
     def _set_private_key(self, private_key: str) -> str:
         try:
-            Account.from_key(private_key=private_key)
+            _derive_address(private_key=private_key)
             return private_key
         except binascii.Error:
             logger.error(f"Private key `{private_key}` is not a valid hex string.")
@@ -70,22 +78,18 @@ class Client:
             sys.exit(1)
 
     def _init_w3(self, chain: Chain) -> Optional[AsyncWeb3]:
-        if self.proxy:
-            request_kwargs = {"proxy": f"http://{self.proxy}"}
-        else:
-            request_kwargs = {}
-
         if chain is None:
             return None
 
         try:
-            if not chain.rpc:
-                raise NoRPCEndpointSpecifiedError(chain=chain)
-            return AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(endpoint_uri=chain.rpc, request_kwargs=request_kwargs))
+            return get_w3(chain=chain, proxy=self.proxy)
         except Exception as e:
             logger.error(e)
             sys.exit(1)
 
+    def _get_session(self, use_proxy: bool = True) -> aiohttp.ClientSession:
+        return sessions.get_session(proxy=self.proxy if use_proxy else None)
+
     @retry_on_fail()
     async def send_get_request(
             self,
@@ -94,17 +98,12 @@ class Client:
             headers: dict = None,
             use_proxy: bool = True
     ) -> Optional[Any]:
-        if use_proxy:
-            connector = self._get_proxy_connector()
-        else:
-            connector = None
-
         try:
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(url=url, params=params, headers=headers, timeout=100) as response:
-                    response.raise_for_status()
-                    json_data = await response.json(content_type=None)
-                    return json_data
+            session = self._get_session(use_proxy=use_proxy)
+            async with session.get(url=url, params=params, headers=headers, timeout=100) as response:
+                response.raise_for_status()
+                json_data = await response.json(content_type=None)
+                return json_data
         except aiohttp.ClientResponseError as e:
             logger.error(f"Recieved non-200 response: {e}")
         except aiohttp.ClientConnectionError as e:
@@ -123,16 +122,11 @@ class Client:
             use_proxy: bool = True,
             headers: dict = None,
     ) -> Optional[Any]:
-        if use_proxy:
-            connector = self._get_proxy_connector()
-        else:
-            connector = None
-
         try:
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.post(url=url, json=data, timeout=100, headers=headers) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            session = self._get_session(use_proxy=use_proxy)
+            async with session.post(url=url, json=data, timeout=100, headers=headers) as response:
+                response.raise_for_status()
+                return await response.json()
         except aiohttp.ClientResponseError as e:
             logger.error(f"Recieved non-200 response: {e}")
         except aiohttp.ClientConnectionError as e:
@@ -170,23 +164,25 @@ class Client:
         from_: Optional[str] = None,
         value: Optional[int] = None,
         gas_price_multiplier: float = GAS_PRICE_MULTIPLIER,
+        nonce: Optional[int] = None,
     ) -> Dict[str, Union[str, int]]:
         if not from_:
             from_ = self.address
 
         tx_params: Dict[str, Union[str, int]] = {
-            "chainId": await self.w3.eth.chain_id,
-            "nonce": await self.w3.eth.get_transaction_count(self.address),
+            "chainId": self.chain.chain_id,
             "from": self.w3.to_checksum_address(from_),
             "to": self.w3.to_checksum_address(to),
         }
 
+        if nonce is not None:
+            tx_params["nonce"] = nonce
         if data:
             tx_params["data"] = data
         if value is not None:
             tx_params["value"] = value
 
-        tx_params["gasPrice"] = int(await self.w3.eth.gas_price * gas_price_multiplier)
+        tx_params.update(await gas_oracle.get_fee_params(chain=self.chain, gas_price_multiplier=gas_price_multiplier))
         return tx_params
 
     async def send_transaction(
@@ -212,6 +208,9 @@ class Client:
 
         Note:
         This method signs and sends an Ethereum transaction using the specified parameters.
+        The nonce is assigned locally by the nonce manager. The transaction is signed once and never sent again
+        with another nonce: a node that already knows it counts as a successful broadcast, and so does
+        "nonce too low" if the node finds the transaction by its hash.
         """
         tx_params = await self.get_tx_params(to=to, data=data, from_=from_, value=value)
         gas = await self.get_gas_estimate(tx_params=tx_params)
@@ -220,14 +219,45 @@ class Client:
             return None
 
         tx_params["gas"] = int(gas * gas_limit_multiplier)
-
+        tx_params["nonce"] = await nonce_manager.get_nonce(
+            w3=self.w3, address=self.address, chain_id=self.chain.chain_id
+        )
         signed_tx = self.w3.eth.account.sign_transaction(tx_params, self.private_key)
 
         try:
-            return await self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            tx_hash = await self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
         except Exception as e:
-            logger.error(f"Error while sending transaction: {e}")
-            return None
+            if is_already_known(e) or (is_nonce_too_low(e) and await self._is_known_tx(signed_tx.hash)):
+                logger.debug(f"Transaction {self.w3.to_hex(signed_tx.hash)} is already known to the node: {e}")
+                tx_hash = signed_tx.hash
+            else:
+                if "underpriced" in str(e).lower():
+                    # the stuck transaction with this nonce is still pending, the next one has to replace it
+                    nonce_manager.reuse(address=self.address, chain_id=self.chain.chain_id, nonce=tx_params["nonce"])
+                elif is_nonce_error(e):
+                    nonce_manager.reset(address=self.address, chain_id=self.chain.chain_id)
+                else:
+                    nonce_manager.release(
+                        address=self.address, chain_id=self.chain.chain_id, nonce=tx_params["nonce"]
+                    )
+                logger.error(f"Error while sending transaction: {e}")
+                return None
+
+        tx_manager.track(
+            chain=self.chain,
+            w3=self.w3,
+            private_key=self.private_key,
+            address=self.address,
+            tx_hash=self.w3.to_hex(tx_hash),
+            tx_params=tx_params,
+        )
+        return HexBytes(tx_hash)
+
+    async def _is_known_tx(self, tx_hash: HexBytes) -> bool:
+        try:
+            return await self.w3.eth.get_transaction(tx_hash) is not None
+        except Exception:
+            return False
 
     async def verify_tx(self, tx_hash: Optional[HexBytes], timeout: int = VERIFY_TX_TIMEOUT) -> bool:
         """
@@ -244,26 +274,54 @@ class Client:
         Note:
         This method checks the status of a transaction using its hash. It waits for the transaction
         receipt and logs the success or failure of the transaction with the corresponding log level.
+        Receipts of all pending transactions on the chain are fetched together once per new block, and
+        a transaction that was replaced or dropped fails right away instead of waiting out the timeout.
+        A transaction stuck for TX_REPLACEMENT_BLOCKS blocks is sent again with a higher fee.
         """
         if tx_hash is None:
             return False
 
         try:
-            response = await self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+            tx_hash_hex = self.w3.to_hex(tx_hash)
+            result = await tx_manager.wait_for_receipt(chain=self.chain, tx_hash=tx_hash_hex, timeout=timeout)
+            tx_hash_hex = tx_manager.get_mined_hash(chain=self.chain, tx_hash=tx_hash_hex)
 
-            if "status" in response and response["status"] == 1:
-                logger.success(f"Transaction was successful: {self.chain.explorer}tx/{self.w3.to_hex(tx_hash)}")
+            if result.status == TX_CONFIRMED:
+                logger.success(f"Transaction was successful: {self.chain.explorer}tx/{tx_hash_hex}")
                 return True
+            elif result.status == TX_PENDING:
+                # a retry takes over the nonce of the stuck transaction and replaces it, instead of sending
+                # the same action a second time behind it
+                nonce = tx_manager.get_nonce(chain=self.chain, tx_hash=tx_hash_hex)
+                if nonce is not None:
+                    nonce_manager.reuse(address=self.address, chain_id=self.chain.chain_id, nonce=nonce)
+                logger.error(f"Transaction wasn't mined in {timeout}s: {self.chain.explorer}tx/{tx_hash_hex}")
+                return False
+            elif result.status in (TX_REPLACED, TX_DROPPED):
+                logger.error(f"Transaction was {result.status.lower()}: {self.chain.explorer}tx/{tx_hash_hex}")
+                return False
             else:
-                logger.error(f"Transaction failed: {self.chain.explorer}tx/{self.w3.to_hex(tx_hash)}")
+                logger.error(f"Transaction failed: {self.chain.explorer}tx/{tx_hash_hex}")
                 return False
         except Exception as e:
             logger.error(f"Unexpected error in verify_tx function: {e}")
             return False
 
+    def get_mined_tx_hash(self, tx_hash: HexBytes) -> str:
+        """
+        Returns the hash of the transaction that was mined in place of `tx_hash` (itself unless it was replaced).
+        """
+        return tx_manager.get_mined_hash(chain=self.chain, tx_hash=self.w3.to_hex(tx_hash))
+
+    def get_tx_receipt(self, tx_hash: HexBytes) -> Optional[TxReceipt]:
+        """
+        Returns the receipt verify_tx got for a transaction sent by this client, if it was mined.
+        """
+        return tx_manager.get_receipt(chain=self.chain, tx_hash=self.w3.to_hex(tx_hash))
+
     async def get_allowance(
         self,
-        token_contract: AsyncContract,
+        token: Token,
         spender: ChecksumAddress,
         owner: Optional[ChecksumAddress] = None,
     ) -> Optional[int]:
@@ -271,11 +329,38 @@ class Client:
             owner = self.address
 
         try:
-            return await token_contract.functions.allowance(owner, spender).call()
+            contract = get_erc20(chain=self.chain, token=token)
+            data = await self.w3.eth.call({"to": contract.address, "data": contract.encode_allowance(owner, spender)})
+            return contract.decode_uint(data)
         except Exception as e:
             logger.error(f"Couldn't get allowance for of `{owner}` for `{spender}`: {e}")
             return None
 
+    def _get_approval_value(self, token: Token, value: int) -> int:
+        if APPROVAL_POLICY == "max":
+            return MAX_UINT256
+        if APPROVAL_POLICY == "min":
+            return max(value, token.to_wei(APPROVAL_MIN_AMOUNT))
+        return value
+
+    def get_cached_allowance(self, token: Token, spender: ChecksumAddress) -> Optional[int]:
+        return get_storage().get_allowance(
+            address=self.address, chain_id=self.chain.chain_id, token=token.symbol, spender=spender
+        )
+
+    def update_cached_allowance(self, token: Token, spender: ChecksumAddress, amount: Optional[int]) -> None:
+        """
+        Stores the known allowance of `spender`, None forgets it so the next approve reads it from the chain again.
+        """
+        get_storage().set_allowance(
+            address=self.address, chain_id=self.chain.chain_id, token=token.symbol, spender=spender, amount=amount
+        )
+
+    def spend_cached_allowance(self, token: Token, spender: ChecksumAddress, amount: int) -> None:
+        allowance = self.get_cached_allowance(token=token, spender=spender)
+        if allowance is not None and allowance != MAX_UINT256:
+            self.update_cached_allowance(token=token, spender=spender, amount=max(allowance - amount, 0))
+
     async def approve(
         self,
         spender: ChecksumAddress,
@@ -286,25 +371,28 @@ class Client:
         if token.is_native:
             return True
 
-        token_contract: AsyncContract = self.w3.eth.contract(
-            address=AsyncWeb3.to_checksum_address(token.contract_address), abi=token.abi
-        )
-        allowance = await self.get_allowance(token_contract=token_contract, spender=spender)
+        token_contract = get_erc20(chain=self.chain, token=token)
         if ignore_allowance is False:
-            if allowance >= value:
+            allowance = self.get_cached_allowance(token=token, spender=spender)
+            if allowance is None or allowance < value:
+                allowance = await self.get_allowance(token=token, spender=spender)
+                if allowance is not None:
+                    self.update_cached_allowance(token=token, spender=spender, amount=allowance)
+
+            if allowance is not None and allowance >= value:
                 logger.debug(
                     f"Allowance is greater than approve value: {token.from_wei(allowance)} >= {token.from_wei(value)}"
                 )
                 return True
 
-        logger.info(f"Approving {token.from_wei(value)} {token.symbol} for spender: {spender}")
-        data = token_contract.encodeABI("approve", args=(spender, value))
+        approve_value = self._get_approval_value(token=token, value=value)
+        logger.info(f"Approving {token.from_wei(approve_value)} {token.symbol} for spender: {spender}")
+        data = token_contract.encode_approve(spender=spender, value=approve_value)
         tx_hash = await self.send_transaction(to=token_contract.address, data=data)
 
-        if await self.verify_tx(tx_hash=tx_hash):
-            await sleep(delay_range=TX_DELAY_RANGE, send_message=False)
-            return True
-        return False
+        tx_status = await self.verify_tx(tx_hash=tx_hash)
+        self.update_cached_allowance(token=token, spender=spender, amount=approve_value if tx_status else None)
+        return tx_status
 
     async def transfer(self, amount: int, to_address: str) -> bool:
         try:
@@ -329,8 +417,10 @@ class Client:
             if token.is_native:
                 balance = await self.w3.eth.get_balance(account=self.address)
             else:
-                contract = self.w3.eth.contract(address=token.contract_address, abi=token.abi)
-                balance = await contract.functions.balanceOf(self.address).call()
+                contract = get_erc20(chain=self.chain, token=token)
+                balance = contract.decode_uint(
+                    await self.w3.eth.call({"to": contract.address, "data": contract.encode_balance_of(self.address)})
+                )
             return balance if wei else token.from_wei(value=balance)
         except Exception as e:
             logger.error(f"Couldn't get balance of {token}: {e}")
@@ -338,11 +428,15 @@ class Client:
 
     async def get_token_balance_batch(self, token_list: List[Token], wei: bool = True):
         try:
-            results = await asyncio.gather(*[self.get_token_balance(token, wei) for token in token_list])
+            results = await get_balances(
+                chain=self.chain, requests=[(self.address, token) for token in token_list], proxy=self.proxy
+            )
 
             if any(balance is None for balance in results):
                 return None
 
+            if not wei:
+                return [token.from_wei(value=balance) for token, balance in zip(token_list, results)]
             return results
         except Exception as e:
             logger.error(f"Couldn't get batch balance: {e}")
@@ -369,29 +463,18 @@ class Client:
             token_balance_mapping[token_with_largest_usd_balance],
         )
 
-    async def wait_for_deposit(
-        self,
-        initial_balance: int,
-        checkup_sleep_time_range: List[int],
-        attempts: Optional[int] = None
-    ) -> bool:
-        if not attempts:
-            attempts = True
-
+    async def wait_for_deposit(self, initial_balance: int, timeout: Optional[float] = WAIT_FOR_DEPOSIT_TIMEOUT) -> bool:
         logger.info(f"Waiting for funds on {self.chain.name}")
         token = find_token(tokens=self.chain.tokens, symbol=self.chain.coin_symbol)
-        while attempts:
-            final_balance = await self.get_token_balance(token=token)
-            if final_balance > initial_balance:
-                logger.info(f"Funds on {self.chain.name} received")
-                return True
-            if attempts is not True:
-                attempts -= 1
-            await sleep(
-                delay_range=checkup_sleep_time_range,
-                send_message=False,
-                pr_bar=False,
-            )
+        if await arrival_watcher.wait_for_arrival(
+            chain=self.chain,
+            address=self.address,
+            token=token,
+            initial_balance=token.from_wei(initial_balance),
+            timeout=timeout,
+        ):
+            logger.info(f"Funds on {self.chain.name} received")
+            return True
         logger.error(f"Funds not received on {self.chain.name}")
         return False
 
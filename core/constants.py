@@ -2,14 +2,65 @@ from core.utils import read_from_json
 # CLIENT CONFIGURATION
 
 VERIFY_TX_TIMEOUT = 300
+# new blocks in a row (spanning at least RECEIPT_LOST_MIN_TIME seconds) on which a pending transaction must look
+# replaced (its nonce used) or dropped (unknown to the node) before it's reported so,
+# seconds after sending before an unknown transaction can count as dropped
+RECEIPT_LOST_CHECKS = 3
+RECEIPT_LOST_MIN_TIME = 15
+RECEIPT_DROPPED_MIN_AGE = 60
+# minimum seconds between two receipt checks of a chain
+RECEIPT_CHECK_INTERVAL = 1
+# broadcast transactions whose sender and nonce are remembered for the receipt tracker
+RECEIPT_SENT_CACHE_SIZE = 10000
+# nodes only accept a replacement of a pending transaction that raises its fees by at least 10%
+TX_REPLACEMENT_MIN_BUMP = 1.1
+
+# values of APPROVAL_POLICY in config.py
+APPROVAL_POLICIES = ("exact", "min", "max")
 
 GAS_LIMIT_MULTIPLIER = 1.2
 GAS_PRICE_MULTIPLIER = 1.1
 
+# gas oracle: fees are cached per chain for GAS_ORACLE_TTL seconds, pollers stop after GAS_ORACLE_IDLE_TIMEOUT idle seconds
+GAS_ORACLE_TTL = 10
+GAS_ORACLE_IDLE_TIMEOUT = 120
+# maxFeePerGas = base fee * GAS_BASE_FEE_MULTIPLIER + priority fee, so a tx survives a few full blocks
+GAS_BASE_FEE_MULTIPLIER = 2
+GAS_PRIORITY_FEE_PERCENTILE = 50
+# while the priority fee is younger than this, new heads with a base fee update the cached fees without a request
+GAS_PRIORITY_FEE_TTL = 60
+
 RETRIES = 3
 RETRY_DELAY_RANGE = [5, 10]
 
+# shared http sessions (one per proxy)
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 10
+HTTP_DNS_CACHE_TTL = 300
+HTTP_KEEPALIVE_TIMEOUT = 30
+
 ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+MAX_UINT256 = 2 ** 256 - 1
+
+ERC20_TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+# bridge arrival watcher: seconds between checks, max blocks per log query, recipients per log query,
+# seconds a wallet waits for its arrival before the module checks again
+ARRIVAL_POLL_INTERVAL = 10
+ARRIVAL_MAX_LOG_RANGE = 2000
+ARRIVAL_LOG_ADDRESSES_PER_QUERY = 100
+ARRIVAL_WAIT_TIMEOUT = 600
+
+# MULTICALL3 (https://www.multicall3.com)
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL3_ZKSYNC_ADDRESS = "0xF9cda624FBC7e059355ce98a31693d299FACd963"
+MULTICALL_AGGREGATE3_SELECTOR = "0x82ad56cb"
+MULTICALL_GET_ETH_BALANCE_SELECTOR = "0x4d2301cc"
+ERC20_BALANCE_OF_SELECTOR = "0x70a08231"
+ERC20_ALLOWANCE_SELECTOR = "0xdd62ed3e"
+ERC20_APPROVE_SELECTOR = "0x095ea7b3"
+# max amount of calls packed into one multicall / batch request
+MULTICALL_BATCH_SIZE = 500
 MAX_SLIPPAGE = 5
 
 """
@@ -19,10 +70,28 @@ DEXES CONTRACT ADDRESSES / ABIS
 # JUMPER
 JUMPER_ROUTE_URL = "https://li.quest/v1/advanced/routes"
 JUMPER_BUILD_TX_URL = "https://li.quest/v1/advanced/stepTransaction"
+JUMPER_STATUS_URL = "https://li.quest/v1/status"
 
 JUMPER_TX_SIMULATION_VALUE = 100000000000000
 JUMPER_FULL_BRIDGE_GAS_MULTIPLIER = 1.3
 
+# full bridge quote cache (seconds, entries)
+JUMPER_QUOTE_CACHE_TTL = 120
+JUMPER_CACHE_SIZE = 1024
+
+# learned gas usage of full bridges: recent receipts looked at per route, receipts of one bridge (tool) needed
+# before the simulation is skipped, max relative spread of their gas used / fees, margin added to the prediction
+GAS_MODEL_SAMPLES = 20
+GAS_MODEL_MIN_SAMPLES = 5
+GAS_MODEL_MAX_SPREAD = 0.15
+GAS_MODEL_MARGIN = 1.15
+
+# li.fi transfer status polling: tick of the shared poller, per transfer backoff bounds (seconds), parallel requests
+JUMPER_STATUS_POLL_INTERVAL = 5
+JUMPER_STATUS_MIN_BACKOFF = 10
+JUMPER_STATUS_MAX_BACKOFF = 120
+JUMPER_STATUS_CONCURRENCY = 10
+
 # ERC20 TOKENS ABI
 ERC20_CONTRACT_ABI = read_from_json(file_path="core/abi/erc20_abi.json")
 
@@ -37,11 +106,86 @@ PRIVATE_KEYS_FILE_PATH = "data/private_keys.txt"
 PROXIES_FILE_PATH = "data/proxies.txt"
 DEPOSIT_ADDRESSES_PATH = "data/deposit_addresses.txt"
 DATABASE_FILE_PATH = "data/database.json"
+DATABASE_STORE_PATH = "data/database.db"
+BALANCE_SNAPSHOT_FILE_PATH = "data/balances_{}.csv"
+
+# seconds to wait for another process holding the database write lock
+STORAGE_BUSY_TIMEOUT = 30
 
 """
 CEX
 """
 CEX_WITHDRAW_TRIES = 5
 CEX_WITHDRAW_DELAY_RANGE = [60, 60]
-CEX_WAIT_FOR_WITHDRAWAL_FINAL_STATUS_DELAY_RANGE = [10, 10]
-CEX_WAIT_FOR_WITHDRAWAL_FINAL_STATUS_ATTEMPTS = 100
+# pending withdrawals are polled together every CEX_WITHDRAWAL_POLL_INTERVAL seconds
+CEX_WITHDRAWAL_POLL_INTERVAL = 10
+CEX_WITHDRAWAL_FINAL_STATUS_TIMEOUT = 1000
+
+# okx markets and currencies are cached on disk for OKX_MARKETS_CACHE_TTL seconds
+OKX_MARKETS_CACHE_PATH = "data/okx_markets.json"
+OKX_MARKETS_CACHE_TTL = 24 * 60 * 60
+
+# sub-account sweep: parallel okx requests, seconds a sub-account that was found empty (or emptied) isn't asked again
+OKX_SUB_ACCOUNT_CONCURRENCY = 5
+OKX_EMPTY_SUB_ACCOUNT_TTL = 300
+OKX_SUB_ACCOUNT_LIST_TTL = 600
+
+"""
+SIMULATION
+"""
+# latency ranges (seconds) of the simulated rpc nodes, http apis, tx confirmations, bridges and okx withdrawals
+SIMULATION_RPC_LATENCY = [0.05, 0.3]
+SIMULATION_API_LATENCY = [0.2, 1.0]
+SIMULATION_TX_CONFIRMATION_TIME = [2, 15]
+SIMULATION_BRIDGE_TIME = [30, 300]
+SIMULATION_OKX_WITHDRAWAL_TIME = [60, 600]
+# share of simulated bridge transactions that revert
+SIMULATION_FAILURE_RATE = 0.02
+SIMULATION_DEFAULT_WALLETS = 1000
+# starting balance of every simulated wallet on every chain: native token (worth this much eth) and usdc
+SIMULATION_NATIVE_BALANCE = 0.01
+SIMULATION_USDC_BALANCE = 10
+SIMULATION_TOKEN_PRICES = {"eth": 3000, "bnb": 500, "matic": 0.7, "usdc": 1}
+# seconds between two simulated blocks, gas prices of the simulated chains (gwei, the rest of the chains pay the
+# default one), native bridge fee (usd)
+SIMULATION_BLOCK_TIME = 2
+SIMULATION_GAS_PRICES = {"ethereum": 10, "bsc": 3, "polygon": 50}
+SIMULATION_DEFAULT_GAS_PRICE = 0.05
+SIMULATION_BRIDGE_FEE = 0.25
+# a mode that hasn't finished after this many simulated seconds is stopped, and so is one that hasn't mined
+# a transaction for this many (every wallet left is stuck retrying)
+SIMULATION_MAX_TIME = 30 * 24 * 60 * 60
+SIMULATION_STALL_TIME = 6 * 60 * 60
+# lines of the output of a failed simulation shown in the log
+SIMULATION_ERROR_LINES = 20
+
+# RPC ENDPOINT POOL
+# latencies (seconds) remembered per endpoint, and the latency assumed for an endpoint without any yet
+RPC_LATENCY_WINDOW = 100
+RPC_DEFAULT_LATENCY = 0.5
+# seconds added to the expected latency of an endpoint for its error rate when ranking endpoints
+RPC_ERROR_PENALTY = 2
+# a read that takes longer than the p95 latency of its endpoint (within these bounds) is sent to a second endpoint
+RPC_HEDGE_MIN_DELAY = 0.2
+RPC_HEDGE_MAX_DELAY = 3
+# consecutive failures that open the circuit breaker of an endpoint,
+# seconds it stays open (doubles while the endpoint keeps failing)
+RPC_BREAKER_FAILURES = 3
+RPC_BREAKER_COOLDOWN = 30
+RPC_BREAKER_MAX_COOLDOWN = 600
+RPC_REQUEST_TIMEOUT = 30
+# requests that change state and must not be sent twice at the same time
+RPC_WRITE_METHODS = ("eth_sendRawTransaction", "eth_sendTransaction")
+# websocket endpoints: seconds between pings and to open a connection
+WS_HEARTBEAT = 30
+WS_CONNECT_TIMEOUT = 10
+
+# NEW BLOCKS
+# seconds between eth_blockNumber polls on chains without a websocket endpoint
+HEADS_POLL_INTERVAL = 3
+# a subscription without a new head for HEADS_STALE_TIMEOUT seconds is dropped and the chain is polled
+# for HEADS_RESUBSCRIBE_DELAY seconds before subscribing again
+HEADS_STALE_TIMEOUT = 60
+HEADS_RESUBSCRIBE_DELAY = 30
+# the watcher of a chain stops once nobody has waited for its blocks for this many seconds
+HEADS_IDLE_TIMEOUT = 120
@@ -1,40 +1,118 @@
-from typing import Optional
+from dataclasses import dataclass
+from typing import Optional, Tuple
 
+from hexbytes import HexBytes
 from web3 import AsyncWeb3
 
+from core.cache import TTLCache
 from core.client import Client
 from core.constants import (
     MAX_SLIPPAGE,
+    GAS_PRICE_MULTIPLIER,
     JUMPER_TX_SIMULATION_VALUE,
     JUMPER_FULL_BRIDGE_GAS_MULTIPLIER,
     JUMPER_BUILD_TX_URL,
-    JUMPER_ROUTE_URL
+    JUMPER_ROUTE_URL,
+    JUMPER_CACHE_SIZE,
+    JUMPER_QUOTE_CACHE_TTL,
 )
 from core.decorators import gas_delay, retry_on_fail
+from core.gas import gas_oracle
+from core.gas_model import gas_model, GasPrediction
 from core.models.chain import Chain
 from core.models.token import Token
+from core.transfers import transfer_tracker
 from logger import logger
 
 
+@dataclass
+class BridgeQuote:
+    gas: int
+    fee: int
+
+
+# gas and bridge fee of a simulated full bridge are shared by every wallet bridging the same pair
+QUOTE_CACHE = TTLCache(maxsize=JUMPER_CACHE_SIZE, ttl=JUMPER_QUOTE_CACHE_TTL)
+
+
 class JumperBridge:
     def __init__(self, client: Client):
         self.client = client
 
-    async def _calculate_amount_for_full_bridge(self, dest_chain: Chain, token_in: Token, token_out: Token):
-        try:
-            data = (await self._build_tx(
-                dest_chain=dest_chain, amount=JUMPER_TX_SIMULATION_VALUE, token_in=token_in, token_out=token_out
-            ))["transactionRequest"]
+    def _get_quote_key(self, dest_chain: Chain, token_in: Token, token_out: Token) -> tuple:
+        return self.client.chain.chain_id, dest_chain.chain_id, token_in.contract_address, token_out.contract_address
 
-            tx_params = await self.client.get_tx_params(
-                to=AsyncWeb3.to_checksum_address(data["to"]), data=data["data"], value=int(data["value"], 16)
-            )
+    async def _get_gas_price(self) -> int:
+        fee_params = await gas_oracle.get_fee_params(
+            chain=self.client.chain, gas_price_multiplier=GAS_PRICE_MULTIPLIER
+        )
+        return fee_params.get("maxFeePerGas", fee_params.get("gasPrice"))
+
+    async def _simulate_full_bridge(self, dest_chain: Chain, token_in: Token, token_out: Token) -> BridgeQuote:
+        data = (await self._build_tx(
+            dest_chain=dest_chain, amount=JUMPER_TX_SIMULATION_VALUE, token_in=token_in, token_out=token_out
+        ))["transactionRequest"]
 
-            gas = await self.client.get_gas_estimate(tx_params=tx_params)
-            gas_fee = int((gas * tx_params["gasPrice"] * JUMPER_FULL_BRIDGE_GAS_MULTIPLIER))
-            fee = int(data["value"], 16) - JUMPER_TX_SIMULATION_VALUE
+        tx_params = await self.client.get_tx_params(
+            to=AsyncWeb3.to_checksum_address(data["to"]), data=data["data"], value=int(data["value"], 16)
+        )
+
+        gas = await self.client.get_gas_estimate(tx_params=tx_params)
+        if gas is None:
+            raise Exception("Couldn't estimate gas of the simulated bridge")
+
+        return BridgeQuote(gas=gas, fee=int(data["value"], 16) - JUMPER_TX_SIMULATION_VALUE)
+
+    async def _predict_full_bridge(
+        self, dest_chain: Chain, token_in: Token, token_out: Token, amount: int
+    ) -> Optional[GasPrediction]:
+        # past receipts only tell the gas of the bridge LI.FI routes this amount through, the route that tells it
+        # is only worth a request once some bridge of the pair has enough of them
+        if not gas_model.has_samples(
+            chain=self.client.chain, dest_chain=dest_chain, token_in=token_in, token_out=token_out
+        ):
+            return None
+        routes = (await self._get_route(
+            dest_chain=dest_chain, amount=amount, token_in=token_in, token_out=token_out
+        ))["routes"]
+        if not routes:
+            return None
+        return gas_model.predict(
+            chain=self.client.chain,
+            dest_chain=dest_chain,
+            token_in=token_in,
+            token_out=token_out,
+            tool=routes[0]["steps"][0].get("tool"),
+        )
+
+    async def _calculate_amount_for_full_bridge(
+        self, dest_chain: Chain, token_in: Token, token_out: Token, use_gas_model: bool = True
+    ) -> Tuple[int, Optional[GasPrediction]]:
+        """
+        Returns the amount left after the gas and bridge fee of the bridge itself, along with the prediction
+        of the gas model if the bridge didn't have to be simulated.
+        """
+        try:
             balance = await self.client.get_token_balance(token_in)
-            return balance - gas_fee - fee
+            prediction = None
+            if use_gas_model:
+                prediction = await self._predict_full_bridge(
+                    dest_chain=dest_chain, token_in=token_in, token_out=token_out, amount=balance
+                )
+
+            if prediction is not None:
+                quote = BridgeQuote(gas=prediction.gas, fee=prediction.fee)
+            else:
+                quote_key = self._get_quote_key(dest_chain=dest_chain, token_in=token_in, token_out=token_out)
+                quote = QUOTE_CACHE.get(quote_key)
+                if quote is None:
+                    quote = await self._simulate_full_bridge(
+                        dest_chain=dest_chain, token_in=token_in, token_out=token_out
+                    )
+                    QUOTE_CACHE.set(quote_key, quote)
+
+            gas_fee = int((quote.gas * await self._get_gas_price() * JUMPER_FULL_BRIDGE_GAS_MULTIPLIER))
+            return balance - gas_fee - quote.fee, prediction
         except Exception as e:
             raise Exception(f"Error while estimating full bridge amount: {e}")
 
@@ -46,12 +124,13 @@ class JumperBridge:
             if not len(route_data["routes"]) > 0:
                 raise Exception(f"Find zero routes")
 
-            return await self.client.send_post_request(
+            tx_data = await self.client.send_post_request(
                 url=JUMPER_BUILD_TX_URL, data=route_data["routes"][0]["steps"][0], headers={
                     "X-Lifi-Sdk": "3.0.0-alpha.57",
                     "X-Lifi-Widget": "3.0.0-alpha.35"
                 }
             )
+            return tx_data
         except Exception as e:
             raise Exception(f"Error while build tx: {e}")
 
@@ -82,40 +161,122 @@ class JumperBridge:
         except Exception as e:
             raise Exception(f"Error while getting route: {e}")
 
+    def _learn_gas_usage(
+        self,
+        tx_hash: Optional[HexBytes],
+        dest_chain: Chain,
+        token_in: Token,
+        token_out: Token,
+        tool: Optional[str],
+        fee: int,
+        prediction: Optional[GasPrediction],
+    ) -> None:
+        if tx_hash is None:
+            # the amount left for gas may have been too small, the next bridge is simulated again
+            if prediction is not None:
+                gas_model.forget(
+                    chain=self.client.chain,
+                    dest_chain=dest_chain,
+                    token_in=token_in,
+                    token_out=token_out,
+                    tool=prediction.tool,
+                )
+            return
+
+        receipt = self.client.get_tx_receipt(tx_hash)
+        if receipt is None:
+            return
+        gas_model.record(
+            tx_hash=self.client.get_mined_tx_hash(tx_hash),
+            chain=self.client.chain,
+            dest_chain=dest_chain,
+            tool=tool,
+            token_in=token_in,
+            token_out=token_out,
+            gas_used=receipt["gasUsed"],
+            fee=fee,
+        )
+
+    async def bridge(
+        self, dest_chain: Chain, token_in: Token, token_out: Token, amount: Optional[float]
+    ) -> Tuple[bool, float]:
+        result = await self._bridge(dest_chain=dest_chain, token_in=token_in, token_out=token_out, amount=amount)
+        # retry_on_fail gives up with a bare False, callers always unpack (status, amount)
+        return result if result else (False, 0)
+
     @gas_delay()
     @retry_on_fail()
-    async def bridge(self, dest_chain: Chain, token_in: Token, token_out: Token, amount: Optional[float]):
+    async def _bridge(self, dest_chain: Chain, token_in: Token, token_out: Token, amount: Optional[float]):
         try:
-            if amount is None:
-                if token_in.is_native:
-                    amount = await self._calculate_amount_for_full_bridge(
-                        dest_chain=dest_chain, token_in=token_in, token_out=token_out
-                    )
-                else:
-                    amount = await self.client.get_token_balance(token_in)
+            prediction = None
+            # only full-balance bridges of the native token are learned by the gas model, they're the ones it predicts
+            full_bridge = amount is None and token_in.is_native
+            if full_bridge:
+                amount, prediction = await self._calculate_amount_for_full_bridge(
+                    dest_chain=dest_chain, token_in=token_in, token_out=token_out
+                )
+            elif amount is None:
+                amount = await self.client.get_token_balance(token_in)
             else:
                 amount = token_in.to_wei(amount)
 
-            if amount == 0:
+            if amount <= 0:
                 return False, 0
 
+            step = await self._build_tx(dest_chain=dest_chain, amount=amount, token_in=token_in, token_out=token_out)
+            if prediction is not None and step.get("tool") != prediction.tool:
+                # the amount left after the predicted gas goes through another bridge, whose gas is unknown
+                amount, prediction = await self._calculate_amount_for_full_bridge(
+                    dest_chain=dest_chain, token_in=token_in, token_out=token_out, use_gas_model=False
+                )
+                if amount <= 0:
+                    return False, 0
+                step = await self._build_tx(
+                    dest_chain=dest_chain, amount=amount, token_in=token_in, token_out=token_out
+                )
+            data = step["transactionRequest"]
+
             logger.info(
                 f"[JumperBridge] Bridging {round(token_in.from_wei(amount), token_in.round_to)} {token_in.symbol.upper()}"
                 f" from {self.client.chain.name.upper()} to {token_out.symbol.upper()} on {dest_chain.name.upper()}"
             )
 
-            data = (await self._build_tx(
-                dest_chain=dest_chain, amount=amount, token_in=token_in, token_out=token_out
-            ))["transactionRequest"]
-
-            await self.client.approve(spender=AsyncWeb3.to_checksum_address(data["to"]), token=token_in, value=amount)
+            spender = AsyncWeb3.to_checksum_address(data["to"])
+            await self.client.approve(spender=spender, token=token_in, value=amount)
 
             tx_hash = await self.client.send_transaction(
-                to=AsyncWeb3.to_checksum_address(data["to"]),
+                to=spender,
                 data=data["data"],
                 value=int(data["value"], 16)
             )
-            return await self.client.verify_tx(tx_hash=tx_hash), token_in.from_wei(amount)
+            tx_status = await self.client.verify_tx(tx_hash=tx_hash)
+            if not token_in.is_native:
+                if tx_status:
+                    self.client.spend_cached_allowance(token=token_in, spender=spender, amount=amount)
+                else:
+                    # the cached allowance may be what made the bridge fail, read it from the chain next time
+                    self.client.update_cached_allowance(token=token_in, spender=spender, amount=None)
+            if full_bridge:
+                self._learn_gas_usage(
+                    tx_hash=tx_hash if tx_status else None,
+                    dest_chain=dest_chain,
+                    token_in=token_in,
+                    token_out=token_out,
+                    tool=step.get("tool"),
+                    fee=int(data["value"], 16) - amount,
+                    prediction=prediction,
+                )
+            if tx_status:
+                transfer_tracker.register(
+                    tx_hash=self.client.get_mined_tx_hash(tx_hash),
+                    address=self.client.address,
+                    src_chain=self.client.chain,
+                    dest_chain=dest_chain,
+                    tool=step.get("tool"),
+                    token_out=token_out,
+                    to_amount=step.get("estimate", {}).get("toAmount"),
+                )
+            return tx_status, token_in.from_wei(amount)
         except Exception as e:
             logger.error(f"[JumperBridge] Error: {e}")
             return False
@@ -1,15 +1,16 @@
-import asyncio
 import random
 from functools import wraps
 from typing import List
 
-from tqdm import tqdm
 from web3 import AsyncWeb3
 
 from config import GAS_DELAY_RANGE, GAS_THRESHOLD
+from core.chains import ETHEREUM_CHAIN
 from core.constants import RETRIES, RETRY_DELAY_RANGE
+from core.gas import gas_oracle
 from logger import logger
-from utils import get_chain_gas_fee, sleep
+from progress import dashboard
+from utils import sleep
 
 
 def retry_on_fail(tries: int = RETRIES, retry_delay: List[int] = RETRY_DELAY_RANGE):
@@ -34,7 +35,7 @@ def gas_delay(gas_threshold: int = GAS_THRESHOLD, delay_range: List = GAS_DELAY_
         @wraps(func)
         async def wrapper(*args, **kwargs):
             while True:
-                current_eth_gas_price = await get_chain_gas_fee()
+                current_eth_gas_price = await gas_oracle.get_gas_price(chain=ETHEREUM_CHAIN)
                 threshold = AsyncWeb3.to_wei(gas_threshold, "gwei")
                 if current_eth_gas_price > threshold:
                     random_delay = random.randint(*delay_range)
@@ -46,10 +47,7 @@ def gas_delay(gas_threshold: int = GAS_THRESHOLD, delay_range: List = GAS_DELAY_
                         send_to_tg=False,
                     )
 
-                    with tqdm(total=random_delay, desc="Waiting", unit="s", dynamic_ncols=True, colour="blue") as pbar:
-                        for _ in range(random_delay):
-                            await asyncio.sleep(1)
-                            pbar.update(1)
+                    await dashboard.wait(delay=random_delay, label="gas")
                 else:
                     break
 
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from eth_typing import ChecksumAddress
+from web3 import AsyncWeb3
+
+from core.chains import CHAINS
+from core.models.chain import Chain
+from core.models.token import Token
+from .constants import ERC20_BALANCE_OF_SELECTOR, ERC20_ALLOWANCE_SELECTOR, ERC20_APPROVE_SELECTOR
+
+
+def _encode_word(value: int) -> str:
+    return format(value, "064x")
+
+
+def encode_address(address: str) -> str:
+    """
+    Returns `address` as one 32-byte abi word (or log topic) in hex, without the 0x prefix.
+    """
+    return address[2:].lower().rjust(64, "0")
+
+
+def encode_address_call(selector: str, address: str) -> str:
+    return selector + encode_address(address)
+
+
+@dataclass(frozen=True)
+class ERC20Contract:
+    """
+    Calldata builder of one ERC-20 token deployment. Selectors are fixed, so building a call is only
+    string formatting and reading one back is a single int conversion, without going through the ABI.
+    """
+
+    token: Token
+    address: ChecksumAddress
+
+    def encode_balance_of(self, owner: str) -> str:
+        return encode_address_call(ERC20_BALANCE_OF_SELECTOR, owner)
+
+    def encode_allowance(self, owner: str, spender: str) -> str:
+        return ERC20_ALLOWANCE_SELECTOR + encode_address(owner) + encode_address(spender)
+
+    def encode_approve(self, spender: str, value: int) -> str:
+        return ERC20_APPROVE_SELECTOR + encode_address(spender) + _encode_word(value)
+
+    @staticmethod
+    def decode_uint(data: bytes) -> int:
+        return int.from_bytes(data[:32], "big")
+
+
+# (chain name, token symbol) -> contract of every ERC-20 token of every supported chain, built once at import
+ERC20_CONTRACTS: Dict[Tuple[str, str], ERC20Contract] = {
+    (chain.name, symbol): ERC20Contract(token=token, address=AsyncWeb3.to_checksum_address(token.contract_address))
+    for chain in CHAINS.values()
+    for symbol, token in chain.tokens.items()
+    if not token.is_native
+}
+
+
+def get_erc20(chain: Chain, token: Token) -> Optional[ERC20Contract]:
+    contract = ERC20_CONTRACTS.get((chain.name, token.symbol))
+    if contract is None and not token.is_native:
+        # tokens that aren't part of a chain config are built on demand
+        contract = ERC20Contract(token=token, address=AsyncWeb3.to_checksum_address(token.contract_address))
+    return contract
@@ -2,7 +2,7 @@ class NoRPCEndpointSpecifiedError(Exception):
     def __init__(
         self,
         chain,
-        message: str = "No RPC endpoint specified for {}. Specify one in config.py file.",
+        message: str = "No RPC endpoints specified for {}. Specify at least one in config.py file.",
         *args: object,
     ) -> None:
         self.message = message.format(chain.name)
@@ -13,3 +13,20 @@ class WithdrawalCancelledError(Exception):
     def __init__(self, message: str = "Withdrawal cancelled", *args: object) -> None:
         self.message = message
         super().__init__(self.message, *args)
+
+
+class RPCBatchNotSupportedError(Exception):
+    def __init__(
+        self,
+        chain,
+        message: str = "RPC endpoint of {} does not support batch requests",
+        *args: object,
+    ) -> None:
+        self.message = message.format(chain.name)
+        super().__init__(self.message, *args)
+
+
+class RPCRateLimitedError(Exception):
+    def __init__(self, url: str, message: str = "RPC endpoint {} is rate limiting requests", *args: object) -> None:
+        self.message = message.format(url)
+        super().__init__(self.message, *args)
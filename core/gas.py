@@ -0,0 +1,145 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+
+from core.models.chain import Chain
+from logger import logger
+from .constants import (
+    GAS_ORACLE_TTL,
+    GAS_ORACLE_IDLE_TIMEOUT,
+    GAS_BASE_FEE_MULTIPLIER,
+    GAS_PRIORITY_FEE_PERCENTILE,
+    GAS_PRIORITY_FEE_TTL,
+)
+from .heads import Head, heads
+from .providers import get_w3
+
+
+@dataclass
+class GasFees:
+    gas_price: int
+    base_fee: Optional[int] = None
+    priority_fee: Optional[int] = None
+    updated_at: float = 0.0
+    priority_fee_updated_at: float = 0.0
+
+
+class GasOracle:
+    """
+    Caches gas fees per chain for `ttl` seconds and keeps them fresh with one background poller per chain,
+    so every wallet on a chain shares a single fee request instead of asking the rpc for each transaction.
+    On chains with a websocket endpoint the poller follows their pushed heads. A poller stops once nobody has asked
+    for its chain for `idle_timeout` seconds.
+    """
+
+    def __init__(self, ttl: float = GAS_ORACLE_TTL, idle_timeout: float = GAS_ORACLE_IDLE_TIMEOUT) -> None:
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self._fees: Dict[str, GasFees] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_read: Dict[str, float] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+
+    def _is_fresh(self, fees: Optional[GasFees]) -> bool:
+        return fees is not None and time.monotonic() - fees.updated_at < self.ttl
+
+    async def _fetch(self, chain: Chain) -> GasFees:
+        w3 = get_w3(chain=chain)
+        if chain.eip1559:
+            history = await w3.eth.fee_history(1, "latest", [GAS_PRIORITY_FEE_PERCENTILE])
+            # the last base fee in the history is the one of the next block
+            base_fee = history["baseFeePerGas"][-1]
+            priority_fee = history["reward"][0][0]
+            return GasFees(
+                gas_price=base_fee + priority_fee,
+                base_fee=base_fee,
+                priority_fee=priority_fee,
+                updated_at=time.monotonic(),
+                priority_fee_updated_at=time.monotonic(),
+            )
+        return GasFees(gas_price=await w3.eth.gas_price, updated_at=time.monotonic())
+
+    async def _refresh(self, chain: Chain) -> GasFees:
+        if chain.name not in self._locks:
+            self._locks[chain.name] = asyncio.Lock()
+
+        async with self._locks[chain.name]:
+            fees = self._fees.get(chain.name)
+            if self._is_fresh(fees):
+                return fees
+            fees = await self._fetch(chain)
+            self._fees[chain.name] = fees
+            return fees
+
+    def _apply_head(self, chain: Chain, head: Optional[Head]) -> None:
+        """
+        Moves the base fee along with heads pushed by a subscription, so EIP-1559 fees only need an rpc request
+        when the priority fee is older than `GAS_PRIORITY_FEE_TTL`.
+        """
+        fees = self._fees.get(chain.name)
+        if head is None or head.base_fee is None or fees is None or fees.priority_fee is None:
+            return
+        if time.monotonic() - fees.priority_fee_updated_at >= GAS_PRIORITY_FEE_TTL:
+            return
+        # the base fee of the latest block rather than of the next one, GAS_BASE_FEE_MULTIPLIER covers the difference
+        self._fees[chain.name] = GasFees(
+            gas_price=head.base_fee + fees.priority_fee,
+            base_fee=head.base_fee,
+            priority_fee=fees.priority_fee,
+            updated_at=time.monotonic(),
+            priority_fee_updated_at=fees.priority_fee_updated_at,
+        )
+
+    async def _poll(self, chain: Chain) -> None:
+        last_block = None
+        while time.monotonic() - self._last_read.get(chain.name, 0) < self.idle_timeout:
+            head = None
+            # polling heads would cost more requests than it saves, only pushed ones are followed
+            if heads.is_pushed(chain):
+                head = await heads.wait_for_block(chain=chain, after=last_block, timeout=self.ttl)
+            if head is not None:
+                last_block = head.number
+                self._apply_head(chain=chain, head=head)
+            try:
+                await self._refresh(chain)
+            except Exception as e:
+                logger.debug(f"Couldn't refresh gas fees on {chain.name}: {e}")
+            if head is None or head.base_fee is None:
+                await asyncio.sleep(self.ttl)
+        self._pollers.pop(chain.name, None)
+
+    def _ensure_poller(self, chain: Chain) -> None:
+        poller = self._pollers.get(chain.name)
+        if poller is None or poller.done():
+            self._pollers[chain.name] = asyncio.create_task(self._poll(chain))
+
+    async def get_fees(self, chain: Chain) -> GasFees:
+        self._last_read[chain.name] = time.monotonic()
+        self._ensure_poller(chain)
+
+        fees = self._fees.get(chain.name)
+        if self._is_fresh(fees):
+            return fees
+        return await self._refresh(chain)
+
+    async def get_gas_price(self, chain: Chain) -> int:
+        return (await self.get_fees(chain)).gas_price
+
+    async def get_fee_params(self, chain: Chain, gas_price_multiplier: float) -> Dict[str, Union[int, str]]:
+        """
+        Returns the fee fields of a transaction: `maxFeePerGas`/`maxPriorityFeePerGas` on EIP-1559 chains,
+        `gasPrice` everywhere else.
+        """
+        fees = await self.get_fees(chain)
+        if fees.base_fee is None:
+            return {"gasPrice": int(fees.gas_price * gas_price_multiplier)}
+
+        max_priority_fee = int(fees.priority_fee * gas_price_multiplier)
+        return {
+            "maxPriorityFeePerGas": max_priority_fee,
+            "maxFeePerGas": int(fees.base_fee * GAS_BASE_FEE_MULTIPLIER) + max_priority_fee,
+        }
+
+
+gas_oracle = GasOracle()
@@ -0,0 +1,117 @@
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from core.models.chain import Chain
+from core.models.token import Token
+from logger import logger
+from .constants import GAS_MODEL_SAMPLES, GAS_MODEL_MIN_SAMPLES, GAS_MODEL_MAX_SPREAD, GAS_MODEL_MARGIN
+from .storage import Storage, get_storage
+
+
+@dataclass
+class GasPrediction:
+    gas: int
+    fee: int
+    tool: Optional[str]
+
+
+def _spread(values: List[int]) -> float:
+    highest = max(values)
+    return (highest - min(values)) / highest if highest else 0.0
+
+
+class GasModel:
+    """
+    Gas used and native bridge fee of past full-balance bridges of the native token, learned from their receipts.
+
+    Every such bridge is stored in the `gas_usage` table under its source chain, destination chain, token pair
+    and the bridge (`tool`) LI.FI routed it through. A bridge is predicted from the receipts of the tool its quoted
+    route goes through: once there are `GAS_MODEL_MIN_SAMPLES` of them that agree within `GAS_MODEL_MAX_SPREAD`,
+    the highest gas used and fee plus `GAS_MODEL_MARGIN` are used instead of simulating the bridge.
+    """
+
+    def __init__(self, storage: Optional[Storage] = None) -> None:
+        self._storage = storage
+
+    @property
+    def storage(self) -> Storage:
+        if self._storage is None:
+            self._storage = get_storage()
+        return self._storage
+
+    def record(
+        self,
+        tx_hash: str,
+        chain: Chain,
+        dest_chain: Chain,
+        tool: Optional[str],
+        token_in: Token,
+        token_out: Token,
+        gas_used: int,
+        fee: int,
+    ) -> None:
+        self.storage.add_gas_usage({
+            "tx_hash": tx_hash,
+            "chain_id": chain.chain_id,
+            "dest_chain_id": dest_chain.chain_id,
+            "tool": tool,
+            "token_in": token_in.contract_address,
+            "token_out": token_out.contract_address,
+            "gas_used": gas_used,
+            "fee": fee,
+            "created_at": time.time(),
+        })
+
+    def has_samples(self, chain: Chain, dest_chain: Chain, token_in: Token, token_out: Token) -> bool:
+        """
+        Whether some tool has enough receipts of the pair to predict a bridge through it, checked before the route
+        that tells the tool is fetched.
+        """
+        samples = self.storage.count_gas_usage(
+            chain_id=chain.chain_id,
+            dest_chain_id=dest_chain.chain_id,
+            token_in=token_in.contract_address,
+            token_out=token_out.contract_address,
+        )
+        return samples >= GAS_MODEL_MIN_SAMPLES
+
+    def predict(
+        self, chain: Chain, dest_chain: Chain, token_in: Token, token_out: Token, tool: Optional[str]
+    ) -> Optional[GasPrediction]:
+        """
+        Returns the expected gas and fee of a bridge through `tool`, or None if the past receipts aren't enough
+        to trust one.
+        """
+        samples = self.storage.get_gas_usage(
+            chain_id=chain.chain_id,
+            dest_chain_id=dest_chain.chain_id,
+            token_in=token_in.contract_address,
+            token_out=token_out.contract_address,
+            tool=tool,
+            limit=GAS_MODEL_SAMPLES,
+        )
+        if len(samples) < GAS_MODEL_MIN_SAMPLES:
+            return None
+
+        gas = [item["gas_used"] for item in samples]
+        fees = [item["fee"] for item in samples]
+        if _spread(gas) > GAS_MODEL_MAX_SPREAD or _spread(fees) > GAS_MODEL_MAX_SPREAD:
+            return None
+        return GasPrediction(gas=int(max(gas) * GAS_MODEL_MARGIN), fee=int(max(fees) * GAS_MODEL_MARGIN), tool=tool)
+
+    def forget(self, chain: Chain, dest_chain: Chain, token_in: Token, token_out: Token, tool: Optional[str]) -> None:
+        """
+        Drops the receipts of a tool after a bridge predicted from them failed, so the next one is simulated again.
+        """
+        logger.debug(f"Gas prediction for {tool} from {chain.name} to {dest_chain.name} failed, forgetting it")
+        self.storage.delete_gas_usage(
+            chain_id=chain.chain_id,
+            dest_chain_id=dest_chain.chain_id,
+            token_in=token_in.contract_address,
+            token_out=token_out.contract_address,
+            tool=tool,
+        )
+
+
+gas_model = GasModel()
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from core.models.chain import Chain
+from logger import logger
+from .constants import HEADS_POLL_INTERVAL, HEADS_STALE_TIMEOUT, HEADS_RESUBSCRIBE_DELAY, HEADS_IDLE_TIMEOUT
+from .providers import get_endpoint_pool, get_w3
+from .websocket import get_websocket
+
+
+@dataclass
+class Head:
+    number: int
+    # only known for heads pushed by a subscription on EIP-1559 chains
+    base_fee: Optional[int] = None
+    received_at: float = 0.0
+
+
+class ChainHeads:
+    """
+    Latest block of one chain, shared by everything that waits for new blocks on it.
+
+    Chains with a `ws`/`wss` endpoint get their heads pushed by one `newHeads` subscription, the rest (and chains
+    whose subscription dropped, until it's back) poll `eth_blockNumber` every `HEADS_POLL_INTERVAL` seconds.
+    The watcher stops once nobody has waited for a block for `HEADS_IDLE_TIMEOUT` seconds.
+    """
+
+    def __init__(self, chain: Chain) -> None:
+        self.chain = chain
+        self.head: Optional[Head] = None
+        self._next: Optional[asyncio.Future] = None
+        self._last_read = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_idle(self) -> bool:
+        return time.monotonic() - self._last_read > HEADS_IDLE_TIMEOUT
+
+    def _push(self, head: Head) -> None:
+        if self.head is not None and head.number <= self.head.number:
+            return
+        self.head = head
+        if self._next is not None and not self._next.done():
+            self._next.set_result(head)
+        self._next = None
+
+    async def _poll(self) -> None:
+        block_number = await get_w3(chain=self.chain).eth.block_number
+        self._push(Head(number=block_number, received_at=time.monotonic()))
+
+    async def _poll_for(self, duration: float) -> None:
+        poll_until = time.monotonic() + duration
+        while time.monotonic() < poll_until and not self.is_idle:
+            try:
+                await self._poll()
+            except Exception as e:
+                logger.debug(f"Couldn't get the latest block on {self.chain.name}: {e}")
+            await asyncio.sleep(HEADS_POLL_INTERVAL)
+
+    async def _follow(self, url: str) -> None:
+        connection = get_websocket(url=url)
+        subscription_id, queue = await connection.subscribe(params=["newHeads"])
+        try:
+            while not self.is_idle:
+                header: Optional[Dict[str, Any]] = await asyncio.wait_for(queue.get(), timeout=HEADS_STALE_TIMEOUT)
+                if header is None:
+                    raise ConnectionError(f"Websocket connection to {url} was closed")
+                base_fee = header.get("baseFeePerGas")
+                self._push(Head(
+                    number=int(header["number"], 16),
+                    base_fee=int(base_fee, 16) if base_fee is not None else None,
+                    received_at=time.monotonic(),
+                ))
+        finally:
+            await connection.unsubscribe(subscription_id)
+
+    async def _run(self) -> None:
+        pool = get_endpoint_pool(chain=self.chain)
+        while not self.is_idle:
+            websockets = [endpoint for endpoint in pool.ranked() if endpoint.is_websocket]
+            if not websockets:
+                await self._poll_for(HEADS_IDLE_TIMEOUT)
+                continue
+
+            try:
+                await self._follow(url=websockets[0].url)
+            except Exception as e:
+                logger.debug(f"New heads subscription on {self.chain.name} failed, polling instead: {e!r}")
+                await self._poll_for(HEADS_RESUBSCRIBE_DELAY)
+        # nobody follows the chain anymore, the next waiter must not get this head as the latest one
+        self.head = None
+
+    async def wait_for_block(self, after: Optional[int] = None, timeout: Optional[float] = None) -> Optional[Head]:
+        """
+        Returns the first head newer than block `after` (the latest head if `after` is None),
+        or None if there was none within `timeout` seconds.
+        """
+        self._last_read = time.monotonic()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        if self.head is not None and (after is None or self.head.number > after):
+            return self.head
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.head is None or (after is not None and self.head.number <= after):
+            if self._next is None:
+                self._next = asyncio.get_running_loop().create_future()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                # shielded, so one waiter timing out doesn't cancel the head everyone else waits for
+                await asyncio.wait_for(asyncio.shield(self._next), timeout=remaining)
+            except asyncio.TimeoutError:
+                return None
+            self._last_read = time.monotonic()
+        return self.head
+
+
+class BlockHeads:
+    def __init__(self) -> None:
+        self._chains: Dict[str, ChainHeads] = {}
+
+    def get(self, chain: Chain) -> ChainHeads:
+        if chain.name not in self._chains:
+            self._chains[chain.name] = ChainHeads(chain=chain)
+        return self._chains[chain.name]
+
+    @staticmethod
+    def is_pushed(chain: Chain) -> bool:
+        return any(endpoint.is_websocket for endpoint in get_endpoint_pool(chain=chain).endpoints)
+
+    def latest(self, chain: Chain) -> Optional[Head]:
+        return self.get(chain).head
+
+    async def wait_for_block(
+        self, chain: Chain, after: Optional[int] = None, timeout: Optional[float] = None
+    ) -> Optional[Head]:
+        return await self.get(chain).wait_for_block(after=after, timeout=timeout)
+
+
+heads = BlockHeads()
@@ -0,0 +1,216 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from eth_typing import ChecksumAddress
+from web3 import AsyncWeb3
+from web3.types import TxReceipt
+
+from config import TX_REPLACEMENT_BLOCKS, TX_REPLACEMENT_FEE_MULTIPLIER, TX_REPLACEMENT_MAX_FEE_MULTIPLIER
+from core.models.chain import Chain
+from logger import logger
+from .cache import TTLCache
+from .constants import GAS_PRICE_MULTIPLIER, RECEIPT_SENT_CACHE_SIZE, TX_REPLACEMENT_MIN_BUMP, VERIFY_TX_TIMEOUT
+from .gas import gas_oracle
+from .heads import heads
+from .receipts import receipt_tracker, TxResult, TX_CONFIRMED, TX_REVERTED, TX_PENDING
+from .storage import Storage, get_storage
+
+FEE_FIELDS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+
+@dataclass
+class SentTransaction:
+    chain: Chain
+    w3: AsyncWeb3
+    private_key: str
+    address: ChecksumAddress
+    params: Dict[str, Any]
+    # hashes of the transaction and its replacements, oldest first
+    hashes: List[str] = field(default_factory=list)
+    initial_fees: Dict[str, int] = field(default_factory=dict)
+    mined_hash: Optional[str] = None
+    receipt: Optional[TxReceipt] = None
+    # set once the fee can't be raised anymore (cap reached, not enough balance for a higher fee)
+    capped: bool = False
+
+    @property
+    def fees(self) -> Dict[str, int]:
+        return {key: self.params[key] for key in FEE_FIELDS if key in self.params}
+
+
+class TxLifecycleManager:
+    """
+    Follows every transaction sent by a client from broadcast until one transaction with its nonce is mined.
+
+    A transaction without a receipt for `TX_REPLACEMENT_BLOCKS` new blocks is signed again with the same nonce and
+    its fees raised by `TX_REPLACEMENT_FEE_MULTIPLIER` (or to the current fees if they're higher), at most to
+    `TX_REPLACEMENT_MAX_FEE_MULTIPLIER` times the fees it was first sent with. Every replacement is stored in the
+    `tx_replacements` table, and whichever of the transactions gets mined decides the result.
+    """
+
+    def __init__(self, storage: Optional[Storage] = None) -> None:
+        self._storage = storage
+        self._sent = TTLCache(maxsize=RECEIPT_SENT_CACHE_SIZE, ttl=VERIFY_TX_TIMEOUT * 2)
+
+    @property
+    def storage(self) -> Storage:
+        if self._storage is None:
+            self._storage = get_storage()
+        return self._storage
+
+    def track(
+        self, chain: Chain, w3: AsyncWeb3, private_key: str, address: ChecksumAddress, tx_hash: str, tx_params: dict
+    ) -> None:
+        receipt_tracker.register(chain=chain, tx_hash=tx_hash, address=address, nonce=tx_params["nonce"])
+        tx = SentTransaction(
+            chain=chain, w3=w3, private_key=private_key, address=address, params=dict(tx_params), hashes=[tx_hash]
+        )
+        tx.initial_fees = tx.fees
+        self._sent.set((chain.name, tx_hash), tx)
+
+    def get_mined_hash(self, chain: Chain, tx_hash: str) -> str:
+        """
+        Returns the hash of the replacement that was mined instead of the transaction, or its own hash.
+        """
+        tx: Optional[SentTransaction] = self._sent.get((chain.name, tx_hash))
+        if tx is None or tx.mined_hash is None:
+            return tx_hash
+        return tx.mined_hash
+
+    def get_nonce(self, chain: Chain, tx_hash: str) -> Optional[int]:
+        tx: Optional[SentTransaction] = self._sent.get((chain.name, tx_hash))
+        return tx.params["nonce"] if tx is not None else None
+
+    def get_receipt(self, chain: Chain, tx_hash: str) -> Optional[TxReceipt]:
+        tx: Optional[SentTransaction] = self._sent.get((chain.name, tx_hash))
+        return tx.receipt if tx is not None else None
+
+    async def _bumped_fees(self, tx: SentTransaction) -> Optional[Dict[str, int]]:
+        current = await gas_oracle.get_fee_params(chain=tx.chain, gas_price_multiplier=GAS_PRICE_MULTIPLIER)
+        multiplier = max(TX_REPLACEMENT_FEE_MULTIPLIER, TX_REPLACEMENT_MIN_BUMP)
+
+        fees = {}
+        for key, value in tx.fees.items():
+            cap = int(tx.initial_fees[key] * TX_REPLACEMENT_MAX_FEE_MULTIPLIER)
+            fees[key] = min(max(int(value * multiplier), current.get(key, 0)), cap)
+            # nodes only accept a replacement that raises every fee by at least TX_REPLACEMENT_MIN_BUMP
+            if fees[key] < value * TX_REPLACEMENT_MIN_BUMP:
+                return None
+
+        if "maxFeePerGas" in fees and fees["maxPriorityFeePerGas"] > fees["maxFeePerGas"]:
+            fees["maxPriorityFeePerGas"] = fees["maxFeePerGas"]
+        return fees
+
+    async def _replace(self, tx: SentTransaction) -> None:
+        old_hash = tx.hashes[-1]
+        try:
+            fees = await self._bumped_fees(tx)
+            if fees is None:
+                tx.capped = True
+                logger.warning(f"Transaction {old_hash} is stuck, but its fee is already at the replacement cap")
+                return
+
+            params = {**tx.params, **fees}
+            signed_tx = tx.w3.eth.account.sign_transaction(params, tx.private_key)
+        except Exception as e:
+            # the stuck transaction may still be mined, it's replaced after the next TX_REPLACEMENT_BLOCKS blocks
+            logger.warning(f"Couldn't prepare a replacement of stuck transaction {old_hash}: {e}")
+            return
+
+        try:
+            tx_hash = tx.w3.to_hex(await tx.w3.eth.send_raw_transaction(signed_tx.rawTransaction))
+        except Exception as e:
+            message = str(e).lower()
+            if "underpriced" in message:
+                # the node wants an even higher fee, the next replacement starts from this one
+                tx.params.update(fees)
+            elif "nonce too low" not in message and "already known" not in message:
+                # e.g. not enough balance to pay for the higher fee
+                tx.capped = True
+            logger.warning(f"Couldn't replace stuck transaction {old_hash}: {e}")
+            return
+
+        tx.params = params
+        tx.hashes.append(tx_hash)
+        receipt_tracker.register(chain=tx.chain, tx_hash=tx_hash, address=tx.address, nonce=params["nonce"])
+        try:
+            self.storage.add_tx_replacement({
+                "tx_hash": tx_hash,
+                "replaced_tx_hash": old_hash,
+                "address": tx.address,
+                "chain_id": tx.chain.chain_id,
+                "nonce": params["nonce"],
+                "fees": fees,
+                "created_at": time.time(),
+            })
+        except Exception as e:
+            logger.error(f"Couldn't store the replacement of {old_hash}: {e}")
+        logger.warning(
+            f"Transaction {old_hash} wasn't mined in {TX_REPLACEMENT_BLOCKS} blocks, "
+            f"replaced it with {tx.chain.explorer}tx/{tx_hash} at a higher fee"
+        )
+
+    @staticmethod
+    async def _wait_blocks(chain: Chain, blocks: int) -> None:
+        head = await heads.wait_for_block(chain=chain)
+        target = head.number + blocks
+        while head.number < target:
+            head = await heads.wait_for_block(chain=chain, after=head.number)
+
+    async def wait_for_receipt(self, chain: Chain, tx_hash: str, timeout: Optional[float] = None) -> TxResult:
+        """
+        Waits for the transaction or one of its replacements to be mined, replacing it while it's stuck.
+        Returns a TX_PENDING result if none of them was mined, replaced or dropped within `timeout` seconds.
+        """
+        tx: Optional[SentTransaction] = self._sent.get((chain.name, tx_hash))
+        if tx is None:
+            return await receipt_tracker.wait_for_receipt(chain=chain, tx_hash=tx_hash, timeout=timeout)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waits: Dict[str, asyncio.Task] = {}
+        stuck: Optional[asyncio.Task] = None
+        result = TxResult(status=TX_PENDING)
+        try:
+            while True:
+                for item in tx.hashes:
+                    if item not in waits:
+                        waits[item] = asyncio.create_task(receipt_tracker.wait_for_receipt(chain=chain, tx_hash=item))
+                if stuck is None and not tx.capped and TX_REPLACEMENT_BLOCKS > 0:
+                    stuck = asyncio.create_task(self._wait_blocks(chain=chain, blocks=TX_REPLACEMENT_BLOCKS))
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return TxResult(status=TX_PENDING)
+                pending = [task for task in waits.values() if not task.done()]
+                if stuck is not None:
+                    pending.append(stuck)
+                await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+
+                for item, task in waits.items():
+                    if not task.done():
+                        continue
+                    result = task.result()
+                    if result.status in (TX_CONFIRMED, TX_REVERTED):
+                        tx.mined_hash = item
+                        tx.receipt = result.receipt
+                        return result
+                # every transaction with the nonce was replaced by someone else or dropped
+                if all(task.done() for task in waits.values()):
+                    return result
+
+                if stuck is not None and stuck.done():
+                    stuck = None
+                    # a failed replacement never ends the wait, the sent transactions may still be mined
+                    try:
+                        await self._replace(tx)
+                    except Exception as e:
+                        logger.warning(f"Couldn't replace stuck transaction {tx.hashes[-1]}: {e}")
+        finally:
+            for task in [*waits.values(), stuck]:
+                if task is not None and not task.done():
+                    task.cancel()
+
+
+tx_manager = TxLifecycleManager()
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
 
 
 @dataclass
@@ -8,7 +8,9 @@ class Chain:
     chain_id: int
     coin_symbol: str
     explorer: str
-    rpc: str
+    rpcs: List[str]
     tokens: dict
     okx_chain_name: Optional[str] = None
     okx_withdrawal_fee: Optional[str] = None
+    eip1559: bool = False
+    multicall_address: Optional[str] = None
@@ -0,0 +1,116 @@
+import asyncio
+from typing import List, Optional, Sequence, Tuple
+
+from eth_abi import decode, encode
+from eth_typing import ChecksumAddress
+from web3 import AsyncWeb3
+
+from core.models.chain import Chain
+from core.models.token import Token
+from logger import logger
+from .constants import (
+    MULTICALL_AGGREGATE3_SELECTOR,
+    MULTICALL_GET_ETH_BALANCE_SELECTOR,
+    MULTICALL_BATCH_SIZE,
+)
+from .erc20 import encode_address_call, get_erc20
+from .providers import get_w3
+from .rpc import send_rpc_batch
+
+BalanceRequest = Tuple[ChecksumAddress, Token]
+
+
+def _encode_balance_call(chain: Chain, address: ChecksumAddress, token: Token) -> str:
+    if token.is_native:
+        return encode_address_call(MULTICALL_GET_ETH_BALANCE_SELECTOR, address)
+    return get_erc20(chain=chain, token=token).encode_balance_of(address)
+
+
+def _chunks(items: Sequence, size: int) -> List[Sequence]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def _get_balances_multicall(w3: AsyncWeb3, chain: Chain, requests: Sequence[BalanceRequest]) -> List[Optional[int]]:
+    calls = [
+        (
+            chain.multicall_address if token.is_native else token.contract_address,
+            True,
+            bytes.fromhex(_encode_balance_call(chain=chain, address=address, token=token)[2:]),
+        )
+        for address, token in requests
+    ]
+
+    data = MULTICALL_AGGREGATE3_SELECTOR + encode(["(address,bool,bytes)[]"], [calls]).hex()
+    response = await w3.eth.call({"to": AsyncWeb3.to_checksum_address(chain.multicall_address), "data": data})
+    (results,) = decode(["(bool,bytes)[]"], bytes(response))
+
+    return [
+        decode(["uint256"], return_data)[0] if success and len(return_data) >= 32 else None
+        for success, return_data in results
+    ]
+
+
+async def _get_balances_rpc_batch(
+    chain: Chain, requests: Sequence[BalanceRequest], proxy: Optional[str]
+) -> List[Optional[int]]:
+    calls = []
+    for address, token in requests:
+        if token.is_native:
+            calls.append(("eth_getBalance", [address, "latest"]))
+        else:
+            data = _encode_balance_call(chain=chain, address=address, token=token)
+            calls.append(("eth_call", [{"to": token.contract_address, "data": data}, "latest"]))
+
+    results = await send_rpc_batch(chain=chain, calls=calls, proxy=proxy)
+    return [int(result, 16) if result not in (None, "0x") else None for result in results]
+
+
+async def _get_balance(w3: AsyncWeb3, chain: Chain, address: ChecksumAddress, token: Token) -> Optional[int]:
+    try:
+        if token.is_native:
+            return await w3.eth.get_balance(address)
+        contract = get_erc20(chain=chain, token=token)
+        return contract.decode_uint(
+            await w3.eth.call({"to": contract.address, "data": contract.encode_balance_of(address)})
+        )
+    except Exception as e:
+        logger.debug(f"Couldn't get balance of {token} for {address}: {e}")
+        return None
+
+
+async def _get_balances_chunk(
+    w3: AsyncWeb3, chain: Chain, requests: Sequence[BalanceRequest], proxy: Optional[str]
+) -> List[Optional[int]]:
+    if chain.multicall_address:
+        try:
+            return await _get_balances_multicall(w3=w3, chain=chain, requests=requests)
+        except Exception as e:
+            logger.debug(f"Multicall balance read failed on {chain.name}, falling back to batch request: {e}")
+
+    try:
+        return await _get_balances_rpc_batch(chain=chain, requests=requests, proxy=proxy)
+    except Exception as e:
+        logger.debug(f"Batch balance read failed on {chain.name}, falling back to single calls: {e}")
+
+    return list(await asyncio.gather(*[_get_balance(w3, chain, address, token) for address, token in requests]))
+
+
+async def get_balances(
+    chain: Chain,
+    requests: Sequence[BalanceRequest],
+    proxy: Optional[str] = None,
+    batch_size: int = MULTICALL_BATCH_SIZE,
+) -> List[Optional[int]]:
+    """
+    Reads native and ERC-20 balances of many `(address, token)` pairs on one chain.
+
+    Uses one Multicall3 `aggregate3` call per `batch_size` pairs where Multicall3 is deployed, a JSON-RPC
+    batch request otherwise, and single calls for endpoints that reject batches. Balances that couldn't be
+    read are returned as None.
+    """
+    w3 = get_w3(chain=chain, proxy=proxy)
+    chunks = _chunks(requests, batch_size)
+    results = await asyncio.gather(*[
+        _get_balances_chunk(w3=w3, chain=chain, requests=chunk, proxy=proxy) for chunk in chunks
+    ])
+    return [balance for chunk_result in results for balance in chunk_result]
@@ -0,0 +1,81 @@
+import asyncio
+from typing import Dict, Tuple, Union
+
+from eth_typing import ChecksumAddress
+from web3 import AsyncWeb3
+
+from logger import logger
+
+# errors after which the locally assigned nonce can no longer be trusted
+NONCE_ERRORS = (
+    "nonce too low",
+    "nonce too high",
+    "replacement transaction underpriced",
+    "invalid nonce",
+)
+# the node already has the very same signed transaction in its mempool
+ALREADY_KNOWN_ERRORS = ("already known", "known transaction", "already imported")
+
+
+def is_nonce_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(nonce_error in message for nonce_error in NONCE_ERRORS)
+
+
+def is_already_known(error: Union[Exception, str]) -> bool:
+    message = str(error).lower()
+    return any(known_error in message for known_error in ALREADY_KNOWN_ERRORS)
+
+
+def is_nonce_too_low(error: Union[Exception, str]) -> bool:
+    return "nonce too low" in str(error).lower()
+
+
+class NonceManager:
+    """
+    Fetches the pending nonce of an (address, chain) pair once and then hands out nonces locally,
+    so several transactions of one wallet can be signed back-to-back without extra rpc round trips.
+    """
+
+    def __init__(self) -> None:
+        self._nonces: Dict[Tuple[ChecksumAddress, int], int] = {}
+        self._locks: Dict[Tuple[ChecksumAddress, int], asyncio.Lock] = {}
+
+    def _get_lock(self, key: Tuple[ChecksumAddress, int]) -> asyncio.Lock:
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    async def get_nonce(self, w3: AsyncWeb3, address: ChecksumAddress, chain_id: int) -> int:
+        key = (address, chain_id)
+        async with self._get_lock(key):
+            if key not in self._nonces:
+                self._nonces[key] = await w3.eth.get_transaction_count(address, "pending")
+            nonce = self._nonces[key]
+            self._nonces[key] = nonce + 1
+            return nonce
+
+    def release(self, address: ChecksumAddress, chain_id: int, nonce: int) -> None:
+        """
+        Gives a nonce back if the transaction that reserved it was never broadcast.
+        """
+        key = (address, chain_id)
+        if self._nonces.get(key) == nonce + 1:
+            self._nonces[key] = nonce
+        else:
+            self.reset(address=address, chain_id=chain_id)
+
+    def reuse(self, address: ChecksumAddress, chain_id: int, nonce: int) -> None:
+        """
+        Hands `nonce` out again next, so the next transaction replaces the stuck one that holds it.
+        """
+        key = (address, chain_id)
+        if key not in self._nonces or self._nonces[key] > nonce:
+            self._nonces[key] = nonce
+
+    def reset(self, address: ChecksumAddress, chain_id: int) -> None:
+        if self._nonces.pop((address, chain_id), None) is not None:
+            logger.debug(f"Nonce of {address} on chain {chain_id} will be resynced")
+
+
+nonce_manager = NonceManager()
@@ -0,0 +1,312 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, List, Optional, Set, Tuple, TypeVar
+
+from aiohttp import ClientTimeout
+from eth_utils import keccak
+from web3 import AsyncWeb3
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from core.models.chain import Chain
+from logger import logger
+from .constants import (
+    RPC_LATENCY_WINDOW,
+    RPC_DEFAULT_LATENCY,
+    RPC_ERROR_PENALTY,
+    RPC_HEDGE_MIN_DELAY,
+    RPC_HEDGE_MAX_DELAY,
+    RPC_BREAKER_FAILURES,
+    RPC_BREAKER_COOLDOWN,
+    RPC_BREAKER_MAX_COOLDOWN,
+    RPC_REQUEST_TIMEOUT,
+    RPC_WRITE_METHODS,
+)
+from .exceptions import NoRPCEndpointSpecifiedError, RPCRateLimitedError
+from .nonce import is_already_known, is_nonce_too_low
+from .sessions import sessions
+from .websocket import get_websocket, is_websocket_url
+
+T = TypeVar("T")
+
+# json-rpc error codes some public endpoints answer with instead of http 429
+RATE_LIMIT_ERROR_CODES = (-32005, -32090, 429)
+RPC_REQUEST_HEADERS = {"Content-Type": "application/json"}
+
+
+class EndpointStats:
+    """
+    Health of one rpc endpoint: recent latencies and outcomes, and a circuit breaker that takes it out of rotation
+    after `RPC_BREAKER_FAILURES` failures in a row.
+    """
+
+    def __init__(self, chain: Chain, url: str) -> None:
+        self.chain = chain
+        self.url = url
+        self.latencies: Deque[float] = deque(maxlen=RPC_LATENCY_WINDOW)
+        self.outcomes: Deque[bool] = deque(maxlen=RPC_LATENCY_WINDOW)
+        self.consecutive_failures = 0
+        self.cooldown = RPC_BREAKER_COOLDOWN
+        self.open_until = 0.0
+
+    @property
+    def is_websocket(self) -> bool:
+        return is_websocket_url(self.url)
+
+    def quantile(self, q: float) -> float:
+        if not self.latencies:
+            return RPC_DEFAULT_LATENCY
+        latencies = sorted(self.latencies)
+        return latencies[min(math.ceil(q * len(latencies)) - 1, len(latencies) - 1)]
+
+    @property
+    def p50(self) -> float:
+        return self.quantile(0.5)
+
+    @property
+    def p95(self) -> float:
+        return self.quantile(0.95)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    @property
+    def score(self) -> float:
+        # a failed request costs another round trip to a different endpoint and often a timeout before it
+        return self.p50 + self.error_rate * RPC_ERROR_PENALTY
+
+    @property
+    def hedge_delay(self) -> float:
+        return min(max(self.p95, RPC_HEDGE_MIN_DELAY), RPC_HEDGE_MAX_DELAY)
+
+    def is_available(self, now: float) -> bool:
+        return self.open_until <= now
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        self.cooldown = RPC_BREAKER_COOLDOWN
+
+    def record_failure(self, error: Exception) -> None:
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        if self.consecutive_failures < RPC_BREAKER_FAILURES:
+            return
+
+        # the first failure after a cooldown opens the breaker again, for twice as long
+        self.open_until = time.monotonic() + self.cooldown
+        logger.warning(
+            f"RPC {self.url} of {self.chain.name.upper()} failed {self.consecutive_failures} times in a row ({error}), "
+            f"taking it out of rotation for {self.cooldown}s"
+        )
+        self.cooldown = min(self.cooldown * 2, RPC_BREAKER_MAX_COOLDOWN)
+
+    async def measure(self, request: Awaitable[T]) -> T:
+        started_at = time.monotonic()
+        try:
+            result = await request
+        except asyncio.CancelledError:
+            # a hedged request that lost the race after taking longer than usual took at least this long,
+            # one that was only just sent says nothing about the endpoint
+            latency = time.monotonic() - started_at
+            if latency > self.p50:
+                self.latencies.append(latency)
+            raise
+        except Exception as e:
+            self.record_failure(error=e)
+            raise
+        self.record_success(latency=time.monotonic() - started_at)
+        return result
+
+
+class RPCEndpointPool:
+    """
+    All rpc endpoints of one chain, shared by every provider of the chain regardless of its proxy.
+    """
+
+    def __init__(self, chain: Chain) -> None:
+        if not chain.rpcs:
+            raise NoRPCEndpointSpecifiedError(chain=chain)
+        self.chain = chain
+        self.endpoints = [EndpointStats(chain=chain, url=url) for url in chain.rpcs]
+
+    def ranked(self) -> List[EndpointStats]:
+        """
+        Endpoints from the healthiest to the least healthy one, without those whose breaker is open.
+        If every breaker is open, all of them are returned, the one that opened first going first.
+        """
+        now = time.monotonic()
+        available = [endpoint for endpoint in self.endpoints if endpoint.is_available(now)]
+        if not available:
+            return sorted(self.endpoints, key=lambda endpoint: endpoint.open_until)
+        return sorted(available, key=lambda endpoint: endpoint.score)
+
+
+_POOLS: Dict[str, RPCEndpointPool] = {}
+
+
+def get_endpoint_pool(chain: Chain) -> RPCEndpointPool:
+    if chain.name not in _POOLS:
+        _POOLS[chain.name] = RPCEndpointPool(chain=chain)
+    return _POOLS[chain.name]
+
+
+def is_rate_limited(response: RPCResponse) -> bool:
+    error = response.get("error")
+    if not isinstance(error, dict):
+        return False
+    message = str(error.get("message", "")).lower()
+    return error.get("code") in RATE_LIMIT_ERROR_CODES or "rate limit" in message or "too many requests" in message
+
+
+class PooledProvider(AsyncJSONBaseProvider):
+    """
+    Sends every request to the healthiest endpoint of the pool and fails over to the next one on errors.
+
+    Reads that take longer than the p95 latency of their endpoint are also sent to the next endpoint and the first
+    answer wins. Writes are never hedged, they only fail over, and a signed transaction only once it's known that
+    the failed endpoint didn't broadcast it. `ws`/`wss` endpoints are reached through one persistent connection per
+    endpoint and proxy, the rest over http through the shared session of the proxy.
+    """
+
+    def __init__(self, pool: RPCEndpointPool, proxy: Optional[str] = None) -> None:
+        super().__init__()
+        self.pool = pool
+        self.proxy = proxy
+
+    def __str__(self) -> str:
+        return f"RPC pool of {self.pool.chain.name.upper()}"
+
+    async def _post(self, url: str, method: RPCEndpoint, params: Any) -> RPCResponse:
+        session = sessions.get_session(proxy=self.proxy)
+        async with session.post(
+            url=url,
+            data=self.encode_rpc_request(method, params),
+            headers=RPC_REQUEST_HEADERS,
+            timeout=ClientTimeout(total=RPC_REQUEST_TIMEOUT),
+        ) as response:
+            response.raise_for_status()
+            return self.decode_rpc_response(await response.read())
+
+    async def _send(self, endpoint: EndpointStats, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if endpoint.is_websocket:
+            response = await get_websocket(url=endpoint.url, proxy=self.proxy).request(method=method, params=params)
+        else:
+            response = await self._post(url=endpoint.url, method=method, params=params)
+        if is_rate_limited(response):
+            raise RPCRateLimitedError(url=endpoint.url)
+        return response
+
+    async def _request(self, endpoint: EndpointStats, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return await endpoint.measure(self._send(endpoint=endpoint, method=method, params=params))
+
+    async def _failover(self, endpoints: List[EndpointStats], method: RPCEndpoint, params: Any) -> RPCResponse:
+        error: Optional[Exception] = None
+        for endpoint in endpoints:
+            try:
+                return await self._request(endpoint=endpoint, method=method, params=params)
+            except Exception as e:
+                error = e
+        raise error
+
+    async def _send_raw_transaction(self, endpoints: List[EndpointStats], params: Any) -> RPCResponse:
+        """
+        Broadcasts a signed transaction, failing over to the next endpoint only when it's safe.
+
+        An endpoint that timed out or dropped the connection may have broadcast the transaction anyway. The next
+        endpoint is first asked for it by its hash and only gets it if it doesn't know it. "already known" and
+        "nonce too low" answers of such a resend mean the first broadcast went through. Every success answers
+        with the hash of the transaction.
+        """
+        method = RPCEndpoint("eth_sendRawTransaction")
+        tx_hash = "0x" + keccak(hexstr=params[0]).hex()
+        ambiguous = False
+        error: Optional[Exception] = None
+        for endpoint in endpoints:
+            try:
+                if ambiguous:
+                    lookup = await self._request(
+                        endpoint=endpoint, method=RPCEndpoint("eth_getTransactionByHash"), params=[tx_hash]
+                    )
+                    if lookup.get("result"):
+                        return {"jsonrpc": "2.0", "id": lookup.get("id"), "result": tx_hash}
+
+                response = await self._request(endpoint=endpoint, method=method, params=params)
+                if ambiguous and "error" in response:
+                    message = str(response["error"]).lower()
+                    if is_already_known(message) or is_nonce_too_low(message):
+                        return {"jsonrpc": "2.0", "id": response.get("id"), "result": tx_hash}
+                return response
+            except RPCRateLimitedError as e:
+                # refused before the node looked at the transaction
+                error = e
+            except Exception as e:
+                error = e
+                ambiguous = True
+        raise error
+
+    async def _hedged(self, endpoints: List[EndpointStats], method: RPCEndpoint, params: Any) -> RPCResponse:
+        queue = list(endpoints)
+        pending: Set[asyncio.Task] = set()
+        error: Optional[BaseException] = None
+        try:
+            while queue or pending:
+                hedge_delay = None
+                if queue and len(pending) < 2:
+                    endpoint = queue.pop(0)
+                    pending.add(asyncio.create_task(self._request(endpoint=endpoint, method=method, params=params)))
+                    # a slow request gets a second one next to it, a failed one is replaced right away
+                    if queue and len(pending) < 2:
+                        hedge_delay = endpoint.hedge_delay
+
+                done, pending = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                responses = []
+                for task in done:
+                    if task.exception() is None:
+                        responses.append(task.result())
+                    else:
+                        error = task.exception()
+                if responses:
+                    return responses[0]
+        finally:
+            for task in pending:
+                task.cancel()
+        raise error
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        endpoints = self.pool.ranked()
+        if method == "eth_sendRawTransaction":
+            return await self._send_raw_transaction(endpoints=endpoints, params=params)
+        if method in RPC_WRITE_METHODS or len(endpoints) == 1:
+            return await self._failover(endpoints=endpoints, method=method, params=params)
+        return await self._hedged(endpoints=endpoints, method=method, params=params)
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        try:
+            response = await self.make_request(RPCEndpoint("web3_clientVersion"), [])
+        except Exception:
+            if show_traceback:
+                raise
+            return False
+        return "error" not in response
+
+
+# providers are shared by every client that talks to the same chain through the same proxy
+_W3_CACHE: Dict[Tuple[str, Optional[str]], AsyncWeb3] = {}
+
+
+def get_w3(chain: Chain, proxy: Optional[str] = None) -> AsyncWeb3:
+    cache_key = (chain.name, proxy)
+    if cache_key not in _W3_CACHE:
+        w3 = AsyncWeb3(PooledProvider(pool=get_endpoint_pool(chain=chain), proxy=proxy))
+        # it asks the node for eth_chainId before every eth_call and eth_estimateGas only to compare it with the
+        # chainId of the transaction, which is taken from the Chain model anyway
+        w3.middleware_onion.remove("validation")
+        _W3_CACHE[cache_key] = w3
+    return _W3_CACHE[cache_key]
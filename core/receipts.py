@@ -0,0 +1,244 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from eth_typing import ChecksumAddress
+from web3.datastructures import AttributeDict
+from web3.types import TxReceipt
+
+from core.models.chain import Chain
+from logger import logger
+from .cache import TTLCache
+from .exceptions import RPCBatchNotSupportedError
+from .constants import (
+    MULTICALL_BATCH_SIZE,
+    RECEIPT_CHECK_INTERVAL,
+    RECEIPT_LOST_CHECKS,
+    RECEIPT_LOST_MIN_TIME,
+    RECEIPT_DROPPED_MIN_AGE,
+    RECEIPT_SENT_CACHE_SIZE,
+    VERIFY_TX_TIMEOUT,
+)
+from .heads import heads
+from .nonce import nonce_manager
+from .providers import get_w3
+from .rpc import send_rpc_batch
+
+TX_PENDING = "PENDING"
+TX_CONFIRMED = "CONFIRMED"
+TX_REVERTED = "REVERTED"
+# the nonce of the transaction was used by another transaction of the same sender
+TX_REPLACED = "REPLACED"
+# the node doesn't know the transaction anymore and its nonce is still free
+TX_DROPPED = "DROPPED"
+
+# receipt fields that nodes send as hex quantities
+RECEIPT_QUANTITY_FIELDS = (
+    "blockNumber",
+    "cumulativeGasUsed",
+    "effectiveGasPrice",
+    "gasUsed",
+    "status",
+    "transactionIndex",
+    "type",
+    "blobGasUsed",
+    "blobGasPrice",
+)
+
+
+def format_receipt(receipt: Dict[str, Any]) -> TxReceipt:
+    """
+    Turns a raw `eth_getTransactionReceipt` result into a receipt with integer quantities,
+    like the one `w3.eth.get_transaction_receipt` returns.
+    """
+    formatted = dict(receipt)
+    for key in RECEIPT_QUANTITY_FIELDS:
+        if isinstance(formatted.get(key), str):
+            formatted[key] = int(formatted[key], 16)
+    return AttributeDict(formatted)
+
+
+@dataclass
+class TxResult:
+    status: str
+    receipt: Optional[TxReceipt] = None
+
+
+@dataclass
+class SentTx:
+    address: ChecksumAddress
+    nonce: int
+    sent_at: float
+
+
+@dataclass
+class PendingReceipt:
+    tx_hash: str
+    sent: Optional[SentTx]
+    futures: List[asyncio.Future] = field(default_factory=list)
+    added_at: float = 0.0
+    # checks in a row that found the nonce used without a receipt / didn't find the transaction at all,
+    # and when the first of them happened
+    replaced_checks: int = 0
+    replaced_since: float = 0.0
+    unknown_checks: int = 0
+    unknown_since: float = 0.0
+
+    @property
+    def sent_at(self) -> float:
+        return self.sent.sent_at if self.sent is not None else self.added_at
+
+
+class ChainReceiptTracker:
+    """
+    Waits for the receipts of every pending transaction on one chain together.
+
+    On every new head all pending receipts are asked for in one batch request, along with the latest nonce of each
+    sender and, for transactions older than `RECEIPT_DROPPED_MIN_AGE`, the transaction itself. A transaction whose
+    nonce was used by another one is reported as replaced, one the node forgot while its nonce is still free as
+    dropped, so nobody waits for a receipt that will never come. Both have to be seen on `RECEIPT_LOST_CHECKS`
+    blocks in a row spanning at least `RECEIPT_LOST_MIN_TIME` seconds, since the answers may come from nodes
+    at different heights.
+    """
+
+    def __init__(self, chain: Chain) -> None:
+        self.chain = chain
+        self._pending: Dict[str, PendingReceipt] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, tx_hash: str, sent: Optional[SentTx]) -> asyncio.Future:
+        if tx_hash not in self._pending:
+            self._pending[tx_hash] = PendingReceipt(tx_hash=tx_hash, sent=sent, added_at=time.monotonic())
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tx_hash].futures.append(future)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    def _resolve(self, tx_hash: str, result: TxResult) -> None:
+        pending = self._pending.pop(tx_hash, None)
+        if pending is None:
+            return
+        if result.status in (TX_REPLACED, TX_DROPPED) and pending.sent is not None:
+            # later transactions of the sender were signed with nonces after this one
+            nonce_manager.reset(address=pending.sent.address, chain_id=self.chain.chain_id)
+        for future in pending.futures:
+            if not future.done():
+                future.set_result(result)
+
+    async def _request(self, calls: List[Tuple[str, list]]) -> List[Any]:
+        results = []
+        for i in range(0, len(calls), MULTICALL_BATCH_SIZE):
+            chunk = calls[i:i + MULTICALL_BATCH_SIZE]
+            try:
+                results.extend(await send_rpc_batch(chain=self.chain, calls=chunk))
+                continue
+            except RPCBatchNotSupportedError:
+                pass
+            except Exception as e:
+                logger.debug(f"Batch receipt check failed on {self.chain.name}, sending single requests: {e}")
+
+            provider = get_w3(chain=self.chain).provider
+            # a failed request would look like a missing receipt or an unknown transaction, so the check fails instead
+            responses = await asyncio.gather(*[provider.make_request(method, params) for method, params in chunk])
+            results.extend(response.get("result") for response in responses)
+        return results
+
+    async def _check(self) -> None:
+        now = time.monotonic()
+        pending = list(self._pending.values())
+        senders = list({item.sent.address for item in pending if item.sent is not None})
+        suspects = [item for item in pending if now - item.sent_at >= RECEIPT_DROPPED_MIN_AGE]
+
+        results = await self._request(
+            [("eth_getTransactionReceipt", [item.tx_hash]) for item in pending]
+            + [("eth_getTransactionCount", [address, "latest"]) for address in senders]
+            + [("eth_getTransactionByHash", [item.tx_hash]) for item in suspects]
+        )
+        receipts = dict(zip([item.tx_hash for item in pending], results[:len(pending)]))
+        nonces = dict(zip(senders, results[len(pending):len(pending) + len(senders)]))
+        known = dict(zip([item.tx_hash for item in suspects], results[len(pending) + len(senders):]))
+
+        for item in pending:
+            receipt = receipts.get(item.tx_hash)
+            if receipt is not None:
+                receipt = format_receipt(receipt)
+                status = TX_CONFIRMED if receipt.get("status") == 1 else TX_REVERTED
+                self._resolve(item.tx_hash, TxResult(status=status, receipt=receipt))
+                continue
+
+            latest_nonce = nonces.get(item.sent.address) if item.sent is not None else None
+            if latest_nonce is not None and int(latest_nonce, 16) > item.sent.nonce:
+                if item.replaced_checks == 0:
+                    item.replaced_since = now
+                item.replaced_checks += 1
+                if item.replaced_checks >= RECEIPT_LOST_CHECKS and now - item.replaced_since >= RECEIPT_LOST_MIN_TIME:
+                    self._resolve(item.tx_hash, TxResult(status=TX_REPLACED))
+                continue
+            item.replaced_checks = 0
+
+            if item.tx_hash in known and known[item.tx_hash] is None:
+                if item.unknown_checks == 0:
+                    item.unknown_since = now
+                item.unknown_checks += 1
+                if item.unknown_checks >= RECEIPT_LOST_CHECKS and now - item.unknown_since >= RECEIPT_LOST_MIN_TIME:
+                    self._resolve(item.tx_hash, TxResult(status=TX_DROPPED))
+            else:
+                item.unknown_checks = 0
+
+    async def _run(self) -> None:
+        checked_block = None
+        while self._pending:
+            # transactions nobody waits for anymore (e.g. timed out) are not checked anymore
+            for tx_hash, item in list(self._pending.items()):
+                item.futures = [future for future in item.futures if not future.done()]
+                if not item.futures:
+                    del self._pending[tx_hash]
+            if not self._pending:
+                break
+
+            head = await heads.wait_for_block(chain=self.chain, after=checked_block, timeout=VERIFY_TX_TIMEOUT)
+            if head is None:
+                continue
+            try:
+                await self._check()
+                checked_block = head.number
+            except Exception as e:
+                logger.debug(f"Receipt check failed on {self.chain.name}: {e}")
+            # chains with sub-second blocks are still checked only once per interval
+            await asyncio.sleep(RECEIPT_CHECK_INTERVAL)
+
+
+class ReceiptTracker:
+    def __init__(self) -> None:
+        self._trackers: Dict[str, ChainReceiptTracker] = {}
+        self._sent = TTLCache(maxsize=RECEIPT_SENT_CACHE_SIZE, ttl=VERIFY_TX_TIMEOUT * 2)
+
+    def _get_tracker(self, chain: Chain) -> ChainReceiptTracker:
+        if chain.name not in self._trackers:
+            self._trackers[chain.name] = ChainReceiptTracker(chain=chain)
+        return self._trackers[chain.name]
+
+    def register(self, chain: Chain, tx_hash: str, address: ChecksumAddress, nonce: int) -> None:
+        """
+        Remembers the sender and nonce of a broadcast transaction, so a replaced or dropped one can be told apart.
+        """
+        self._sent.set((chain.name, tx_hash), SentTx(address=address, nonce=nonce, sent_at=time.monotonic()))
+
+    async def wait_for_receipt(self, chain: Chain, tx_hash: str, timeout: Optional[float] = None) -> TxResult:
+        """
+        Waits for the transaction to be mined, replaced or dropped.
+        Returns a TX_PENDING result if none of that happened within `timeout` seconds.
+        """
+        sent = self._sent.get((chain.name, tx_hash))
+        future = self._get_tracker(chain).watch(tx_hash=tx_hash, sent=sent)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            return TxResult(status=TX_PENDING)
+
+
+receipt_tracker = ReceiptTracker()
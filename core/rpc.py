@@ -0,0 +1,54 @@
+from typing import Any, List, Optional, Tuple
+
+from core.models.chain import Chain
+from .exceptions import RPCBatchNotSupportedError
+from .providers import get_endpoint_pool
+from .sessions import sessions
+
+
+async def send_rpc_batch(
+    chain: Chain,
+    calls: List[Tuple[str, list]],
+    proxy: Optional[str] = None,
+) -> List[Any]:
+    """
+    Sends all `(method, params)` calls to the healthiest chain rpc as one JSON-RPC batch request and returns
+    their results in the same order (None for calls that returned an error).
+
+    Raises RPCBatchNotSupportedError if no http endpoint answers with a batch response.
+    """
+    if not calls:
+        return []
+
+    payload = [
+        {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        for request_id, (method, params) in enumerate(calls)
+    ]
+    session = sessions.get_session(proxy=proxy)
+
+    async def post(url: str) -> Any:
+        async with session.post(url=url, json=payload, timeout=100) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    # batches are never hedged, they are large enough to only fail over to the next endpoint
+    error: Exception = RPCBatchNotSupportedError(chain=chain)
+    http_endpoints = [endpoint for endpoint in get_endpoint_pool(chain=chain).ranked() if not endpoint.is_websocket]
+    for endpoint in http_endpoints:
+        try:
+            data = await endpoint.measure(post(url=endpoint.url))
+        except Exception as e:
+            error = e
+            continue
+        if isinstance(data, list):
+            break
+        error = RPCBatchNotSupportedError(chain=chain)
+    else:
+        raise error
+
+    results: List[Any] = [None] * len(calls)
+    for item in data:
+        request_id = item.get("id")
+        if isinstance(request_id, int) and 0 <= request_id < len(calls) and "error" not in item:
+            results[request_id] = item.get("result")
+    return results
@@ -0,0 +1,85 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    MAX_CONCURRENT_WALLETS,
+    MAX_CONCURRENT_WALLETS_PER_CHAIN,
+    WALLET_DELAY_RANGE,
+    USE_MOBILE_PROXY,
+    MANUAL_TRANSFERS_MODE,
+)
+from core.models.chain import Chain
+from core.models.wallet import Wallet
+from logger import logger
+from utils import sleep
+
+
+class WalletScheduler:
+    """
+    Runs the per-wallet state machines of a module concurrently.
+
+    Every wallet is handled by exactly one task, so its own actions stay in order, while up to
+    `concurrency` wallets are in flight at once. `chain_slot` additionally bounds how many wallets
+    send transactions on the same chain at the same time, and `park` frees the slot of a wallet that
+    is only waiting.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = MAX_CONCURRENT_WALLETS,
+        chain_concurrency: int = MAX_CONCURRENT_WALLETS_PER_CHAIN,
+        wallet_delay_range: Optional[List[int]] = WALLET_DELAY_RANGE,
+    ) -> None:
+        # mobile proxies share a single rotating ip and manual mode reads amounts from stdin,
+        # so both of them only work with one wallet at a time
+        if USE_MOBILE_PROXY or MANUAL_TRANSFERS_MODE:
+            concurrency = 1
+
+        self.concurrency = max(concurrency, 1)
+        self.chain_concurrency = max(chain_concurrency, 1)
+        self.wallet_delay_range = wallet_delay_range
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._chain_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def chain_slot(self, chain: Chain) -> asyncio.Semaphore:
+        if chain.name not in self._chain_semaphores:
+            self._chain_semaphores[chain.name] = asyncio.Semaphore(self.chain_concurrency)
+        return self._chain_semaphores[chain.name]
+
+    @asynccontextmanager
+    async def park(self) -> AsyncIterator[None]:
+        """
+        Gives the slot of the current wallet to the next one while it only waits (e.g. for a bridge to land)
+        and takes a slot back before it continues. Must only be used inside a worker.
+        """
+        self._semaphore.release()
+        try:
+            yield
+        finally:
+            await self._semaphore.acquire()
+
+    async def run(
+        self,
+        items: Iterable[Tuple[Wallet, int]],
+        worker: Callable[[Wallet, int], Awaitable],
+        shuffle: bool = True,
+    ) -> None:
+        items = list(items)
+        if shuffle:
+            random.shuffle(items)
+
+        logger.info(f"Starting {len(items)} wallets, up to {self.concurrency} at once")
+        await asyncio.gather(*[self._run_wallet(wallet, wallet_index, worker) for wallet, wallet_index in items])
+
+    async def _run_wallet(self, wallet: Wallet, wallet_index: int, worker: Callable[[Wallet, int], Awaitable]) -> None:
+        async with self._semaphore:
+            try:
+                await worker(wallet, wallet_index)
+            except Exception as e:
+                logger.exception(f"Error occurred while working with wallet {wallet}: {e}")
+
+        # the delay after a wallet doesn't hold a slot, the next wallet starts right away
+        if self.wallet_delay_range:
+            await sleep(delay_range=self.wallet_delay_range, send_message=False, pr_bar=False)
@@ -0,0 +1,64 @@
+import asyncio
+from typing import Callable, Dict, Optional
+
+import aiohttp
+from aiohttp_proxy import ProxyConnector
+
+from logger import logger
+from .constants import (
+    HTTP_POOL_LIMIT,
+    HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+)
+
+
+class SessionRegistry:
+    """
+    Keeps one long-lived aiohttp session per proxy, so every client that goes through the same proxy
+    (or through none) reuses already opened keep-alive connections instead of a new TCP+TLS handshake.
+
+    `session_factory` builds the session of a proxy, an offline run (see `modules.simulation`) swaps it for one
+    that answers every request itself.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[Optional[str]], aiohttp.ClientSession]] = None) -> None:
+        self.session_factory = session_factory or self._create_session
+        self._sessions: Dict[Optional[str], aiohttp.ClientSession] = {}
+
+    @staticmethod
+    def _get_connector_kwargs() -> dict:
+        return {
+            "limit": HTTP_POOL_LIMIT,
+            "limit_per_host": HTTP_POOL_LIMIT_PER_HOST,
+            "ttl_dns_cache": HTTP_DNS_CACHE_TTL,
+            "keepalive_timeout": HTTP_KEEPALIVE_TIMEOUT,
+        }
+
+    def _create_session(self, proxy: Optional[str]) -> aiohttp.ClientSession:
+        if proxy:
+            connector = ProxyConnector.from_url(url=f"http://{proxy}", **self._get_connector_kwargs())
+        else:
+            connector = aiohttp.TCPConnector(**self._get_connector_kwargs())
+        return aiohttp.ClientSession(connector=connector)
+
+    def get_session(self, proxy: Optional[str] = None) -> aiohttp.ClientSession:
+        session = self._sessions.get(proxy)
+        if session is None or session.closed:
+            session = self.session_factory(proxy)
+            self._sessions[proxy] = session
+        return session
+
+    async def close(self) -> None:
+        sessions = [session for session in self._sessions.values() if not session.closed]
+        self._sessions.clear()
+        if not sessions:
+            return
+
+        results = await asyncio.gather(*[session.close() for session in sessions], return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.debug(f"Error while closing http session: {result}")
+
+
+sessions = SessionRegistry()
@@ -0,0 +1,209 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+
+from .constants import DATABASE_STORE_PATH, STORAGE_BUSY_TIMEOUT
+
+
+class Storage:
+    """
+    SQLite store (WAL mode) behind the wallets database.
+
+    Every change is written as its own small transaction that only touches the changed fields of one wallet,
+    is fsync'd before it returns and holds the database write lock while it runs, so several worker processes
+    can safely share one file.
+    """
+
+    def __init__(self, file_path: str = DATABASE_STORE_PATH) -> None:
+        self.file_path = file_path
+        self._connection = sqlite3.connect(
+            database=file_path, timeout=STORAGE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.execute(f"PRAGMA busy_timeout={STORAGE_BUSY_TIMEOUT * 1000}")
+        self._create_tables()
+
+    def _create_tables(self) -> None:
+        with self.transaction() as cursor:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS wallets (wallet_index INTEGER PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS transfers ("
+                "tx_hash TEXT PRIMARY KEY, address TEXT NOT NULL, src_chain_id INTEGER NOT NULL, "
+                "dest_chain_id INTEGER NOT NULL, tool TEXT, token_out TEXT, to_amount TEXT, "
+                "status TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS transfers_by_address ON transfers (address, created_at)"
+            )
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS allowances ("
+                "address TEXT NOT NULL, chain_id INTEGER NOT NULL, token TEXT NOT NULL, spender TEXT NOT NULL, "
+                "amount TEXT NOT NULL, PRIMARY KEY (address, chain_id, token, spender))"
+            )
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS tx_replacements ("
+                "tx_hash TEXT PRIMARY KEY, replaced_tx_hash TEXT NOT NULL, address TEXT NOT NULL, "
+                "chain_id INTEGER NOT NULL, nonce INTEGER NOT NULL, fees TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS gas_usage ("
+                "tx_hash TEXT PRIMARY KEY, chain_id INTEGER NOT NULL, dest_chain_id INTEGER NOT NULL, tool TEXT, "
+                "token_in TEXT NOT NULL, token_out TEXT NOT NULL, gas_used INTEGER NOT NULL, fee TEXT NOT NULL, "
+                "created_at REAL NOT NULL)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS gas_usage_by_route "
+                "ON gas_usage (chain_id, dest_chain_id, token_in, token_out, created_at)"
+            )
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        else:
+            cursor.execute("COMMIT")
+        finally:
+            cursor.close()
+
+    def has_wallets(self) -> bool:
+        return self._connection.execute("SELECT 1 FROM wallets LIMIT 1").fetchone() is not None
+
+    def load_wallets(self) -> List[Dict[str, Any]]:
+        rows = self._connection.execute("SELECT data FROM wallets ORDER BY wallet_index").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def replace_wallets(self, items: List[Dict[str, Any]]) -> None:
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM wallets")
+            cursor.executemany(
+                "INSERT INTO wallets (wallet_index, data) VALUES (?, ?)",
+                [(index, json.dumps(item)) for index, item in enumerate(items)],
+            )
+
+    def update_wallet(self, wallet_index: int, changes: Dict[str, Any]) -> None:
+        if not changes:
+            return
+
+        assignments = ", ".join("?, json(?)" for _ in changes)
+        params = []
+        for key, value in changes.items():
+            params.extend((f"$.{key}", json.dumps(value)))
+
+        with self.transaction() as cursor:
+            cursor.execute(
+                f"UPDATE wallets SET data = json_set(data, {assignments}) WHERE wallet_index = ?",
+                (*params, wallet_index),
+            )
+
+    def add_transfer(self, transfer: Dict[str, Any]) -> None:
+        columns = ", ".join(transfer)
+        placeholders = ", ".join("?" for _ in transfer)
+        with self.transaction() as cursor:
+            cursor.execute(
+                f"INSERT OR REPLACE INTO transfers ({columns}) VALUES ({placeholders})", tuple(transfer.values())
+            )
+
+    def update_transfer(self, tx_hash: str, status: str, updated_at: float) -> None:
+        with self.transaction() as cursor:
+            cursor.execute(
+                "UPDATE transfers SET status = ?, updated_at = ? WHERE tx_hash = ?", (status, updated_at, tx_hash)
+            )
+
+    def get_last_transfer(self, address: str) -> Optional[Dict[str, Any]]:
+        cursor = self._connection.execute(
+            "SELECT * FROM transfers WHERE address = ? ORDER BY created_at DESC LIMIT 1", (address,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def add_tx_replacement(self, replacement: Dict[str, Any]) -> None:
+        replacement = {**replacement, "fees": json.dumps(replacement["fees"])}
+        columns = ", ".join(replacement)
+        placeholders = ", ".join("?" for _ in replacement)
+        with self.transaction() as cursor:
+            cursor.execute(
+                f"INSERT OR REPLACE INTO tx_replacements ({columns}) VALUES ({placeholders})",
+                tuple(replacement.values()),
+            )
+
+    def add_gas_usage(self, usage: Dict[str, Any]) -> None:
+        # fees are stored as text like allowances, native amounts don't always fit into an sqlite integer
+        usage = {**usage, "fee": str(usage["fee"])}
+        columns = ", ".join(usage)
+        placeholders = ", ".join("?" for _ in usage)
+        with self.transaction() as cursor:
+            cursor.execute(
+                f"INSERT OR REPLACE INTO gas_usage ({columns}) VALUES ({placeholders})", tuple(usage.values())
+            )
+
+    def get_gas_usage(
+        self, chain_id: int, dest_chain_id: int, token_in: str, token_out: str, tool: str, limit: int
+    ) -> List[Dict[str, Any]]:
+        cursor = self._connection.execute(
+            "SELECT gas_used, fee FROM gas_usage "
+            "WHERE chain_id = ? AND dest_chain_id = ? AND token_in = ? AND token_out = ? AND tool IS ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (chain_id, dest_chain_id, token_in, token_out, tool, limit),
+        )
+        return [{"gas_used": gas_used, "fee": int(fee)} for gas_used, fee in cursor.fetchall()]
+
+    def count_gas_usage(self, chain_id: int, dest_chain_id: int, token_in: str, token_out: str) -> int:
+        """
+        Returns the most receipts any one tool has for the pair.
+        """
+        row = self._connection.execute(
+            "SELECT MAX(samples) FROM (SELECT COUNT(*) AS samples FROM gas_usage "
+            "WHERE chain_id = ? AND dest_chain_id = ? AND token_in = ? AND token_out = ? GROUP BY tool)",
+            (chain_id, dest_chain_id, token_in, token_out),
+        ).fetchone()
+        return row[0] or 0
+
+    def delete_gas_usage(self, chain_id: int, dest_chain_id: int, token_in: str, token_out: str, tool: str) -> None:
+        with self.transaction() as cursor:
+            cursor.execute(
+                "DELETE FROM gas_usage WHERE chain_id = ? AND dest_chain_id = ? AND token_in = ? AND token_out = ? "
+                "AND tool IS ?",
+                (chain_id, dest_chain_id, token_in, token_out, tool),
+            )
+
+    def get_allowance(self, address: str, chain_id: int, token: str, spender: str) -> Optional[int]:
+        row = self._connection.execute(
+            "SELECT amount FROM allowances WHERE address = ? AND chain_id = ? AND token = ? AND spender = ?",
+            (address, chain_id, token, spender),
+        ).fetchone()
+        return int(row[0]) if row is not None else None
+
+    def set_allowance(self, address: str, chain_id: int, token: str, spender: str, amount: Optional[int]) -> None:
+        with self.transaction() as cursor:
+            if amount is None:
+                cursor.execute(
+                    "DELETE FROM allowances WHERE address = ? AND chain_id = ? AND token = ? AND spender = ?",
+                    (address, chain_id, token, spender),
+                )
+            else:
+                # amounts are stored as text, an unlimited approval doesn't fit into an sqlite integer
+                cursor.execute(
+                    "INSERT OR REPLACE INTO allowances (address, chain_id, token, spender, amount) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (address, chain_id, token, spender, str(amount)),
+                )
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+@lru_cache(maxsize=None)
+def get_storage(file_path: str = DATABASE_STORE_PATH) -> Storage:
+    return Storage(file_path=file_path)
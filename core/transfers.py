@@ -0,0 +1,226 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from eth_typing import ChecksumAddress
+
+from core.models.chain import Chain
+from core.models.token import Token
+from logger import logger
+from .arrivals import arrival_watcher
+from .constants import (
+    JUMPER_STATUS_URL,
+    JUMPER_STATUS_POLL_INTERVAL,
+    JUMPER_STATUS_MIN_BACKOFF,
+    JUMPER_STATUS_MAX_BACKOFF,
+    JUMPER_STATUS_CONCURRENCY,
+)
+from .sessions import sessions
+from .storage import Storage, get_storage
+
+TRANSFER_PENDING = "PENDING"
+TRANSFER_DONE = "DONE"
+TRANSFER_FAILED = "FAILED"
+# the destination side got another token than the one bridged to, its balance has to show whether it arrived
+TRANSFER_PARTIAL = "PARTIAL"
+
+# li.fi statuses after which the transfer won't change anymore
+LIFI_FAILED_STATUSES = ("FAILED", "INVALID")
+# substatus of a DONE transfer whose funds were sent back to the source chain
+LIFI_REFUNDED_SUBSTATUS = "REFUNDED"
+LIFI_PARTIAL_SUBSTATUS = "PARTIAL"
+
+
+@dataclass
+class TrackedTransfer:
+    tx_hash: str
+    src_chain_id: int
+    dest_chain_id: int
+    tool: Optional[str]
+    futures: List[asyncio.Future] = field(default_factory=list)
+    backoff: float = JUMPER_STATUS_MIN_BACKOFF
+    next_check_at: float = 0.0
+
+
+class TransferTracker:
+    """
+    Follows bridges sent through LI.FI until their destination side is done.
+
+    Every bridge is stored in the `transfers` table with its source tx hash, the bridge (`tool`) of its route
+    and the expected destination amount. Wallets waiting for their transfers share one poller of the LI.FI
+    `/status` endpoint; each transfer is asked again with an exponential backoff instead of on every tick.
+    """
+
+    def __init__(self, storage: Optional[Storage] = None, poll_interval: float = JUMPER_STATUS_POLL_INTERVAL) -> None:
+        self._storage = storage
+        self.poll_interval = poll_interval
+        self._pending: Dict[str, TrackedTransfer] = {}
+        self._semaphore = asyncio.Semaphore(JUMPER_STATUS_CONCURRENCY)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def storage(self) -> Storage:
+        if self._storage is None:
+            self._storage = get_storage()
+        return self._storage
+
+    def register(
+        self,
+        tx_hash: str,
+        address: ChecksumAddress,
+        src_chain: Chain,
+        dest_chain: Chain,
+        tool: Optional[str],
+        token_out: Token,
+        to_amount: Optional[str],
+    ) -> None:
+        now = time.time()
+        self.storage.add_transfer({
+            "tx_hash": tx_hash,
+            "address": address,
+            "src_chain_id": src_chain.chain_id,
+            "dest_chain_id": dest_chain.chain_id,
+            "tool": tool,
+            "token_out": token_out.symbol,
+            "to_amount": to_amount,
+            "status": TRANSFER_PENDING,
+            "created_at": now,
+            "updated_at": now,
+        })
+
+    def _watch(self, transfer: Dict[str, Any]) -> asyncio.Future:
+        tx_hash = transfer["tx_hash"]
+        if tx_hash not in self._pending:
+            self._pending[tx_hash] = TrackedTransfer(
+                tx_hash=tx_hash,
+                src_chain_id=transfer["src_chain_id"],
+                dest_chain_id=transfer["dest_chain_id"],
+                tool=transfer["tool"],
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tx_hash].futures.append(future)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    def _resolve(self, tx_hash: str, status: str) -> None:
+        self.storage.update_transfer(tx_hash=tx_hash, status=status, updated_at=time.time())
+        transfer = self._pending.pop(tx_hash, None)
+        if transfer is None:
+            return
+        for future in transfer.futures:
+            if not future.done():
+                future.set_result(status)
+
+    async def _fetch_status(self, transfer: TrackedTransfer) -> Optional[Dict[str, Any]]:
+        params = {
+            "txHash": transfer.tx_hash,
+            "fromChain": transfer.src_chain_id,
+            "toChain": transfer.dest_chain_id,
+        }
+        if transfer.tool:
+            params["bridge"] = transfer.tool
+
+        async with self._semaphore:
+            session = sessions.get_session()
+            # li.fi answers 404 with a regular status body until it has indexed the source tx
+            async with session.get(url=JUMPER_STATUS_URL, params=params, timeout=30) as response:
+                return await response.json(content_type=None)
+
+    async def _check(self, transfer: TrackedTransfer) -> None:
+        try:
+            response = await self._fetch_status(transfer)
+        except Exception as e:
+            logger.debug(f"Couldn't get status of transfer {transfer.tx_hash}: {e}")
+            response = None
+
+        status = response.get("status") if isinstance(response, dict) else None
+        if status == TRANSFER_DONE:
+            substatus = response.get("substatus")
+            if substatus == LIFI_REFUNDED_SUBSTATUS:
+                logger.error(f"Transfer {transfer.tx_hash} was refunded on the source chain")
+                self._resolve(tx_hash=transfer.tx_hash, status=TRANSFER_FAILED)
+            elif substatus == LIFI_PARTIAL_SUBSTATUS:
+                logger.warning(f"Transfer {transfer.tx_hash} delivered another token than requested")
+                self._resolve(tx_hash=transfer.tx_hash, status=TRANSFER_PARTIAL)
+            else:
+                if substatus and substatus != "COMPLETED":
+                    logger.warning(f"Transfer {transfer.tx_hash} finished with substatus {substatus}")
+                self._resolve(tx_hash=transfer.tx_hash, status=TRANSFER_DONE)
+        elif status in LIFI_FAILED_STATUSES:
+            logger.error(f"Transfer {transfer.tx_hash} failed: {response.get('substatusMessage') or status}")
+            self._resolve(tx_hash=transfer.tx_hash, status=TRANSFER_FAILED)
+        else:
+            transfer.next_check_at = time.monotonic() + transfer.backoff
+            transfer.backoff = min(transfer.backoff * 2, JUMPER_STATUS_MAX_BACKOFF)
+
+    async def _run(self) -> None:
+        while self._pending:
+            # transfers nobody waits for anymore (e.g. timed out) stay pending in the storage only
+            for tx_hash, transfer in list(self._pending.items()):
+                transfer.futures = [future for future in transfer.futures if not future.done()]
+                if not transfer.futures:
+                    del self._pending[tx_hash]
+
+            now = time.monotonic()
+            due = [transfer for transfer in self._pending.values() if transfer.next_check_at <= now]
+            if due:
+                await asyncio.gather(*[self._check(transfer) for transfer in due])
+            await asyncio.sleep(self.poll_interval)
+
+    async def wait_for_transfer(
+        self, address: ChecksumAddress, dest_chain: Chain, timeout: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        Waits for the last transfer of `address` if it was sent to `dest_chain`.
+
+        Returns its final status, TRANSFER_PENDING if it didn't finish within `timeout` seconds,
+        or None if the wallet has no tracked transfer to `dest_chain`.
+        """
+        transfer = self.storage.get_last_transfer(address=address)
+        if transfer is None or transfer["dest_chain_id"] != dest_chain.chain_id:
+            return None
+        if transfer["status"] != TRANSFER_PENDING:
+            return transfer["status"]
+
+        try:
+            return await asyncio.wait_for(self._watch(transfer), timeout=timeout)
+        except asyncio.TimeoutError:
+            return TRANSFER_PENDING
+
+
+async def wait_for_bridge(
+    chain: Chain,
+    address: ChecksumAddress,
+    token: Token,
+    initial_balance: float,
+    timeout: Optional[float] = None,
+) -> bool:
+    """
+    Waits until the last bridge of `address` to `chain` has arrived.
+
+    Bridges tracked by `transfer_tracker` are followed through the LI.FI status api, everything else
+    (untracked, failed, refunded or partially done transfers, okx withdrawals) falls back to watching
+    the `token` balance.
+    """
+    status = await transfer_tracker.wait_for_transfer(address=address, dest_chain=chain, timeout=timeout)
+    if status == TRANSFER_DONE:
+        return True
+    if status == TRANSFER_PENDING:
+        return False
+    if status == TRANSFER_FAILED:
+        logger.warning(f"Last transfer to {chain.name.upper()} failed, checking {token.symbol.upper()} balance instead")
+    if status == TRANSFER_PARTIAL:
+        logger.warning(
+            f"Last transfer to {chain.name.upper()} was only partially done, checking {token.symbol.upper()} balance"
+        )
+
+    return await arrival_watcher.wait_for_arrival(
+        chain=chain, address=address, token=token, initial_balance=initial_balance, timeout=timeout
+    )
+
+
+transfer_tracker = TransferTracker()
@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from web3.types import RPCResponse
+
+from logger import logger
+from .constants import RPC_REQUEST_TIMEOUT, WS_HEARTBEAT, WS_CONNECT_TIMEOUT
+from .sessions import sessions
+
+
+def is_websocket_url(url: str) -> bool:
+    return url.startswith(("ws://", "wss://"))
+
+
+class WebsocketConnection:
+    """
+    One persistent JSON-RPC connection to a `ws`/`wss` endpoint.
+
+    It is opened on the first request and opened again by the first request after it dropped. Answers are matched
+    to requests by id; subscription notifications go to the queue of their subscription, which gets a None once
+    the connection is gone and the subscription with it.
+    """
+
+    def __init__(self, url: str, proxy: Optional[str] = None) -> None:
+        self.url = url
+        self.proxy = proxy
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._lock = asyncio.Lock()
+        self._ids = itertools.count(1)
+        self._requests: Dict[int, asyncio.Future] = {}
+        self._subscriptions: Dict[str, asyncio.Queue] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    async def _connect(self) -> aiohttp.ClientWebSocketResponse:
+        async with self._lock:
+            if not self.connected:
+                session = sessions.get_session(proxy=self.proxy)
+                self._ws = await session.ws_connect(
+                    url=self.url, heartbeat=WS_HEARTBEAT, timeout=WS_CONNECT_TIMEOUT, max_msg_size=0
+                )
+                self._listener = asyncio.create_task(self._listen(self._ws))
+            return self._ws
+
+    def _dispatch(self, message: Any) -> None:
+        if isinstance(message, list):
+            for item in message:
+                self._dispatch(item)
+            return
+        if not isinstance(message, dict):
+            return
+
+        if message.get("method") == "eth_subscription":
+            params = message.get("params", {})
+            queue = self._subscriptions.get(params.get("subscription"))
+            if queue is not None:
+                queue.put_nowait(params.get("result"))
+            return
+
+        future = self._requests.pop(message.get("id"), None)
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    def _disconnected(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        if self._ws is ws:
+            self._ws = None
+
+        error = ConnectionError(f"Websocket connection to {self.url} was closed")
+        for future in self._requests.values():
+            if not future.done():
+                future.set_exception(error)
+        self._requests.clear()
+
+        for queue in self._subscriptions.values():
+            queue.put_nowait(None)
+        self._subscriptions.clear()
+
+    async def _listen(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        try:
+            async for message in ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                try:
+                    self._dispatch(json.loads(message.data))
+                except ValueError as e:
+                    logger.debug(f"Couldn't decode a websocket message from {self.url}: {e}")
+        finally:
+            self._disconnected(ws)
+
+    async def request(self, method: str, params: Any, timeout: float = RPC_REQUEST_TIMEOUT) -> RPCResponse:
+        ws = await self._connect()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        try:
+            await ws.send_str(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}))
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._requests.pop(request_id, None)
+
+    async def subscribe(self, params: List[Any]) -> Tuple[str, asyncio.Queue]:
+        response = await self.request(method="eth_subscribe", params=params)
+        if "error" in response:
+            raise Exception(f"Couldn't subscribe to {params[0]} on {self.url}: {response['error']}")
+
+        subscription_id = response["result"]
+        queue = asyncio.Queue()
+        self._subscriptions[subscription_id] = queue
+        return subscription_id, queue
+
+    async def unsubscribe(self, subscription_id: str) -> None:
+        if self._subscriptions.pop(subscription_id, None) is None or not self.connected:
+            return
+        try:
+            await self.request(method="eth_unsubscribe", params=[subscription_id])
+        except Exception as e:
+            logger.debug(f"Couldn't unsubscribe from {subscription_id} on {self.url}: {e}")
+
+    async def close(self) -> None:
+        if self.connected:
+            await self._ws.close()
+        if self._listener is not None:
+            await asyncio.gather(self._listener, return_exceptions=True)
+
+
+# one connection per endpoint and proxy, shared by every provider and subscription that goes through them
+_CONNECTIONS: Dict[Tuple[str, Optional[str]], WebsocketConnection] = {}
+
+
+def get_websocket(url: str, proxy: Optional[str] = None) -> WebsocketConnection:
+    if (url, proxy) not in _CONNECTIONS:
+        _CONNECTIONS[(url, proxy)] = WebsocketConnection(url=url, proxy=proxy)
+    return _CONNECTIONS[(url, proxy)]
+
+
+async def close_websockets() -> None:
+    connections = list(_CONNECTIONS.values())
+    _CONNECTIONS.clear()
+    await asyncio.gather(*[connection.close() for connection in connections], return_exceptions=True)
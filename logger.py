@@ -1,10 +1,25 @@
+import asyncio
+import sys
+from collections import deque
 from enum import Enum
+from typing import Deque, List, Optional
 
-import telebot
+import aiohttp
 from loguru import logger as loguru_logger
+from tqdm import tqdm
 
 from config import TG_TOKEN, TG_IDS, USE_TG_BOT
 
+# kept here rather than in core.constants: importing core would import the clients, which need this logger
+TG_API_URL = "https://api.telegram.org"
+# messages waiting for the next digest, the oldest ones are dropped once the queue is full
+TG_QUEUE_SIZE = 1000
+# seconds between two digests and between two requests to the bot api
+TG_DIGEST_INTERVAL = 5
+TG_SEND_INTERVAL = 1
+TG_MESSAGE_LIMIT = 4096
+TG_SEND_ATTEMPTS = 3
+
 
 class Icons(Enum):
     SUCCESS = "🟢"
@@ -15,6 +30,116 @@ class Icons(Enum):
     DANGER = "☠️"
 
 
+class TelegramSink:
+    """
+    Sends log messages to telegram without blocking the event loop.
+
+    Messages are only queued by the caller. A background task joins everything queued since its last run
+    into one digest every `digest_interval` seconds and posts it to every chat through one shared session,
+    at most one request per `send_interval` seconds and honouring `retry_after` of rate limited requests.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        chat_ids: List[int],
+        enabled: bool = True,
+        api_url: str = TG_API_URL,
+        queue_size: int = TG_QUEUE_SIZE,
+        digest_interval: float = TG_DIGEST_INTERVAL,
+        send_interval: float = TG_SEND_INTERVAL,
+    ) -> None:
+        self.token = token
+        self.chat_ids = chat_ids
+        self.enabled = enabled
+        self.api_url = api_url
+        self.digest_interval = digest_interval
+        self.send_interval = send_interval
+        self.dropped = 0
+        self._queue: Deque[str] = deque(maxlen=queue_size)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __call__(self, text: str) -> None:
+        if not self.enabled:
+            return
+
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(text)
+
+        if self._task is None or self._task.done():
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._run())
+            except RuntimeError:
+                # no running loop yet, the message goes out with the first digest sent from one
+                pass
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    def _build_digests(self) -> List[str]:
+        messages = []
+        if self.dropped:
+            messages.append(f"{Icons.WARNING.value} {self.dropped} messages were dropped")
+            self.dropped = 0
+        while self._queue:
+            messages.append(self._queue.popleft()[:TG_MESSAGE_LIMIT])
+
+        digests = []
+        for message in messages:
+            if digests and len(digests[-1]) + len(message) + 1 <= TG_MESSAGE_LIMIT:
+                digests[-1] = f"{digests[-1]}\n{message}"
+            else:
+                digests.append(message)
+        return digests
+
+    async def _send(self, chat_id: int, text: str) -> None:
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        payload = {"chat_id": chat_id, "text": text, "disable_web_page_preview": True}
+
+        for _ in range(TG_SEND_ATTEMPTS):
+            async with self._get_session().post(url=url, json=payload) as response:
+                if response.status != 429:
+                    response.raise_for_status()
+                    return
+                data = await response.json(content_type=None)
+                await asyncio.sleep(data.get("parameters", {}).get("retry_after", self.send_interval))
+        raise Exception(f"rate limited {TG_SEND_ATTEMPTS} times in a row")
+
+    async def _send_digests(self) -> None:
+        for digest in self._build_digests():
+            for chat_id in self.chat_ids:
+                try:
+                    await self._send(chat_id=chat_id, text=digest)
+                except Exception as e:
+                    # goes to the console and the log file but not to telegram, through the sink it could loop forever
+                    loguru_logger.warning(f"Encountered an error when sending telegram message: {e}")
+                await asyncio.sleep(self.send_interval)
+
+    async def _run(self) -> None:
+        while self._queue:
+            await asyncio.sleep(self.digest_interval)
+            await self._send_digests()
+
+    async def flush(self) -> None:
+        """
+        Sends everything still queued right away and closes the session.
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        await self._send_digests()
+        if self._session is not None:
+            await self._session.close()
+
+
 class CustomLogger:
     def __init__(self, telegram_logger):
         self.telegram_logger = telegram_logger
@@ -48,20 +173,17 @@ class CustomLogger:
     def exception(self, message: str) -> None:
         self.loguru_logger.exception(message)
 
-    @staticmethod
-    def send_message_telegram(bot, text: str):
-        try:
-            if USE_TG_BOT:
-                for tg_id in TG_IDS:
-                    bot.send_message(tg_id, text)
-        except Exception as e:
-            raise Exception(f"Encountered an error when sending telegram message: {e}")
+    async def flush(self) -> None:
+        await self.telegram_logger.flush()
+
 
-    @staticmethod
-    def tg_logger(text):
-        bot = telebot.TeleBot(TG_TOKEN, disable_web_page_preview=True) if USE_TG_BOT else None
-        CustomLogger.send_message_telegram(bot, text)
+def _write_to_console(message: str) -> None:
+    # tqdm clears the wait dashboard's status line, prints the message above it and draws the line again
+    tqdm.write(message, end="", file=sys.stderr)
 
 
-logger = CustomLogger(telegram_logger=CustomLogger.tg_logger)
-loguru_logger.add(sink="data/logs/logs.log")
\ No newline at end of file
+logger = CustomLogger(telegram_logger=TelegramSink(token=TG_TOKEN, chat_ids=TG_IDS, enabled=USE_TG_BOT))
+# replaces loguru's own stderr handler, which would print over the status line
+loguru_logger.remove()
+loguru_logger.add(sink=_write_to_console, colorize=sys.stderr.isatty())
+loguru_logger.add(sink="data/logs/logs.log")
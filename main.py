@@ -1,10 +1,30 @@
 import asyncio
+import sys
 
+from config import APPROVAL_POLICY
+from core.cex.okx import close_exchange
+from core.constants import APPROVAL_POLICIES
+from core.sessions import sessions
+from core.websocket import close_websockets
+from logger import logger
 from modules.module_manager import menu
 
 
+def check_config() -> None:
+    if APPROVAL_POLICY not in APPROVAL_POLICIES:
+        logger.error(f"Unknown APPROVAL_POLICY `{APPROVAL_POLICY}`, use one of: {', '.join(APPROVAL_POLICIES)}")
+        sys.exit(1)
+
+
 async def main():
-    await menu()
+    check_config()
+    try:
+        await menu()
+    finally:
+        await close_websockets()
+        await sessions.close()
+        await close_exchange()
+        await logger.flush()
 
 if __name__ == "__main__":
     asyncio.run(main=main())
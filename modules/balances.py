@@ -0,0 +1,68 @@
+import asyncio
+import csv
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from core.constants import BALANCE_SNAPSHOT_FILE_PATH
+from core.models.chain import Chain
+from core.multicall import get_balances
+from logger import logger
+from modules.database import Database
+from utils import get_chains
+
+
+async def read_chain_balances(chain: Chain, addresses: List[str]) -> List[Tuple[str, str, Optional[float]]]:
+    tokens = list(chain.tokens.values())
+    requests = [(address, token) for address in addresses for token in tokens]
+
+    try:
+        balances = await get_balances(chain=chain, requests=requests)
+    except Exception as e:
+        logger.error(f"Couldn't read balances on {chain.name.upper()}: {e}")
+        balances = [None] * len(requests)
+
+    return [
+        (address, token.symbol, token.from_wei(balance) if balance is not None else None)
+        for (address, token), balance in zip(requests, balances)
+    ]
+
+
+async def balance_snapshot():
+    database = Database.read()
+    addresses = [wallet.address for wallet in database.data]
+    chains = get_chains()
+
+    logger.info(f"Reading balances of {len(addresses)} wallets on {len(chains)} chains")
+    chain_balances = await asyncio.gather(*[read_chain_balances(chain=chain, addresses=addresses) for chain in chains])
+
+    file_path = BALANCE_SNAPSHOT_FILE_PATH.format(datetime.now().strftime("%Y%m%d_%H%M%S"))
+    totals: Dict[Tuple[str, str], float] = defaultdict(float)
+    failed = 0
+
+    with open(file=file_path, mode="w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["address", "chain", "token", "balance"])
+        for chain, rows in zip(chains, chain_balances):
+            for address, symbol, balance in rows:
+                writer.writerow([address, chain.name, symbol, "" if balance is None else balance])
+                if balance is None:
+                    failed += 1
+                else:
+                    totals[(chain.name, symbol)] += balance
+
+    for chain in chains:
+        chain_totals = ", ".join(
+            f"{round(totals[(chain.name, token.symbol)], token.round_to)} {token.symbol.upper()}"
+            for token in chain.tokens.values()
+        )
+        logger.info(f"{chain.name.upper()}: {chain_totals}")
+
+    token_totals: Dict[str, float] = defaultdict(float)
+    for (_, symbol), balance in totals.items():
+        token_totals[symbol] += balance
+    logger.info("TOTAL: " + ", ".join(f"{round(balance, 6)} {symbol.upper()}" for symbol, balance in token_totals.items()))
+
+    if failed:
+        logger.warning(f"Couldn't read {failed} balances, they are left empty in the snapshot")
+    logger.success(f"Balance snapshot saved to {file_path}")
@@ -1,50 +1,57 @@
+import asyncio
+from functools import partial
+
 from config import USE_MOBILE_PROXY, TX_DELAY_RANGE, FINISH_CHAIN, NATIVE_BRIDGE_MODE
 from core.dapps import JumperBridge
 from core.models.enums import TokenName
+from core.models.wallet import Wallet
+from core.scheduler import WalletScheduler
 from logger import logger
 from modules.database import Database
 from utils import sleep, change_ip, get_chains, find_token, get_chain_by_name
 
 
 async def collector_batch():
-    database = Database.read_from_json()
+    database = Database.read()
+    scheduler = WalletScheduler()
 
-    while True:
-        if USE_MOBILE_PROXY:
-            await change_ip()
+    await scheduler.run(
+        items=database.get_items_by_criteria(collector_finished=False),
+        worker=partial(collector_wallet, database=database, scheduler=scheduler),
+    )
+    logger.success("No more wallets left")
 
-        wallet_data = database.get_random_item_by_criteria(collector_finished=False)
 
-        if wallet_data is None:
-            break
+async def collector_wallet(wallet: Wallet, wallet_index: int, database: Database, scheduler: WalletScheduler) -> None:
+    if USE_MOBILE_PROXY:
+        await change_ip()
 
-        wallet, wallet_index = wallet_data
-        logger.info(f"Working with wallet {wallet}")
+    logger.info(f"Working with wallet {wallet}")
 
-        chains = get_chains()
-        dest_chain = get_chain_by_name(FINISH_CHAIN)
+    dest_chain = get_chain_by_name(FINISH_CHAIN)
+    dest_token = find_token(dest_chain.tokens, dest_chain.coin_symbol)
+    src_chains = [chain for chain in get_chains() if chain != dest_chain]
 
-        for src_chain in chains:
-            if src_chain == dest_chain:
-                continue
-            logger.info(f"Collecting from chain {src_chain.name.upper()}")
-            client = wallet.to_client(chain=src_chain)
-            jumper = JumperBridge(client=client)
+    if NATIVE_BRIDGE_MODE:
+        src_tokens = [find_token(src_chain.tokens, src_chain.coin_symbol) for src_chain in src_chains]
+    else:
+        src_tokens = [find_token(src_chain.tokens, TokenName.USDC.value) for src_chain in src_chains]
 
-            if NATIVE_BRIDGE_MODE:
-                src_token = find_token(src_chain.tokens, src_chain.coin_symbol)
-            else:
-                src_token = find_token(src_chain.tokens, TokenName.USDC.value)
+    clients = [wallet.to_client(chain=src_chain) for src_chain in src_chains]
+    balances = await asyncio.gather(*[
+        client.get_token_balance(src_token, wei=False) for client, src_token in zip(clients, src_tokens)
+    ])
 
-            dest_token = find_token(dest_chain.tokens, dest_chain.coin_symbol)
+    for src_chain, client, src_token, balance in zip(src_chains, clients, src_tokens, balances):
+        logger.info(f"Collecting from chain {src_chain.name.upper()}")
 
-            if round(await client.get_token_balance(src_token, wei=False), src_token.round_to - 2) > 0:
-                tx_status, _ = await jumper.bridge(
+        if round(balance, src_token.round_to - 2) > 0:
+            async with scheduler.chain_slot(src_chain):
+                tx_status, _ = await JumperBridge(client=client).bridge(
                     token_in=src_token, token_out=dest_token, dest_chain=dest_chain, amount=None
                 )
-                if tx_status:
-                    await sleep(delay_range=TX_DELAY_RANGE, send_message=False)
+            if tx_status:
+                await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
 
-        logger.success(f"All tokens on this wallet collected successfully to chain {dest_chain.name.upper()}")
-        database.update_item(item_index=wallet_index, collector_finished=True)
-    logger.success("No more wallets left")
+    logger.success(f"All tokens on this wallet collected successfully to chain {dest_chain.name.upper()}")
+    database.update_item(item_index=wallet_index, collector_finished=True)
@@ -1,4 +1,5 @@
 import random
+from functools import partial
 
 from config import (
     BRIDGE_PERCENTAGE_RANGE,
@@ -12,34 +13,44 @@ from config import (
 from core.client import Client
 from core.dapps import JumperBridge
 from core.models.enums import TokenName
+from core.models.wallet import Wallet
+from core.scheduler import WalletScheduler
 from logger import logger
 from modules.database import Database
 from utils import sleep, change_ip, find_token, get_chain_by_name
 
 
 async def manual_bridge():
-    database = Database.read_from_json()
+    database = Database.read()
+    scheduler = WalletScheduler()
 
-    while database.has_manual_bridge_available():
+    await scheduler.run(
+        items=database.get_items_by_criteria(manual_bridge_finished=False),
+        worker=partial(manual_bridge_wallet, database=database, scheduler=scheduler),
+    )
+    logger.success("No more wallets left")
+
+
+async def manual_bridge_wallet(
+        wallet: Wallet, wallet_index: int, database: Database, scheduler: WalletScheduler
+) -> None:
+    while not wallet.manual_bridge_finished:
         if USE_MOBILE_PROXY:
             await change_ip()
 
-        wallet_data = database.get_random_item_by_criteria(manual_bridge_finished=False)
-        wallet, wallet_index = wallet_data
-
         logger.info(f"Working with wallet {wallet}")
 
         src_client = wallet.to_client(chain=get_chain_by_name(START_CHAIN))
         dest_client = wallet.to_client(chain=get_chain_by_name(FINISH_CHAIN))
 
-        await bridge_action(
-            src_client=src_client,
-            dest_client=dest_client,
-            wallet_index=wallet_index,
-            database=database,
-        )
-        await sleep(delay_range=TX_DELAY_RANGE, send_message=False)
-    logger.success("No more wallets left")
+        async with scheduler.chain_slot(src_client.chain):
+            await bridge_action(
+                src_client=src_client,
+                dest_client=dest_client,
+                wallet_index=wallet_index,
+                database=database,
+            )
+        await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
 
 
 async def bridge_action(src_client: Client, dest_client: Client, wallet_index: int, database: Database) -> None:
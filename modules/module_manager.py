@@ -1,7 +1,9 @@
 from logger import logger
+from modules.balances import balance_snapshot
 from modules.collector import collector_batch
 from modules.database import Database
 from modules.manual_bridge import manual_bridge
+from modules.simulation import simulation
 from modules.volume import volume
 from modules.warmup import warmup
 
@@ -19,6 +21,10 @@ async def menu() -> None:
         await collector_batch()
     if module_num == "5":
         await manual_bridge()
+    if module_num == "6":
+        await balance_snapshot()
+    if module_num == "7":
+        await simulation()
 
 
 async def greeting() -> None:
@@ -48,5 +54,7 @@ async def greeting() -> None:
 3. [VOLUME] Набив объемов              | Volume Mode
 4. [COLLECTOR] Сборщик токенов         | Collector
 5. [MANUAL BRIDGE] Ручной режим        | Manual bridge
+6. [BALANCES] Снимок балансов          | Balance snapshot
+7. [SIMULATION] Симуляция без сети     | Offline dry run
 """
     )
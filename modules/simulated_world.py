@@ -0,0 +1,895 @@
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import aiohttp
+import rlp
+from aiohttp import ClientResponseError, RequestInfo
+from eth_abi import decode, encode
+from eth_account import Account
+from eth_utils import keccak
+from loguru import logger as loguru_logger
+from multidict import CIMultiDict, CIMultiDictProxy
+from web3 import AsyncWeb3
+from yarl import URL
+
+from config import PROXY_CHANGE_IP_URL
+from core.cex.okx import close_exchange
+from core.constants import (
+    SIMULATION_RPC_LATENCY,
+    SIMULATION_API_LATENCY,
+    SIMULATION_TX_CONFIRMATION_TIME,
+    SIMULATION_BRIDGE_TIME,
+    SIMULATION_OKX_WITHDRAWAL_TIME,
+    SIMULATION_FAILURE_RATE,
+    SIMULATION_NATIVE_BALANCE,
+    SIMULATION_USDC_BALANCE,
+    SIMULATION_TOKEN_PRICES,
+    SIMULATION_BLOCK_TIME,
+    SIMULATION_GAS_PRICES,
+    SIMULATION_DEFAULT_GAS_PRICE,
+    SIMULATION_BRIDGE_FEE,
+    SIMULATION_MAX_TIME,
+    SIMULATION_STALL_TIME,
+    ERC20_TRANSFER_TOPIC,
+    ERC20_BALANCE_OF_SELECTOR,
+    ERC20_ALLOWANCE_SELECTOR,
+    ERC20_APPROVE_SELECTOR,
+    MULTICALL_AGGREGATE3_SELECTOR,
+    MULTICALL_GET_ETH_BALANCE_SELECTOR,
+    JUMPER_ROUTE_URL,
+    JUMPER_BUILD_TX_URL,
+    JUMPER_STATUS_URL,
+    TOKEN_PRICE_FETCH_URL,
+    TX_REPLACEMENT_MIN_BUMP,
+    MAX_UINT256,
+    ZERO_ADDRESS,
+)
+from core.models.chain import Chain
+from core.models.enums import TokenName, TokenPriceApiId
+from core.models.token import Token
+from core.sessions import sessions
+from core.websocket import close_websockets
+from modules import collector, volume, warmup
+from modules.database import Database
+from utils import get_chains
+
+# address the simulated li.fi routes send bridges to, and the selector of its only function
+SIMULATED_BRIDGE_ADDRESS = "0x1231deb6f5749ef6ce6943a275a1d3e7486f4eae"
+SIMULATED_BRIDGE_SELECTOR = keccak(text="bridge(uint256,address,address,uint256,uint256,address)")[:4]
+SIMULATED_BRIDGE_ARGS = ["uint256", "address", "address", "uint256", "uint256", "address"]
+# bridges (li.fi tools) a token pair is routed through, picked by the pair
+SIMULATED_BRIDGE_TOOLS = ("stargate", "across", "hop", "celer")
+# gas used by simulated transactions: plain transfers, approvals, bridges and calls to anything else
+TRANSFER_GAS = 21000
+APPROVE_GAS = 46000
+BRIDGE_GAS = 170000
+CALL_GAS = 60000
+# funding account of the simulated okx, big enough for every withdrawal
+OKX_FUNDING_BALANCE = "1000000"
+# first block of every simulated chain
+GENESIS_BLOCK = 10_000_000
+
+SIMULATED_MODES: Dict[str, Callable] = {
+    "warmup": warmup.warmup,
+    "volume": volume.volume,
+    "collector": collector.collector_batch,
+}
+
+# wallets a mode left unfinished, by the same criteria it picks its wallets on the next run
+UNFINISHED_WALLETS: Dict[str, Callable[[Database], List[Tuple[Any, int]]]] = {
+    "warmup": lambda database: database.get_items_by_criteria(warmup_finished=False),
+    "volume": lambda database: database.get_volume_wallets(),
+    "collector": lambda database: database.get_items_by_criteria(collector_finished=False),
+}
+
+SIMULATION_LOG_PATH = os.path.abspath("data/logs/simulation.log")
+
+# coinlore ids of the priced tokens
+PRICE_API_IDS = {item.value: item.name.lower() for item in TokenPriceApiId}
+
+
+class RPCError(Exception):
+    def __init__(self, message: str, code: int = -32000) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _selector(value: str) -> bytes:
+    return bytes.fromhex(value[2:])
+
+
+def _to_hex(value: int) -> str:
+    return hex(value)
+
+
+def _to_int(value: bytes) -> int:
+    return int.from_bytes(value, "big")
+
+
+def _topic(address: str) -> str:
+    return "0x" + address[2:].lower().rjust(64, "0")
+
+
+def _native_amount(chain: Chain, eth_amount: float) -> float:
+    return eth_amount * SIMULATION_TOKEN_PRICES["eth"] / SIMULATION_TOKEN_PRICES[chain.coin_symbol]
+
+
+@dataclass
+class SimulationStats:
+    rpc_requests: int = 0
+    rpc_calls: Counter = field(default_factory=Counter)
+    api_calls: Counter = field(default_factory=Counter)
+    transactions: int = 0
+    reverted_transactions: int = 0
+    bridges: int = 0
+    withdrawals: int = 0
+
+
+@dataclass
+class SimulatedTransaction:
+    hash: str
+    sender: str
+    nonce: int
+    to: Optional[str]
+    value: int
+    data: bytes
+    gas: int
+    max_fee: int
+    priority_fee: int
+    tx_type: int
+    block_number: Optional[int] = None
+
+    def to_rpc(self, chain_id: int) -> Dict[str, Any]:
+        return {
+            "hash": self.hash,
+            "nonce": _to_hex(self.nonce),
+            "from": self.sender,
+            "to": self.to,
+            "value": _to_hex(self.value),
+            "input": "0x" + self.data.hex(),
+            "gas": _to_hex(self.gas),
+            "gasPrice": _to_hex(self.max_fee),
+            "type": _to_hex(self.tx_type),
+            "chainId": _to_hex(chain_id),
+            "blockNumber": _to_hex(self.block_number) if self.block_number is not None else None,
+            "blockHash": None,
+            "transactionIndex": None,
+        }
+
+
+def decode_raw_transaction(raw: bytes) -> SimulatedTransaction:
+    """
+    Decodes a signed EIP-1559, EIP-2930 or legacy transaction and recovers its sender.
+    """
+    if raw[0] == 2:
+        _, nonce, priority_fee, max_fee, gas, to, value, data = rlp.decode(raw[1:])[:8]
+    elif raw[0] == 1:
+        _, nonce, max_fee, gas, to, value, data = rlp.decode(raw[1:])[:7]
+        priority_fee = max_fee
+    else:
+        nonce, max_fee, gas, to, value, data = rlp.decode(raw)[:6]
+        priority_fee = max_fee
+
+    return SimulatedTransaction(
+        hash="0x" + keccak(raw).hex(),
+        sender=Account.recover_transaction(raw).lower(),
+        nonce=_to_int(nonce),
+        to="0x" + to.hex() if to else None,
+        value=_to_int(value),
+        data=data,
+        gas=_to_int(gas),
+        max_fee=_to_int(max_fee),
+        priority_fee=_to_int(priority_fee),
+        tx_type=raw[0] if raw[0] in (1, 2) else 0,
+    )
+
+
+class SimulatedChain:
+    """
+    In-memory state of one chain behind its json-rpc endpoints: balances, allowances, nonces, a mempool whose
+    transactions are mined after `SIMULATION_TX_CONFIRMATION_TIME` seconds, receipts and usdc `Transfer` logs.
+    """
+
+    def __init__(self, world: "SimulatedWorld", chain: Chain) -> None:
+        self.world = world
+        self.chain = chain
+        self.multicall_address = (chain.multicall_address or "").lower()
+        self.tokens = {token.contract_address.lower(): token for token in chain.tokens.values()}
+        gas_price = SIMULATION_GAS_PRICES.get(chain.name, SIMULATION_DEFAULT_GAS_PRICE)
+        self.base_fee = int(gas_price * 10 ** 9)
+        self.priority_fee = self.base_fee // 10
+        self.balances: Dict[Tuple[str, str], int] = {}
+        self.allowances: Dict[Tuple[str, str, str], int] = {}
+        self.nonces: Dict[str, int] = {}
+        self.pending: Dict[str, SimulatedTransaction] = {}
+        self.mined: Dict[str, SimulatedTransaction] = {}
+        self.receipts: Dict[str, Dict[str, Any]] = {}
+        self.logs: List[Dict[str, Any]] = []
+        self.handlers: Dict[str, Callable[[list], Any]] = {
+            "eth_chainId": lambda params: _to_hex(chain.chain_id),
+            "net_version": lambda params: str(chain.chain_id),
+            "web3_clientVersion": lambda params: "simulation",
+            "eth_blockNumber": lambda params: _to_hex(self.block_number),
+            "eth_gasPrice": lambda params: _to_hex(self.base_fee + self.priority_fee),
+            "eth_maxPriorityFeePerGas": lambda params: _to_hex(self.priority_fee),
+            "eth_feeHistory": self._fee_history,
+            "eth_getBalance": lambda params: _to_hex(self.balance_of(ZERO_ADDRESS, params[0])),
+            "eth_getTransactionCount": self._transaction_count,
+            "eth_call": self._call,
+            "eth_estimateGas": self._estimate_gas,
+            "eth_sendRawTransaction": self._send_raw_transaction,
+            "eth_getTransactionReceipt": lambda params: self.receipts.get(params[0]),
+            "eth_getTransactionByHash": self._transaction_by_hash,
+            "eth_getLogs": self._get_logs,
+        }
+
+    @property
+    def block_number(self) -> int:
+        return GENESIS_BLOCK + int((self.world.now - self.world.started_at) / SIMULATION_BLOCK_TIME)
+
+    def balance_of(self, token: str, owner: str) -> int:
+        return self.balances.get((token.lower(), owner.lower()), 0)
+
+    def credit(self, token: str, owner: str, amount: int, sender: str = ZERO_ADDRESS) -> None:
+        key = (token.lower(), owner.lower())
+        self.balances[key] = self.balances.get(key, 0) + amount
+        if token.lower() != ZERO_ADDRESS:
+            self.logs.append({
+                "address": AsyncWeb3.to_checksum_address(token),
+                "topics": [ERC20_TRANSFER_TOPIC, _topic(sender), _topic(owner)],
+                "data": "0x" + encode(["uint256"], [amount]).hex(),
+                "blockNumber": _to_hex(self.block_number),
+                "blockHash": "0x" + keccak(self.block_number.to_bytes(32, "big")).hex(),
+                "transactionHash": "0x" + os.urandom(32).hex(),
+                "transactionIndex": "0x0",
+                "logIndex": _to_hex(len(self.logs)),
+                "removed": False,
+            })
+
+    def debit(self, token: str, owner: str, amount: int) -> None:
+        key = (token.lower(), owner.lower())
+        self.balances[key] = self.balances.get(key, 0) - amount
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        method = request.get("method")
+        self.world.stats.rpc_calls[method] += 1
+        response: Dict[str, Any] = {"jsonrpc": "2.0", "id": request.get("id")}
+        handler = self.handlers.get(method)
+        if handler is None:
+            response["error"] = {"code": -32601, "message": f"the method {method} does not exist/is not available"}
+            return response
+        try:
+            response["result"] = handler(request.get("params") or [])
+        except RPCError as e:
+            response["error"] = {"code": e.code, "message": e.message}
+        return response
+
+    def _fee_history(self, params: list) -> Dict[str, Any]:
+        block_count = int(params[0], 16) if isinstance(params[0], str) else params[0]
+        return {
+            "oldestBlock": _to_hex(self.block_number - block_count + 1),
+            "baseFeePerGas": [_to_hex(self.base_fee)] * (block_count + 1),
+            "gasUsedRatio": [0.5] * block_count,
+            "reward": [[_to_hex(self.priority_fee)] * len(params[2] if len(params) > 2 else [])] * block_count,
+        }
+
+    def _transaction_count(self, params: list) -> str:
+        address = params[0].lower()
+        nonce = self.nonces.get(address, 0)
+        if len(params) > 1 and params[1] == "pending":
+            pending = [tx.nonce + 1 for tx in self.pending.values() if tx.sender == address]
+            nonce = max([nonce, *pending])
+        return _to_hex(nonce)
+
+    def _static_call(self, target: str, data: bytes) -> Optional[bytes]:
+        selector, args = data[:4], data[4:]
+        if target == self.multicall_address and selector == _selector(MULTICALL_GET_ETH_BALANCE_SELECTOR):
+            (address,) = decode(["address"], args)
+            return encode(["uint256"], [self.balance_of(ZERO_ADDRESS, address)])
+        if target not in self.tokens:
+            return None
+        if selector == _selector(ERC20_BALANCE_OF_SELECTOR):
+            (address,) = decode(["address"], args)
+            return encode(["uint256"], [self.balance_of(target, address)])
+        if selector == _selector(ERC20_ALLOWANCE_SELECTOR):
+            owner, spender = decode(["address", "address"], args)
+            return encode(["uint256"], [self.allowances.get((target, owner.lower(), spender.lower()), 0)])
+        return None
+
+    def _call(self, params: list) -> str:
+        target, data = params[0]["to"].lower(), bytes.fromhex(params[0].get("data", "0x")[2:])
+        if target == self.multicall_address and data[:4] == _selector(MULTICALL_AGGREGATE3_SELECTOR):
+            (calls,) = decode(["(address,bool,bytes)[]"], data[4:])
+            results = []
+            for call_target, _, call_data in calls:
+                result = self._static_call(call_target.lower(), call_data)
+                results.append((result is not None, result or b""))
+            return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+
+        result = self._static_call(target, data)
+        if result is None:
+            raise RPCError("execution reverted", code=3)
+        return "0x" + result.hex()
+
+    def _bridge_error(self, sender: str, value: int, data: bytes) -> Optional[str]:
+        _, token_in, _, amount, _, _ = decode(SIMULATED_BRIDGE_ARGS, data[4:])
+        if token_in.lower() == ZERO_ADDRESS:
+            return None if value >= amount else "msg.value is lower than the bridged amount"
+        if self.allowances.get((token_in.lower(), sender, SIMULATED_BRIDGE_ADDRESS), 0) < amount:
+            return "ERC20: insufficient allowance"
+        if self.balance_of(token_in, sender) < amount:
+            return "ERC20: transfer amount exceeds balance"
+        return None
+
+    def _get_gas(self, to: Optional[str], data: bytes) -> int:
+        if not data:
+            return TRANSFER_GAS
+        if data[:4] == _selector(ERC20_APPROVE_SELECTOR):
+            return APPROVE_GAS
+        if to == SIMULATED_BRIDGE_ADDRESS and data[:4] == SIMULATED_BRIDGE_SELECTOR:
+            return BRIDGE_GAS
+        return CALL_GAS
+
+    def _estimate_gas(self, params: list) -> str:
+        tx = params[0]
+        sender, to = tx.get("from", ZERO_ADDRESS).lower(), (tx.get("to") or "").lower()
+        value = int(tx.get("value", "0x0"), 16)
+        data = bytes.fromhex(tx.get("data", tx.get("input", "0x"))[2:])
+        if self.balance_of(ZERO_ADDRESS, sender) < value:
+            raise RPCError("insufficient funds for transfer")
+        if to == SIMULATED_BRIDGE_ADDRESS and data[:4] == SIMULATED_BRIDGE_SELECTOR:
+            error = self._bridge_error(sender=sender, value=value, data=data)
+            if error is not None:
+                raise RPCError(f"execution reverted: {error}", code=3)
+
+        gas = self._get_gas(to=to, data=data)
+        # like geth, a call with a fee cap is only estimated if the balance pays for its gas
+        fee_cap = int(tx.get("maxFeePerGas", tx.get("gasPrice", "0x0")), 16)
+        if self.balance_of(ZERO_ADDRESS, sender) < value + gas * fee_cap:
+            raise RPCError("insufficient funds for gas * price + value")
+        return _to_hex(gas)
+
+    def _send_raw_transaction(self, params: list) -> str:
+        tx = decode_raw_transaction(bytes.fromhex(params[0][2:]))
+        if tx.hash in self.pending or tx.hash in self.mined:
+            raise RPCError("already known")
+        if tx.nonce < self.nonces.get(tx.sender, 0):
+            raise RPCError("nonce too low")
+        for other in self.pending.values():
+            if other.sender != tx.sender or other.nonce != tx.nonce:
+                continue
+            if tx.max_fee < other.max_fee * TX_REPLACEMENT_MIN_BUMP:
+                raise RPCError("replacement transaction underpriced")
+        if self.balance_of(ZERO_ADDRESS, tx.sender) < tx.value + tx.gas * tx.max_fee:
+            raise RPCError("insufficient funds for gas * price + value")
+
+        self.pending[tx.hash] = tx
+        self.world.call_later(SIMULATION_TX_CONFIRMATION_TIME, self._mine, tx)
+        return tx.hash
+
+    def _transaction_by_hash(self, params: list) -> Optional[Dict[str, Any]]:
+        tx = self.pending.get(params[0]) or self.mined.get(params[0])
+        return tx.to_rpc(chain_id=self.chain.chain_id) if tx is not None else None
+
+    def _get_logs(self, params: list) -> List[Dict[str, Any]]:
+        log_filter = params[0]
+        from_block = self._block_param(log_filter.get("fromBlock", "latest"))
+        to_block = self._block_param(log_filter.get("toBlock", "latest"))
+        addresses = log_filter.get("address") or []
+        addresses = {address.lower() for address in ([addresses] if isinstance(addresses, str) else addresses)}
+        topics = log_filter.get("topics") or []
+
+        def matches(log: Dict[str, Any]) -> bool:
+            if not from_block <= int(log["blockNumber"], 16) <= to_block:
+                return False
+            if addresses and log["address"].lower() not in addresses:
+                return False
+            for position, expected in enumerate(topics):
+                if expected is None:
+                    continue
+                expected = [expected] if isinstance(expected, str) else expected
+                if log["topics"][position] not in expected:
+                    return False
+            return True
+
+        return [log for log in self.logs if matches(log)]
+
+    def _block_param(self, value: Union[str, int]) -> int:
+        if isinstance(value, int):
+            return value
+        if value in ("latest", "pending", "safe", "finalized"):
+            return self.block_number
+        if value == "earliest":
+            return 0
+        return int(value, 16)
+
+    def _mine(self, tx: SimulatedTransaction) -> None:
+        if tx.hash not in self.pending:
+            return
+        nonce = self.nonces.get(tx.sender, 0)
+        if tx.nonce > nonce:
+            # a transaction with an earlier nonce of the sender is still in the mempool
+            self.world.call_later([SIMULATION_BLOCK_TIME, SIMULATION_BLOCK_TIME], self._mine, tx)
+            return
+
+        # the first transaction with a nonce to be mined drops the others that were sent with it
+        for other in list(self.pending.values()):
+            if other.sender == tx.sender and other.nonce == tx.nonce:
+                del self.pending[other.hash]
+        if tx.nonce < nonce:
+            return
+
+        self.nonces[tx.sender] = nonce + 1
+        tx.block_number = self.block_number
+        gas_used, success = self._execute(tx)
+        gas_price = tx.max_fee if tx.tx_type != 2 else min(tx.max_fee, self.base_fee + tx.priority_fee)
+        self.debit(ZERO_ADDRESS, tx.sender, gas_used * gas_price)
+
+        self.world.stats.transactions += 1
+        self.world.last_mined_at = self.world.now
+        if not success:
+            self.world.stats.reverted_transactions += 1
+        self.mined[tx.hash] = tx
+        self.receipts[tx.hash] = {
+            "transactionHash": tx.hash,
+            "transactionIndex": "0x0",
+            "blockNumber": _to_hex(tx.block_number),
+            "blockHash": "0x" + keccak(tx.block_number.to_bytes(32, "big")).hex(),
+            "from": tx.sender,
+            "to": tx.to,
+            "cumulativeGasUsed": _to_hex(gas_used),
+            "gasUsed": _to_hex(gas_used),
+            "effectiveGasPrice": _to_hex(gas_price),
+            "contractAddress": None,
+            "logs": [],
+            "logsBloom": "0x" + "00" * 256,
+            "status": "0x1" if success else "0x0",
+            "type": _to_hex(tx.tx_type),
+        }
+
+    def _execute(self, tx: SimulatedTransaction) -> Tuple[int, bool]:
+        """
+        Applies the effects of a mined transaction, returns its gas used and whether it succeeded.
+        """
+        gas = self._get_gas(to=tx.to, data=tx.data)
+        gas_used = int(gas * random.uniform(0.9, 1.0)) if gas != TRANSFER_GAS else gas
+        if self.balance_of(ZERO_ADDRESS, tx.sender) < tx.value:
+            return gas_used, False
+
+        if tx.to == SIMULATED_BRIDGE_ADDRESS and tx.data[:4] == SIMULATED_BRIDGE_SELECTOR:
+            if self._bridge_error(sender=tx.sender, value=tx.value, data=tx.data) is not None:
+                return gas_used, False
+            if random.random() < self.world.failure_rate:
+                return gas_used, False
+            self.debit(ZERO_ADDRESS, tx.sender, tx.value)
+            self._bridge(tx)
+            return gas_used, True
+
+        if tx.data[:4] == _selector(ERC20_APPROVE_SELECTOR) and tx.to in self.tokens:
+            spender, amount = decode(["address", "uint256"], tx.data[4:])
+            self.allowances[(tx.to, tx.sender, spender.lower())] = amount
+        elif not tx.data and tx.to is not None:
+            self.credit(ZERO_ADDRESS, tx.to, tx.value)
+        self.debit(ZERO_ADDRESS, tx.sender, tx.value)
+        return gas_used, True
+
+    def _bridge(self, tx: SimulatedTransaction) -> None:
+        dest_chain_id, token_in, token_out, amount, to_amount, receiver = decode(SIMULATED_BRIDGE_ARGS, tx.data[4:])
+        token_in = token_in.lower()
+        if token_in != ZERO_ADDRESS:
+            self.debit(token_in, tx.sender, amount)
+            key = (token_in, tx.sender, SIMULATED_BRIDGE_ADDRESS)
+            if self.allowances[key] != MAX_UINT256:
+                self.allowances[key] -= amount
+
+        self.world.stats.bridges += 1
+        self.world.transfers[tx.hash] = "PENDING"
+        dest = self.world.chains_by_id[dest_chain_id]
+
+        def arrive() -> None:
+            dest.credit(token_out, receiver, to_amount, sender=SIMULATED_BRIDGE_ADDRESS)
+            self.world.transfers[tx.hash] = "DONE"
+
+        self.world.call_later(SIMULATION_BRIDGE_TIME, arrive)
+
+
+class SimulatedResponse:
+    def __init__(self, method: str, url: URL, status: int, body: Any) -> None:
+        self.method = method
+        self.url = url
+        self.status = status
+        self.reason = "OK" if status < 400 else "Not Found"
+        self.headers = {"Content-Type": "application/json"}
+        self._body = json.dumps(body).encode()
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            request_info = RequestInfo(
+                url=self.url, method=self.method, headers=CIMultiDictProxy(CIMultiDict()), real_url=self.url
+            )
+            raise ClientResponseError(request_info=request_info, history=(), status=self.status, message=self.reason)
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "strict") -> str:
+        return self._body.decode(encoding or "utf-8", errors)
+
+    async def json(self, content_type: Optional[str] = "application/json", **kwargs) -> Any:
+        return json.loads(self._body)
+
+    def release(self) -> None:
+        pass
+
+
+class SimulatedRequest:
+    """
+    Like the request context of aiohttp, it can be awaited or used with `async with`.
+    """
+
+    def __init__(self, response) -> None:
+        self._response = response
+
+    def __await__(self):
+        return self._response.__await__()
+
+    async def __aenter__(self) -> SimulatedResponse:
+        return await self._response
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+class SimulatedSession:
+    """
+    Stands in for the aiohttp session of one proxy, the world answers every request after a simulated latency.
+    """
+
+    def __init__(self, world: "SimulatedWorld") -> None:
+        self.world = world
+        self.headers: Dict[str, str] = {}
+        self.closed = False
+
+    def request(self, method: str, url: Union[str, URL], **kwargs) -> SimulatedRequest:
+        return SimulatedRequest(self.world.handle(method=method, url=url, **kwargs))
+
+    def get(self, url: Union[str, URL], **kwargs) -> SimulatedRequest:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: Union[str, URL], **kwargs) -> SimulatedRequest:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: Union[str, URL], **kwargs) -> SimulatedRequest:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: Union[str, URL], **kwargs) -> SimulatedRequest:
+        return self.request("DELETE", url, **kwargs)
+
+    async def ws_connect(self, url: str, **kwargs) -> None:
+        # chains with a websocket endpoint fall back to polling, like they do while the subscription is down
+        raise aiohttp.ClientConnectionError(f"Websocket endpoints aren't simulated: {url}")
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class SimulatedWorld:
+    """
+    Everything the bot talks to, in memory: the json-rpc endpoints of every chain, li.fi, coinlore and okx.
+    """
+
+    def __init__(self, failure_rate: float = SIMULATION_FAILURE_RATE) -> None:
+        self.failure_rate = failure_rate
+        self.stats = SimulationStats()
+        self.loop = asyncio.get_event_loop()
+        self.started_at = self.last_mined_at = self.now
+        self.chains = {chain.name: SimulatedChain(world=self, chain=chain) for chain in get_chains()}
+        self.chains_by_id = {chain.chain.chain_id: chain for chain in self.chains.values()}
+        self.rpcs = {
+            str(URL(rpc)): chain for chain in self.chains.values() for rpc in chain.chain.rpcs
+        }
+        # li.fi status of every bridge by its source transaction
+        self.transfers: Dict[str, str] = {}
+        self.withdrawals: List[Dict[str, str]] = []
+        self.api_handlers: Dict[str, Callable[[URL, Any], Tuple[int, Any]]] = {
+            JUMPER_ROUTE_URL: self._lifi_routes,
+            JUMPER_BUILD_TX_URL: self._lifi_step_transaction,
+            JUMPER_STATUS_URL: self._lifi_status,
+            str(URL(TOKEN_PRICE_FETCH_URL.format("")).with_query(None)): self._token_prices,
+        }
+        if PROXY_CHANGE_IP_URL:
+            self.api_handlers[str(URL(PROXY_CHANGE_IP_URL).with_query(None))] = lambda url, payload: (200, "ok")
+        self.okx_handlers: Dict[str, Callable[[URL, Any], Any]] = {
+            "public/instruments": self._okx_instruments,
+            "asset/currencies": self._okx_currencies,
+            "asset/balances": lambda url, payload: [
+                {"ccy": url.query.get("ccy"), "availBal": OKX_FUNDING_BALANCE, "bal": OKX_FUNDING_BALANCE}
+            ],
+            "users/subaccount/list": lambda url, payload: [],
+            "asset/subaccount/balances": lambda url, payload: [],
+            "asset/transfer": lambda url, payload: [{"transId": "1", **payload}],
+            "asset/withdrawal": self._okx_withdraw,
+            "asset/withdrawal-history": self._okx_withdrawal_history,
+        }
+
+    @property
+    def now(self) -> float:
+        return self.loop.time()
+
+    def call_later(self, delay_range: List[float], callback: Callable, *args) -> None:
+        self.loop.call_later(random.uniform(*delay_range), callback, *args)
+
+    def fund(self, address: str) -> None:
+        for chain in self.chains.values():
+            native = chain.chain.tokens[chain.chain.coin_symbol]
+            chain.credit(ZERO_ADDRESS, address, native.to_wei(_native_amount(chain.chain, SIMULATION_NATIVE_BALANCE)))
+            usdc = chain.chain.tokens.get(TokenName.USDC.value)
+            if usdc is not None:
+                chain.balances[(usdc.contract_address.lower(), address.lower())] = usdc.to_wei(SIMULATION_USDC_BALANCE)
+
+    async def handle(self, method: str, url: Union[str, URL], **kwargs) -> SimulatedResponse:
+        url = URL(url) if isinstance(url, str) else url
+        if kwargs.get("params"):
+            url = url.update_query(kwargs["params"])
+        payload = kwargs.get("json")
+        if payload is None and kwargs.get("data"):
+            payload = json.loads(kwargs["data"])
+
+        chain = self.rpcs.get(str(url))
+        if chain is not None:
+            self.stats.rpc_requests += 1
+            await asyncio.sleep(random.uniform(*SIMULATION_RPC_LATENCY))
+            if isinstance(payload, list):
+                return SimulatedResponse(method, url, 200, [chain.handle(request) for request in payload])
+            return SimulatedResponse(method, url, 200, chain.handle(payload))
+
+        endpoint = str(url.with_query(None))
+        if url.host == "www.okx.com" and url.path.startswith("/api/v5/"):
+            path = url.path[len("/api/v5/"):]
+            self.stats.api_calls[f"okx {path}"] += 1
+            handler = self.okx_handlers.get(path)
+            await asyncio.sleep(random.uniform(*SIMULATION_API_LATENCY))
+            if handler is None:
+                return SimulatedResponse(method, url, 404, {"code": "404", "msg": f"{path} isn't simulated"})
+            return SimulatedResponse(method, url, 200, {"code": "0", "msg": "", "data": handler(url, payload)})
+
+        handler = self.api_handlers.get(endpoint)
+        self.stats.api_calls[endpoint] += 1
+        await asyncio.sleep(random.uniform(*SIMULATION_API_LATENCY))
+        if handler is None:
+            return SimulatedResponse(method, url, 404, {"message": f"{endpoint} isn't simulated"})
+        status, body = handler(url, payload)
+        return SimulatedResponse(method, url, status, body)
+
+    def _find_token(self, chain_id: int, address: str) -> Token:
+        return self.chains_by_id[chain_id].tokens[address.lower()]
+
+    def _lifi_routes(self, url: URL, payload: Dict[str, Any]) -> Tuple[int, Any]:
+        amount = int(payload["fromAmount"])
+        if amount <= 0:
+            return 200, {"routes": []}
+
+        src_chain_id, dest_chain_id = payload["fromChainId"], payload["toChainId"]
+        token_in = self._find_token(src_chain_id, payload["fromTokenAddress"])
+        token_out = self._find_token(dest_chain_id, payload["toTokenAddress"])
+        value = token_in.from_wei(amount) * SIMULATION_TOKEN_PRICES[token_in.symbol]
+        to_amount = token_out.to_wei(value / SIMULATION_TOKEN_PRICES[token_out.symbol] * 0.997)
+        step = {
+            "type": "lifi",
+            "tool": SIMULATED_BRIDGE_TOOLS[(src_chain_id + dest_chain_id) % len(SIMULATED_BRIDGE_TOOLS)],
+            "action": {
+                "fromChainId": src_chain_id,
+                "toChainId": dest_chain_id,
+                "fromToken": {"address": token_in.contract_address, "symbol": token_in.symbol.upper()},
+                "toToken": {"address": token_out.contract_address, "symbol": token_out.symbol.upper()},
+                "fromAmount": str(amount),
+                "fromAddress": payload["fromAddress"],
+                "toAddress": payload["toAddress"],
+            },
+            "estimate": {
+                "fromAmount": str(amount),
+                "toAmount": str(to_amount),
+                "approvalAddress": AsyncWeb3.to_checksum_address(SIMULATED_BRIDGE_ADDRESS),
+            },
+        }
+        return 200, {"routes": [{"fromAmount": str(amount), "toAmount": str(to_amount), "steps": [step]}]}
+
+    def _lifi_step_transaction(self, url: URL, step: Dict[str, Any]) -> Tuple[int, Any]:
+        action, estimate = step["action"], step["estimate"]
+        src_chain = self.chains_by_id[action["fromChainId"]].chain
+        amount = int(action["fromAmount"])
+        native = src_chain.tokens[src_chain.coin_symbol]
+        fee = native.to_wei(SIMULATION_BRIDGE_FEE / SIMULATION_TOKEN_PRICES[native.symbol])
+        is_native = action["fromToken"]["address"].lower() == ZERO_ADDRESS
+
+        data = SIMULATED_BRIDGE_SELECTOR + encode(SIMULATED_BRIDGE_ARGS, [
+            action["toChainId"],
+            action["fromToken"]["address"],
+            action["toToken"]["address"],
+            amount,
+            int(estimate["toAmount"]),
+            action["toAddress"],
+        ])
+        step["transactionRequest"] = {
+            "from": action["fromAddress"],
+            "to": AsyncWeb3.to_checksum_address(SIMULATED_BRIDGE_ADDRESS),
+            "chainId": action["fromChainId"],
+            "data": "0x" + data.hex(),
+            "value": _to_hex(amount + fee if is_native else 0),
+            "gasLimit": _to_hex(BRIDGE_GAS),
+        }
+        return 200, step
+
+    def _lifi_status(self, url: URL, payload: Any) -> Tuple[int, Any]:
+        status = self.transfers.get(url.query.get("txHash", ""))
+        if status is None:
+            return 404, {"status": "NOT_FOUND", "message": "Not a valid txHash"}
+        if status == "PENDING":
+            return 200, {"status": "PENDING", "substatus": "WAIT_DESTINATION_TRANSACTION"}
+        return 200, {"status": "DONE", "substatus": "COMPLETED", "tool": url.query.get("bridge")}
+
+    def _token_prices(self, url: URL, payload: Any) -> Tuple[int, Any]:
+        api_ids = url.query.get("id", "").split(",")
+        return 200, [
+            {"id": api_id, "symbol": PRICE_API_IDS[api_id].upper(), "price_usd": str(
+                SIMULATION_TOKEN_PRICES[PRICE_API_IDS[api_id]]
+            )}
+            for api_id in api_ids
+        ]
+
+    def _okx_currencies_by_chain(self) -> Dict[str, Chain]:
+        return {
+            f"{chain.coin_symbol.upper()}-{chain.okx_chain_name}": chain
+            for chain in get_chains()
+            if chain.okx_chain_name
+        }
+
+    def _okx_instruments(self, url: URL, payload: Any) -> List[Dict[str, str]]:
+        if url.query.get("instType") != "SPOT":
+            return []
+        currencies = {chain.coin_symbol.upper() for chain in self._okx_currencies_by_chain().values()}
+        return [
+            {
+                "instId": f"{currency}-USDT", "instType": "SPOT", "baseCcy": currency, "quoteCcy": "USDT",
+                "settleCcy": "", "ctVal": "", "ctMult": "", "ctValCcy": "", "optType": "", "stk": "", "uly": "",
+                "instFamily": "", "listTime": "1606468572000", "expTime": "", "lever": "10", "tickSz": "0.0001",
+                "lotSz": "0.000001", "minSz": "0.0001", "ctType": "", "alias": "", "state": "live",
+            }
+            for currency in sorted(currencies)
+        ]
+
+    def _okx_currencies(self, url: URL, payload: Any) -> List[Dict[str, Any]]:
+        return [
+            {
+                "ccy": okx_chain.split("-")[0], "chain": okx_chain, "name": chain.coin_symbol.upper(),
+                "canDep": True, "canWd": True, "canInternal": True, "minFee": chain.okx_withdrawal_fee,
+                "maxFee": chain.okx_withdrawal_fee, "minWd": "0.0001", "maxWd": "1000000", "wdTickSz": "8",
+                "mainNet": False,
+            }
+            for okx_chain, chain in self._okx_currencies_by_chain().items()
+        ]
+
+    def _okx_withdraw(self, url: URL, payload: Dict[str, Any]) -> List[Dict[str, str]]:
+        chain = self._okx_currencies_by_chain()[payload["chain"]]
+        self.stats.withdrawals += 1
+        withdrawal = {
+            "wdId": str(len(self.withdrawals) + 1),
+            "ccy": payload["ccy"],
+            "chain": payload["chain"],
+            "amt": str(payload["amt"]),
+            "toAddr": payload["toAddr"],
+            "state": "0",
+            "ts": str(int(time.time() * 1000)),
+        }
+        self.withdrawals.append(withdrawal)
+
+        def send() -> None:
+            withdrawal["state"] = "2"
+            native = chain.tokens[chain.coin_symbol]
+            self.chains[chain.name].credit(ZERO_ADDRESS, payload["toAddr"], native.to_wei(float(payload["amt"])))
+
+        self.call_later(SIMULATION_OKX_WITHDRAWAL_TIME, send)
+        return [{"wdId": withdrawal["wdId"], "ccy": withdrawal["ccy"], "amt": withdrawal["amt"]}]
+
+    def _okx_withdrawal_history(self, url: URL, payload: Any) -> List[Dict[str, str]]:
+        if "wdId" in url.query:
+            return [item for item in self.withdrawals if item["wdId"] == url.query["wdId"]]
+        history = self.withdrawals[::-1]
+        if "after" in url.query:
+            history = [item for item in history if int(item["ts"]) < int(url.query["after"])]
+        return history[:int(url.query.get("limit", 100))]
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "rpc_requests": self.stats.rpc_requests,
+            "rpc_calls": dict(self.stats.rpc_calls.most_common()),
+            "api_calls": dict(self.stats.api_calls.most_common()),
+            "transactions": self.stats.transactions,
+            "reverted_transactions": self.stats.reverted_transactions,
+            "bridges": self.stats.bridges,
+            "withdrawals": self.stats.withdrawals,
+        }
+
+
+def _build_database(world: SimulatedWorld, wallets: int) -> None:
+    private_keys = ["0x" + os.urandom(32).hex() for _ in range(wallets)]
+    deposit_addresses = [AsyncWeb3.to_checksum_address("0x" + os.urandom(20).hex()) for _ in range(wallets)]
+    data = Database.build_wallets(private_keys=private_keys, proxies=[], deposit_addresses=deposit_addresses)
+    Database(data=data).save_database()
+    for wallet in data:
+        world.fund(wallet.address)
+
+
+async def _wait_for_stall(world: SimulatedWorld) -> None:
+    while world.now - world.last_mined_at < SIMULATION_STALL_TIME:
+        await asyncio.sleep(world.last_mined_at + SIMULATION_STALL_TIME - world.now)
+
+
+async def _run_mode(world: SimulatedWorld, mode: str) -> str:
+    """
+    Runs `mode` until it's done, stalls or `SIMULATION_MAX_TIME` runs out, returns which of them happened.
+    """
+    run = asyncio.create_task(SIMULATED_MODES[mode]())
+    stall = asyncio.create_task(_wait_for_stall(world=world))
+    try:
+        await asyncio.wait([run, stall], timeout=SIMULATION_MAX_TIME, return_when=asyncio.FIRST_COMPLETED)
+        if run.done():
+            run.result()
+            return "finished"
+        return "stalled" if stall.done() else "timed out"
+    finally:
+        for task in (run, stall):
+            task.cancel()
+        await close_websockets()
+        await close_exchange()
+        await sessions.close()
+
+
+def simulate(loop: asyncio.AbstractEventLoop, mode: str, wallets: int) -> Dict[str, Any]:
+    """
+    Runs `mode` for `wallets` fresh wallets against the simulated world on `loop` and returns the report.
+
+    The wallets database, okx markets cache and every other file the bot writes go to a temporary directory,
+    the log to `data/logs/simulation.log`.
+    """
+    loguru_logger.remove()
+    loguru_logger.add(sink=SIMULATION_LOG_PATH)
+
+    asyncio.set_event_loop(loop)
+    world = SimulatedWorld()
+    sessions.session_factory = lambda proxy: SimulatedSession(world=world)
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        os.chdir(scratch_dir)
+        os.makedirs("data", exist_ok=True)
+        _build_database(world=world, wallets=wallets)
+
+        started_at, real_started_at = loop.time(), time.perf_counter()
+        status = loop.run_until_complete(_run_mode(world=world, mode=mode))
+        simulated_time, real_time = loop.time() - started_at, time.perf_counter() - real_started_at
+        failed_wallets = len(UNFINISHED_WALLETS[mode](Database.read()))
+
+        # pollers that wait for their idle timeout
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+    return {
+        "mode": mode,
+        "wallets": wallets,
+        "status": status,
+        "failed_wallets": failed_wallets,
+        "simulated_time": simulated_time,
+        "real_time": real_time,
+        **world.report(),
+    }
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import sys
+from typing import Any, Dict
+
+from core.constants import SIMULATION_DEFAULT_WALLETS, SIMULATION_ERROR_LINES, SIMULATION_STALL_TIME
+from logger import logger
+
+SIMULATED_MODES = ("warmup", "volume", "collector")
+
+
+def _format_duration(seconds: float) -> str:
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}h {rest // 60:02d}m {rest % 60:02d}s"
+
+
+def _format_calls(calls: Dict[str, int]) -> str:
+    return ", ".join(f"{name}: {count}" for name, count in calls.items())
+
+
+async def simulate_mode(mode: str, wallets: int) -> Dict[str, Any]:
+    """
+    Runs one module over `wallets` fresh wallets in a child process (`modules.simulation_worker`) on a virtual
+    clock, against simulated chains, li.fi and okx, and returns its report.
+    """
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "modules.simulation_worker", mode, str(wallets),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        output = "\n".join(stderr.decode(errors="replace").strip().splitlines()[-SIMULATION_ERROR_LINES:])
+        raise Exception(f"exited with code {process.returncode}:\n{output}")
+    return json.loads(stdout.decode().strip().splitlines()[-1])
+
+
+def report(result: Dict[str, Any]) -> None:
+    mode, simulated_time = result["mode"].upper(), _format_duration(result["simulated_time"])
+    status = {
+        "finished": "finished",
+        "stalled": f"stalled after {simulated_time}, no transaction was mined for the last "
+                   f"{_format_duration(SIMULATION_STALL_TIME)}",
+        "timed out": f"not finished after {simulated_time}",
+    }[result["status"]]
+    summary = (
+        f"[SIMULATION] {mode}: {result['wallets']} wallets {status}, projected run time {simulated_time}"
+        f" (simulated in {result['real_time']:.1f}s)"
+    )
+    if result["status"] == "finished" and not result["failed_wallets"]:
+        logger.success(summary)
+    else:
+        logger.error(f"{summary}, {result['failed_wallets']} wallets failed or didn't finish")
+    logger.info(
+        f"[SIMULATION] {result['transactions']} transactions ({result['reverted_transactions']} reverted), "
+        f"{result['bridges']} bridges, {result['withdrawals']} okx withdrawals"
+    )
+    logger.info(
+        f"[SIMULATION] {result['rpc_requests']} rpc requests, {sum(result['rpc_calls'].values())} rpc calls "
+        f"({_format_calls(result['rpc_calls'])})"
+    )
+    logger.info(
+        f"[SIMULATION] {sum(result['api_calls'].values())} api calls ({_format_calls(result['api_calls'])})"
+    )
+
+
+async def simulation() -> None:
+    modes = input(f"Enter modules to simulate ({', '.join(SIMULATED_MODES)}), empty for all: ").split()
+    modes = [mode for mode in modes if mode in SIMULATED_MODES] or list(SIMULATED_MODES)
+    wallets = input(f"Enter a number of wallets (default {SIMULATION_DEFAULT_WALLETS}): ")
+    wallets = int(wallets) if wallets.strip() else SIMULATION_DEFAULT_WALLETS
+
+    for mode in modes:
+        logger.info(f"[SIMULATION] Simulating {mode} for {wallets} wallets, its log goes to data/logs/simulation.log")
+        try:
+            report(await simulate_mode(mode=mode, wallets=wallets))
+        except Exception as e:
+            logger.error(f"[SIMULATION] Simulation of {mode} failed: {e}")
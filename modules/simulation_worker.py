@@ -0,0 +1,82 @@
+"""
+Child process of the simulation menu entry: `python -m modules.simulation_worker <mode> <wallets>`.
+
+Runs one mode against `modules.simulated_world` on a virtual clock and prints its report as the last line of
+stdout. Only the standard library is imported at the top, the clock has to be in place before anything that reads
+the time on import (the throttler of ccxt keeps its own reference to `time.time`).
+"""
+import asyncio
+import json
+import os
+import selectors
+import sys
+import time
+from typing import Optional
+
+
+class VirtualClockSelector(selectors.DefaultSelector):
+    """
+    Selector that never blocks: instead of waiting for the next timer it moves the clock forward to it.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.now = time.monotonic()
+
+    def select(self, timeout: Optional[float] = None):
+        if timeout is not None and timeout > 0:
+            self.now += timeout
+            timeout = 0
+        return super().select(timeout)
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop whose `time()` is the virtual clock of its selector, so `asyncio.sleep` and timeouts
+    cost no real time as long as nothing waits for real I/O.
+    """
+
+    def __init__(self) -> None:
+        self._clock = VirtualClockSelector()
+        super().__init__(selector=self._clock)
+
+    def time(self) -> float:
+        return self._clock.now
+
+
+def use_virtual_time(loop: VirtualTimeEventLoop) -> None:
+    """
+    Makes `time.monotonic` and `time.time` follow the clock of `loop`, for the deadlines, caches and timestamps
+    of the bot. Must run before the bot and ccxt are imported.
+    """
+    epoch = time.time() - loop.time()
+    time.monotonic = loop.time
+    time.time = lambda: epoch + loop.time()
+
+
+def configure() -> None:
+    """
+    Turns off everything that waits for a person or talks to telegram, and gives okx placeholder credentials
+    the simulated exchange accepts.
+    """
+    os.environ["TQDM_DISABLE"] = "1"
+    import config
+
+    config.MANUAL_TRANSFERS_MODE = False
+    config.USE_TG_BOT = False
+    config.OKX_API_KEY = config.OKX_API_SECRET = config.OKX_API_PASSWORD = "simulation"
+
+
+def main() -> None:
+    mode, wallets = sys.argv[1], int(sys.argv[2])
+    loop = VirtualTimeEventLoop()
+    use_virtual_time(loop)
+    configure()
+
+    from modules.simulated_world import simulate
+
+    print(json.dumps(simulate(loop=loop, mode=mode, wallets=wallets)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import random
+from functools import partial
 
 from config import (
     USE_MOBILE_PROXY,
-    WALLET_DELAY_RANGE,
     TX_DELAY_RANGE,
     OKX_WITHDRAW_AMOUNT_RANGE,
     MANUAL_TRANSFERS_MODE,
@@ -14,50 +14,67 @@ from config import (
     USE_OKX_WITHDRAW,
 )
 from core import Client
+from core.constants import ARRIVAL_WAIT_TIMEOUT, RETRIES
 from core.cex.okx import Okx
 from core.dapps import JumperBridge
 from core.models.chain import Chain
 from core.models.enums import TokenName
 from core.models.token import Token
 from core.models.wallet import Wallet
+from core.scheduler import WalletScheduler
+from core.transfers import wait_for_bridge
 from logger import logger
 from modules.database import Database
 from utils import change_ip, sleep, get_chain_by_name, find_token
 
 
 async def volume():
-    database = Database.read_from_json()
+    database = Database.read()
 
     if not database.ensure_ready_for_volume_mode():
         logger.error(f"Deposit addresses must be provided for each wallet")
         return
 
-    while database.has_volume_actions_available():
-        try:
-            if USE_MOBILE_PROXY:
-                await change_ip()
+    scheduler = WalletScheduler()
 
-            wallet_data = database.get_first_volume_wallet()
+    await scheduler.run(
+        items=database.get_volume_wallets(),
+        worker=partial(volume_wallet, database=database, scheduler=scheduler),
+        shuffle=False,
+    )
+    logger.success("No more wallets left")
 
-            if wallet_data is None:
-                break
 
-            wallet, wallet_index = wallet_data
+async def volume_wallet(wallet: Wallet, wallet_index: int, database: Database, scheduler: WalletScheduler) -> None:
+    for _ in range(RETRIES):
+        try:
+            if USE_MOBILE_PROXY:
+                await change_ip()
 
             logger.info(f"Working with wallet {wallet}")
 
-            await perform_volume_mode_cycle(
+            if await perform_volume_mode_cycle(
                 database=database,
                 wallet=wallet,
-                wallet_index=wallet_index
-            )
-            await sleep(delay_range=WALLET_DELAY_RANGE, send_message=False)
+                wallet_index=wallet_index,
+                scheduler=scheduler,
+            ):
+                return
+            # the cycle already retried the step that failed, running it again would only repeat the failure
+            break
         except Exception as e:
             logger.exception(f"Error occurred: {e}")
-    logger.success("No more wallets left")
+        # the delay between wallets is made by the scheduler, this one only spaces out retries of the cycle
+        await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
 
+    if not wallet.volume_mode_state['deposited_to_cex']:
+        logger.error(f"Wallet {wallet} failed, its progress is saved and it will continue on the next run")
 
-async def perform_volume_mode_cycle(database: Database, wallet: Wallet, wallet_index: int) -> bool:
+
+async def perform_volume_mode_cycle(
+        database: Database, wallet: Wallet, wallet_index: int, scheduler: WalletScheduler
+) -> bool:
+    failed_bridges = 0
     while wallet.volume_mode_state['volume_reached'] < wallet.volume_mode_state['volume_goal']:
         if USE_MOBILE_PROXY:
             await change_ip()
@@ -92,12 +109,12 @@ async def perform_volume_mode_cycle(database: Database, wallet: Wallet, wallet_i
                 dest_token = find_token(tokens=dest_client.chain.tokens, symbol=TokenName.USDC.value)
 
         if wallet.volume_mode_state["initial_balance"] is not None:
-            if await check_if_bridge_finished(wallet=wallet, client=src_client, token=src_token):
+            if await check_if_bridge_finished(wallet=wallet, client=src_client, token=src_token, scheduler=scheduler):
                 logger.success(f"Bridged token has successfully reached {src_client.chain.name.upper()}")
                 database.update_item(item_index=wallet_index, volume_mode_state=wallet.volume_mode_state)
             else:
                 logger.warning(f"Bridged token is still inflight")
-                await sleep(delay_range=TX_DELAY_RANGE, send_message=False)
+                await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
                 continue
 
         src_balance = await src_client.get_token_balance(src_token, wei=False)
@@ -108,13 +125,23 @@ async def perform_volume_mode_cycle(database: Database, wallet: Wallet, wallet_i
             amount = round(src_balance * random.randint(*VOLUME_BRIDGE_PERCENTAGE_RANGE) / 100, src_token.round_to)
 
         if amount is None or round(amount, src_token.round_to - 2) > 0:
-            tx_status, bridged_amount = await JumperBridge(client=src_client).bridge(
-                amount=amount, token_in=src_token, token_out=dest_token, dest_chain=dest_client.chain
-            )
+            async with scheduler.chain_slot(src_client.chain):
+                tx_status, bridged_amount = await JumperBridge(client=src_client).bridge(
+                    amount=amount, token_in=src_token, token_out=dest_token, dest_chain=dest_client.chain
+                )
         else:
             logger.error(f"Amount of {src_token.symbol.upper()} in chain {src_client.chain.name.upper()} very low")
             break
 
+        if not tx_status:
+            failed_bridges += 1
+            if failed_bridges >= RETRIES:
+                logger.error(f"Bridge from {src_client.chain.name.upper()} failed {failed_bridges} times in a row")
+                return False
+            await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
+            continue
+        failed_bridges = 0
+
         wallet.volume_mode_state['initial_balance'] = round(
             await dest_client.get_token_balance(dest_token, wei=False), dest_token.round_to
         )
@@ -122,19 +149,24 @@ async def perform_volume_mode_cycle(database: Database, wallet: Wallet, wallet_i
         wallet.volume_mode_state['volume_reached'] += bridged_amount * (await src_client.fetch_token_price([src_token]))[0]
         database.update_item(item_index=wallet_index, volume_mode_state=wallet.volume_mode_state)
 
-        await sleep(delay_range=TX_DELAY_RANGE, send_message=False)
+        await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
 
     if not NATIVE_BRIDGE_MODE:
-        if not await bridge_to_native(database=database, wallet=wallet, wallet_index=wallet_index):
+        if not await bridge_to_native(
+                database=database, wallet=wallet, wallet_index=wallet_index, scheduler=scheduler
+        ):
             return False
 
     if not wallet.volume_mode_state['deposited_to_cex']:
-        if not await transfer_to_cex_action(database=database, wallet=wallet, wallet_index=wallet_index):
+        if not await transfer_to_cex_action(
+                database=database, wallet=wallet, wallet_index=wallet_index, scheduler=scheduler
+        ):
             return False
     return True
 
 
-async def bridge_to_native(wallet: Wallet, database: Database, wallet_index: int):
+async def bridge_to_native(wallet: Wallet, database: Database, wallet_index: int, scheduler: WalletScheduler):
+    failed_bridges = 0
     while True:
         src_client = wallet.to_client(chain=get_chain_by_name(wallet.volume_mode_state['current_chain']))
         src_token = find_token(tokens=src_client.chain.tokens, symbol=TokenName.USDC.value)
@@ -143,11 +175,11 @@ async def bridge_to_native(wallet: Wallet, database: Database, wallet_index: int
         dest_client = wallet.to_client(get_random_volume_chain(excluded_chain=src_client.chain))
         dest_token = find_token(tokens=dest_client.chain.tokens, symbol=dest_client.chain.coin_symbol)
 
-        if await check_if_bridge_finished(wallet=wallet, client=src_client, token=src_token):
+        if await check_if_bridge_finished(wallet=wallet, client=src_client, token=src_token, scheduler=scheduler):
             logger.success(f"Bridged token has successfully reached {src_client.chain.name.upper()}")
         else:
             logger.warning(f"Bridged token is still inflight")
-            await sleep(delay_range=TX_DELAY_RANGE, send_message=False)
+            await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
             continue
 
         if BRIDGE_FULL_BALANCE:
@@ -156,34 +188,41 @@ async def bridge_to_native(wallet: Wallet, database: Database, wallet_index: int
             amount = round(src_balance * random.randint(*VOLUME_BRIDGE_PERCENTAGE_RANGE) / 100, src_token.round_to)
 
         if amount is None or round(amount, src_token.round_to - 2) > 0:
-            tx_status, _ = await JumperBridge(client=src_client).bridge(
-                amount=amount, token_in=src_token, token_out=dest_token, dest_chain=dest_client.chain
-            )
+            async with scheduler.chain_slot(src_client.chain):
+                tx_status, _ = await JumperBridge(client=src_client).bridge(
+                    amount=amount, token_in=src_token, token_out=dest_token, dest_chain=dest_client.chain
+                )
         else:
             return True
 
-        if tx_status:
-            wallet.volume_mode_state['initial_balance'] = round(
-                await dest_client.get_token_balance(dest_token, wei=False), dest_token.round_to
-            )
-            wallet.volume_mode_state['current_chain'] = dest_client.chain.name
-            database.update_item(item_index=wallet_index, volume_mode_state=wallet.volume_mode_state)
-            await sleep(delay_range=TX_DELAY_RANGE, send_message=False)
+        if not tx_status:
+            failed_bridges += 1
+            if failed_bridges >= RETRIES:
+                logger.error(f"Bridge from {src_client.chain.name.upper()} failed {failed_bridges} times in a row")
+                return False
+            await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
+            continue
+
+        wallet.volume_mode_state['initial_balance'] = round(
+            await dest_client.get_token_balance(dest_token, wei=False), dest_token.round_to
+        )
+        wallet.volume_mode_state['current_chain'] = dest_client.chain.name
+        database.update_item(item_index=wallet_index, volume_mode_state=wallet.volume_mode_state)
+        await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
         return True
 
 
 async def okx_withdraw_action(wallet: Wallet, wallet_index: int, database: Database, client: Client) -> bool:
     okx = Okx(client=client)
 
-    if not await okx.transfer_from_sub_accounts(symbol=client.chain.coin_symbol.upper()):
-        return False
-
     if MANUAL_TRANSFERS_MODE:
         amount = float(input(f"Enter amount of {client.chain.coin_symbol} to withdraw from okx: "))
     else:
         amount = round(random.uniform(*OKX_WITHDRAW_AMOUNT_RANGE), 6)
 
     if amount > 0:
+        if not await okx.transfer_from_sub_accounts(symbol=client.chain.coin_symbol.upper(), amount=amount):
+            return False
         if not await okx.withdraw(amount=amount):
             return False
 
@@ -192,15 +231,18 @@ async def okx_withdraw_action(wallet: Wallet, wallet_index: int, database: Datab
     return True
 
 
-async def transfer_to_cex_action(database: Database, wallet: Wallet, wallet_index: int) -> bool:
+async def transfer_to_cex_action(
+        database: Database, wallet: Wallet, wallet_index: int, scheduler: WalletScheduler
+) -> bool:
+    failed_transfers = 0
     while True:
         src_client = wallet.to_client(chain=get_chain_by_name(wallet.volume_mode_state['current_chain']))
         src_token = find_token(tokens=src_client.chain.tokens, symbol=src_client.chain.coin_symbol)
-        if await check_if_bridge_finished(wallet=wallet, client=src_client, token=src_token):
+        if await check_if_bridge_finished(wallet=wallet, client=src_client, token=src_token, scheduler=scheduler):
             logger.success(f"Bridged token has successfully reached {src_client.chain.name.upper()}")
         else:
             logger.warning(f"Bridged token is still inflight")
-            await sleep(delay_range=TX_DELAY_RANGE, send_message=False)
+            await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
             continue
 
         balance = await src_client.get_token_balance(src_token, wei=False)
@@ -218,7 +260,12 @@ async def transfer_to_cex_action(database: Database, wallet: Wallet, wallet_inde
 
         if amount_to_transfer > 0:
             if not await src_client.transfer(to_address=wallet.deposit_address, amount=amount_to_transfer):
-                return False
+                failed_transfers += 1
+                if failed_transfers >= RETRIES:
+                    logger.error(f"Transfer to CEX failed {failed_transfers} times in a row")
+                    return False
+                await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
+                continue
 
         wallet.volume_mode_state['deposited_to_cex'] = True
         database.update_item(item_index=wallet_index, volume_mode_state=wallet.volume_mode_state)
@@ -234,6 +281,12 @@ def get_random_volume_chain(excluded_chain: Chain):
     return get_chain_by_name(random.choice(chains))
 
 
-async def check_if_bridge_finished(wallet: Wallet, client: Client, token: Token) -> bool:
-    current_balance = await client.get_token_balance(token, wei=False)
-    return current_balance > wallet.volume_mode_state["initial_balance"]
+async def check_if_bridge_finished(wallet: Wallet, client: Client, token: Token, scheduler: WalletScheduler) -> bool:
+    async with scheduler.park():
+        return await wait_for_bridge(
+            chain=client.chain,
+            address=client.address,
+            token=token,
+            initial_balance=wallet.volume_mode_state["initial_balance"],
+            timeout=ARRIVAL_WAIT_TIMEOUT,
+        )
@@ -1,4 +1,5 @@
 import random
+from functools import partial
 
 from config import (
     BRIDGE_PERCENTAGE_RANGE,
@@ -13,25 +14,34 @@ from config import (
 )
 from core.cex.okx import Okx
 from core.client import Client
+from core.constants import ARRIVAL_WAIT_TIMEOUT
 from core.dapps import JumperBridge
 from core.models.enums import TokenName
 from core.models.token import Token
 from logger import logger
 from core.models.wallet import Wallet
+from core.scheduler import WalletScheduler
+from core.transfers import wait_for_bridge
 from modules.database import Database
 from utils import sleep, change_ip, find_token, get_chain_by_name
 
 
 async def warmup():
-    database = Database.read_from_json()
+    database = Database.read()
+    scheduler = WalletScheduler()
 
-    while database.has_actions_available():
+    await scheduler.run(
+        items=database.get_items_by_criteria(warmup_finished=False),
+        worker=partial(warmup_wallet, database=database, scheduler=scheduler),
+    )
+    logger.success("No more wallets left")
+
+
+async def warmup_wallet(wallet: Wallet, wallet_index: int, database: Database, scheduler: WalletScheduler) -> None:
+    while not wallet.warmup_finished:
         if USE_MOBILE_PROXY:
             await change_ip()
 
-        wallet_data = database.get_random_item_by_criteria(warmup_finished=False)
-        wallet, wallet_index = wallet_data
-
         logger.info(f"Working with wallet {wallet}")
 
         if wallet.current_chain is None:
@@ -67,6 +77,7 @@ async def warmup():
                 database=database,
                 client=src_client
             ):
+                await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
                 continue
             database.update_item(item_index=wallet_index, current_chain=src_chain.name)
 
@@ -76,13 +87,18 @@ async def warmup():
             dest_client=dest_client,
             wallet_index=wallet_index,
             database=database,
+            scheduler=scheduler,
         )
-        await sleep(delay_range=TX_DELAY_RANGE, send_message=False)
-    logger.success("No more wallets left")
+        await sleep(delay_range=TX_DELAY_RANGE, send_message=False, label=wallet.address[:10])
 
 
 async def perform_warmup_action(
-        src_client: Client, dest_client: Client, wallet: Wallet, wallet_index: int, database: Database
+        src_client: Client,
+        dest_client: Client,
+        wallet: Wallet,
+        wallet_index: int,
+        database: Database,
+        scheduler: WalletScheduler,
 ) -> None:
     has_actions_left = await bridge_action(
         wallet=wallet,
@@ -90,6 +106,7 @@ async def perform_warmup_action(
         database=database,
         src_client=src_client,
         dest_client=dest_client,
+        scheduler=scheduler,
     )
 
     if not has_actions_left:
@@ -97,7 +114,12 @@ async def perform_warmup_action(
 
 
 async def bridge_action(
-        wallet: Wallet, wallet_index: int, database: Database, src_client: Client, dest_client: Client
+        wallet: Wallet,
+        wallet_index: int,
+        database: Database,
+        src_client: Client,
+        dest_client: Client,
+        scheduler: WalletScheduler,
 ) -> bool:
 
     if NATIVE_BRIDGE_MODE:
@@ -111,7 +133,7 @@ async def bridge_action(
         dest_token = find_token(tokens=dest_client.chain.tokens, symbol=TokenName.USDC.value)
 
     if wallet.initial_balance is not None:
-        if await check_if_bridge_finished(wallet=wallet, client=src_client, token=src_token):
+        if await check_if_bridge_finished(wallet=wallet, client=src_client, token=src_token, scheduler=scheduler):
             logger.success(f"Bridged token has successfully reached {src_client.chain.name.upper()}")
         else:
             logger.warning(f"Bridged token is still inflight")
@@ -124,9 +146,10 @@ async def bridge_action(
         amount = round(balance * random.randint(*BRIDGE_PERCENTAGE_RANGE) / 100, src_token.round_to)
 
     if amount is None or round(amount, src_token.round_to - 2) > 0:
-        tx_status, _ = await JumperBridge(client=src_client).bridge(
-            amount=amount, token_in=src_token, token_out=dest_token, dest_chain=dest_client.chain
-        )
+        async with scheduler.chain_slot(src_client.chain):
+            tx_status, _ = await JumperBridge(client=src_client).bridge(
+                amount=amount, token_in=src_token, token_out=dest_token, dest_chain=dest_client.chain
+            )
     else:
         tx_status = False
         logger.error(f"Amount of {src_token.symbol.upper()} in chain {src_client.chain.name.upper()} very low")
@@ -145,15 +168,14 @@ async def bridge_action(
 async def okx_withdraw_action(wallet_index: int, database: Database, client: Client) -> bool:
     okx = Okx(client=client)
 
-    if not await okx.transfer_from_sub_accounts(symbol=client.chain.coin_symbol.upper()):
-        return False
-
     if MANUAL_TRANSFERS_MODE:
         amount = float(input("Enter amount to withdraw from okx: "))
     else:
         amount = round(random.uniform(*OKX_WITHDRAW_AMOUNT_RANGE), 6)
 
     if amount > 0:
+        if not await okx.transfer_from_sub_accounts(symbol=client.chain.coin_symbol.upper(), amount=amount):
+            return False
         if not await okx.withdraw(amount=amount):
             return False
 
@@ -161,6 +183,12 @@ async def okx_withdraw_action(wallet_index: int, database: Database, client: Cli
     return True
 
 
-async def check_if_bridge_finished(wallet: Wallet, client: Client, token: Token) -> bool:
-    current_balance = await client.get_token_balance(token, wei=False)
-    return current_balance > wallet.initial_balance
+async def check_if_bridge_finished(wallet: Wallet, client: Client, token: Token, scheduler: WalletScheduler) -> bool:
+    async with scheduler.park():
+        return await wait_for_bridge(
+            chain=client.chain,
+            address=client.address,
+            token=token,
+            initial_balance=wallet.initial_balance,
+            timeout=ARRIVAL_WAIT_TIMEOUT,
+        )
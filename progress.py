@@ -0,0 +1,63 @@
+import asyncio
+import itertools
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+from tqdm import tqdm
+
+# seconds between two redraws of the dashboard
+PROGRESS_REFRESH_INTERVAL = 1
+# waits listed by name, the rest are only counted
+PROGRESS_MAX_SHOWN = 5
+
+
+class WaitDashboard:
+    """
+    One status line for every wait in progress.
+
+    Each wait is a single `asyncio.sleep`; the dashboard only remembers when it ends and a single task
+    redraws the remaining time of all of them every `refresh_interval` seconds, so concurrent wallets
+    neither wake up once a second nor draw progress bars over each other.
+    """
+
+    def __init__(self, refresh_interval: float = PROGRESS_REFRESH_INTERVAL) -> None:
+        self.refresh_interval = refresh_interval
+        self._waits: Dict[int, Tuple[str, float]] = {}
+        self._ids = itertools.count()
+        self._bar: Optional[tqdm] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _describe(self) -> str:
+        now = time.monotonic()
+        waits = sorted(self._waits.values(), key=lambda item: item[1])
+        shown = ", ".join(
+            f"{label} {max(math.ceil(ends_at - now), 0)}s" for label, ends_at in waits[:PROGRESS_MAX_SHOWN]
+        )
+        if len(waits) > PROGRESS_MAX_SHOWN:
+            shown += f" (+{len(waits) - PROGRESS_MAX_SHOWN} more)"
+        return f"Waiting: {shown}"
+
+    async def _run(self) -> None:
+        self._bar = tqdm(bar_format="{desc}", dynamic_ncols=True, colour="blue", leave=False)
+        try:
+            while self._waits:
+                self._bar.set_description_str(self._describe())
+                await asyncio.sleep(self.refresh_interval)
+        finally:
+            self._bar.close()
+            self._bar = None
+
+    async def wait(self, delay: float, label: Optional[str] = None) -> None:
+        wait_id = next(self._ids)
+        self._waits[wait_id] = (label or "sleep", time.monotonic() + delay)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            del self._waits[wait_id]
+
+
+dashboard = WaitDashboard()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# core has to be imported before its submodules, they import each other through it
+import core  # noqa: E402,F401
@@ -0,0 +1,125 @@
+import asyncio
+from dataclasses import replace
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from eth_abi import decode, encode
+from web3 import AsyncWeb3
+
+from core.chains.arbitrum import ARBITRUM_CHAIN
+from core.constants import MULTICALL_AGGREGATE3_SELECTOR, MULTICALL_GET_ETH_BALANCE_SELECTOR
+from core.multicall import get_balances
+from core.sessions import sessions
+
+TOKEN_BALANCE_OFFSET = 10 ** 6
+
+
+def _balance(address: str) -> int:
+    return int(address[-4:], 16)
+
+
+class RpcStub:
+    """
+    Local JSON-RPC node: native balances are the last two bytes of the address, token balances are the same plus
+    TOKEN_BALANCE_OFFSET. Multicall3 and batch requests can be turned off like on nodes that don't support them.
+    """
+
+    def __init__(self, multicall: bool = True, batch: bool = True) -> None:
+        self.multicall = multicall
+        self.batch = batch
+        self.http_requests = 0
+        self.methods = []
+
+    def _error(self, request_id, message: str) -> dict:
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32000, "message": message}}
+
+    def _aggregate3(self, data: bytes) -> str:
+        (calls,) = decode(["(address,bool,bytes)[]"], data)
+        results = []
+        for _, _, call_data in calls:
+            (address,) = decode(["address"], call_data[4:])
+            is_native = "0x" + call_data[:4].hex() == MULTICALL_GET_ETH_BALANCE_SELECTOR
+            balance = _balance(address) + (0 if is_native else TOKEN_BALANCE_OFFSET)
+            results.append((True, encode(["uint256"], [balance])))
+        return "0x" + encode(["(bool,bytes)[]"], [results]).hex()
+
+    def _handle(self, request: dict) -> dict:
+        method, params = request["method"], request["params"]
+        self.methods.append(method)
+        if method == "eth_chainId":
+            result = hex(ARBITRUM_CHAIN.chain_id)
+        elif method == "eth_getBalance":
+            result = hex(_balance(params[0]))
+        elif method == "eth_call":
+            data = bytes.fromhex(params[0]["data"][2:])
+            if "0x" + data[:4].hex() == MULTICALL_AGGREGATE3_SELECTOR:
+                if not self.multicall:
+                    return self._error(request["id"], "execution reverted")
+                result = self._aggregate3(data[4:])
+            else:
+                (address,) = decode(["address"], data[4:])
+                result = "0x" + encode(["uint256"], [_balance(address) + TOKEN_BALANCE_OFFSET]).hex()
+        else:
+            return self._error(request["id"], f"unexpected method {method}")
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        body = await request.json()
+        if isinstance(body, list):
+            if not self.batch:
+                return web.json_response(self._error(None, "batch requests are not supported"))
+            return web.json_response([self._handle(item) for item in body])
+        return web.json_response(self._handle(body))
+
+
+def _read_balances(stub: RpcStub, name: str, wallets: int, batch_size: int = 500):
+    async def main():
+        app = web.Application()
+        app.router.add_post("/", stub.handle)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            # its own chain name, so the endpoint pool and web3 instance of another test aren't reused
+            chain = replace(ARBITRUM_CHAIN, name=name, rpcs=[str(server.make_url("/"))])
+            tokens = list(chain.tokens.values())
+            addresses = [AsyncWeb3.to_checksum_address(f"0x{index:040x}") for index in range(1, wallets + 1)]
+            requests = [(address, token) for address in addresses for token in tokens]
+            balances = await get_balances(chain=chain, requests=requests, batch_size=batch_size)
+            return requests, balances
+        finally:
+            await sessions.close()
+            await server.close()
+
+    requests, balances = asyncio.run(main())
+    expected = [_balance(address) + (0 if token.is_native else TOKEN_BALANCE_OFFSET) for address, token in requests]
+    return balances, expected
+
+
+def test_balances_are_read_with_one_aggregate3_call_per_chunk():
+    stub = RpcStub()
+    balances, expected = _read_balances(stub, name="multicall-aggregate3", wallets=300, batch_size=500)
+
+    assert balances == expected
+    chunks = -(-len(expected) // 500)
+    assert stub.methods.count("eth_call") == chunks
+    assert "eth_getBalance" not in stub.methods
+
+
+def test_batch_request_is_used_without_multicall3():
+    stub = RpcStub(multicall=False)
+    balances, expected = _read_balances(stub, name="multicall-batch", wallets=100, batch_size=500)
+
+    assert balances == expected
+    # the reverted aggregate3 call, then one batch request with every balance
+    assert stub.methods.count("eth_getBalance") == 100
+    assert stub.http_requests <= 4
+
+
+def test_single_calls_are_used_when_batches_are_rejected():
+    stub = RpcStub(multicall=False, batch=False)
+    balances, expected = _read_balances(stub, name="multicall-single", wallets=20, batch_size=500)
+
+    assert balances == expected
+    assert stub.methods.count("eth_getBalance") == 20
+    assert stub.http_requests >= len(expected)
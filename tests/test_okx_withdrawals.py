@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import core.cex.okx as okx_module
+from config import WAIT_FOR_DEPOSIT_TIMEOUT
+from core import Client
+from core.arrivals import arrival_watcher
+from core.cex.okx import Okx, WithdrawalTracker
+from core.chains.base import BASE_CHAIN
+
+PRIVATE_KEY = "0x" + "11" * 32
+
+
+class FakeExchange:
+    """
+    Withdrawal history of a mocked okx account: every withdrawal is pending for `delay` seconds and then succeeds,
+    except the ids in `cancelled`.
+    """
+
+    markets = {"ETH/USDT": {}}
+
+    def __init__(self, delay: float, cancelled=()) -> None:
+        self.delay = delay
+        self.cancelled = set(cancelled)
+        self.created = {}
+        self.history_calls = 0
+        self.history_by_id_calls = 0
+
+    def add(self, withdrawal_id: str) -> None:
+        self.created[withdrawal_id] = time.monotonic()
+
+    def _state(self, withdrawal_id: str) -> str:
+        if time.monotonic() - self.created[withdrawal_id] < self.delay:
+            return "1"
+        return "-2" if withdrawal_id in self.cancelled else "2"
+
+    async def private_get_asset_withdrawal_history(self, params=None):
+        params = params or {}
+        if "wdId" in params:
+            self.history_by_id_calls += 1
+            return {"data": [{"wdId": params["wdId"], "state": self._state(params["wdId"])}]}
+
+        self.history_calls += 1
+        recent = sorted(self.created, key=self.created.get, reverse=True)
+        if "after" in params:
+            recent = [item for item in recent if self.created[item] < float(params["after"])]
+        limit = int(params.get("limit", 100))
+        return {
+            "data": [
+                {"wdId": item, "state": self._state(item), "ts": str(self.created[item])} for item in recent[:limit]
+            ]
+        }
+
+
+def _run(coro, exchange: FakeExchange):
+    okx_module._EXCHANGE = exchange
+    try:
+        return asyncio.run(coro)
+    finally:
+        okx_module._EXCHANGE = None
+
+
+def test_overlapping_withdrawals_share_history_polls():
+    exchange = FakeExchange(delay=0.2, cancelled={"7"})
+    tracker = WithdrawalTracker(poll_interval=0.05)
+
+    async def wallet(index: int) -> bool:
+        await asyncio.sleep(index * 0.001)
+        exchange.add(str(index))
+        return await tracker.wait_for_final_status(str(index), timeout=5)
+
+    async def main():
+        return await asyncio.gather(*[wallet(index) for index in range(250)])
+
+    results = _run(main(), exchange)
+
+    assert results.count(False) == 1 and results[7] is False
+    # one poller for everyone instead of one status request per wallet and tick
+    assert exchange.history_calls < 50
+    assert exchange.history_by_id_calls == 0
+
+
+def test_withdrawal_without_final_status_times_out():
+    exchange = FakeExchange(delay=60)
+    tracker = WithdrawalTracker(poll_interval=0.05)
+
+    async def main():
+        exchange.add("1")
+        return await tracker.wait_for_final_status("1", timeout=0.2)
+
+    assert _run(main(), exchange) is False
+
+
+def test_lost_deposit_doesnt_hang_the_wallet(monkeypatch):
+    timeouts = []
+
+    async def never_arrives(chain, address, token, initial_balance, timeout=None):
+        timeouts.append(timeout)
+        return False
+
+    monkeypatch.setattr(arrival_watcher, "wait_for_arrival", never_arrives)
+    client = Client(private_key=PRIVATE_KEY, chain=BASE_CHAIN)
+    exchange = FakeExchange(delay=0)
+
+    async def main():
+        exchange.add("1")
+        monkeypatch.setattr(okx_module, "withdrawal_tracker", WithdrawalTracker(poll_interval=0.05))
+        return await Okx(client=client)._watch_for_delivery(withdrawal_id="1", initial_balance=0)
+
+    assert _run(main(), exchange) is False
+    assert timeouts == [WAIT_FOR_DEPOSIT_TIMEOUT]
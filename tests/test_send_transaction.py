@@ -0,0 +1,169 @@
+import asyncio
+from dataclasses import replace
+from typing import List, Optional
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from eth_utils import keccak
+from web3 import AsyncWeb3
+
+from core import Client
+from core.chains.bsc import BSC_CHAIN
+from core.nonce import nonce_manager
+from core.sessions import sessions
+
+PRIVATE_KEY = "0x" + "22" * 32
+RECEIVER = AsyncWeb3.to_checksum_address("0x" + "33" * 20)
+
+
+class NodeStub:
+    """
+    Local JSON-RPC node whose `eth_sendRawTransaction` answers with `send_error` (if set). With `remember` the
+    transaction can be looked up by its hash afterwards, like one the node got before.
+    """
+
+    def __init__(self, send_error: Optional[str] = None, remember: bool = True, pending_nonce: int = 7) -> None:
+        self.send_error = send_error
+        self.remember = remember
+        self.pending_nonce = pending_nonce
+        self.methods: List[str] = []
+        self.sent: List[str] = []
+        self.known = {}
+
+    def _handle(self, request: dict) -> dict:
+        method, params = request["method"], request["params"]
+        self.methods.append(method)
+        response = {"jsonrpc": "2.0", "id": request["id"]}
+        if method == "eth_chainId":
+            response["result"] = hex(BSC_CHAIN.chain_id)
+        elif method == "eth_gasPrice":
+            response["result"] = hex(3 * 10 ** 9)
+        elif method == "eth_estimateGas":
+            response["result"] = hex(21000)
+        elif method == "eth_getTransactionCount":
+            response["result"] = hex(self.pending_nonce)
+        elif method == "eth_sendRawTransaction":
+            tx_hash = "0x" + keccak(hexstr=params[0]).hex()
+            self.sent.append(tx_hash)
+            if self.remember:
+                self.known[tx_hash] = {"hash": tx_hash, "nonce": hex(self.pending_nonce)}
+            if self.send_error is not None:
+                response["error"] = {"code": -32000, "message": self.send_error}
+            else:
+                response["result"] = tx_hash
+        elif method == "eth_getTransactionByHash":
+            response["result"] = self.known.get(params[0])
+        else:
+            response["error"] = {"code": -32601, "message": f"unexpected method {method}"}
+        return response
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.json_response(self._handle(await request.json()))
+
+
+def _send(stub: NodeStub, name: str):
+    async def main():
+        app = web.Application()
+        app.router.add_post("/", stub.handle)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            # its own chain name, so the endpoint pool and web3 instance of another test aren't reused
+            chain = replace(BSC_CHAIN, name=name, rpcs=[str(server.make_url("/"))])
+            client = Client(private_key=PRIVATE_KEY, chain=chain)
+            nonce_manager.reset(address=client.address, chain_id=chain.chain_id)
+            tx_hash = await client.send_transaction(to=RECEIVER, value=1)
+            next_nonce = await nonce_manager.get_nonce(w3=client.w3, address=client.address, chain_id=chain.chain_id)
+            return tx_hash, next_nonce
+        finally:
+            await sessions.close()
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def test_already_known_transaction_counts_as_sent():
+    stub = NodeStub(send_error="already known")
+    tx_hash, next_nonce = _send(stub, name="send-already-known")
+
+    assert AsyncWeb3.to_hex(tx_hash) == stub.sent[0]
+    assert stub.methods.count("eth_sendRawTransaction") == 1
+    assert next_nonce == stub.pending_nonce + 1
+    # the chain id of the transaction comes from the Chain model, the node is never asked for it
+    assert "eth_chainId" not in stub.methods
+
+
+def test_nonce_too_low_of_a_known_transaction_counts_as_sent():
+    stub = NodeStub(send_error="nonce too low")
+    tx_hash, _ = _send(stub, name="send-nonce-too-low-known")
+
+    assert AsyncWeb3.to_hex(tx_hash) == stub.sent[0]
+    assert stub.methods.count("eth_sendRawTransaction") == 1
+
+
+def test_nonce_too_low_of_an_unknown_transaction_is_not_sent_again():
+    stub = NodeStub(send_error="nonce too low", remember=False)
+    tx_hash, _ = _send(stub, name="send-nonce-too-low-unknown")
+
+    assert tx_hash is None
+    assert stub.methods.count("eth_sendRawTransaction") == 1
+
+
+def _broadcast_with_failover(stub: NodeStub, name: str, first_broadcasts: bool):
+    """
+    Sends a signed transaction through a pool whose first endpoint fails with a 502 (after broadcasting it to the
+    network, which `stub` then knows, if `first_broadcasts`) and whose second endpoint is `stub`.
+    """
+    async def failing_endpoint(request: web.Request) -> web.Response:
+        tx_hash = "0x" + keccak(hexstr=(await request.json())["params"][0]).hex()
+        if first_broadcasts:
+            stub.known[tx_hash] = {"hash": tx_hash}
+        return web.Response(status=502)
+
+    async def main():
+        servers = []
+        for handler in (failing_endpoint, stub.handle):
+            app = web.Application()
+            app.router.add_post("/", handler)
+            servers.append(TestServer(app))
+            await servers[-1].start_server()
+        try:
+            chain = replace(BSC_CHAIN, name=name, rpcs=[str(server.make_url("/")) for server in servers])
+            client = Client(private_key=PRIVATE_KEY, chain=chain)
+            signed_tx = client.w3.eth.account.sign_transaction(
+                {"to": RECEIVER, "value": 1, "gas": 21000, "gasPrice": 1, "nonce": 0, "chainId": chain.chain_id},
+                PRIVATE_KEY,
+            )
+            tx_hash = await client.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+            return AsyncWeb3.to_hex(tx_hash), AsyncWeb3.to_hex(signed_tx.hash)
+        finally:
+            await sessions.close()
+            for server in servers:
+                await server.close()
+
+    return asyncio.run(main())
+
+
+def test_broadcast_that_failed_midway_is_not_sent_to_the_next_endpoint():
+    stub = NodeStub()
+    tx_hash, signed_hash = _broadcast_with_failover(stub, name="failover-broadcasted", first_broadcasts=True)
+
+    assert tx_hash == signed_hash
+    assert "eth_getTransactionByHash" in stub.methods
+    assert stub.sent == []
+
+
+def test_broadcast_that_never_left_the_failed_endpoint_fails_over():
+    stub = NodeStub()
+    tx_hash, signed_hash = _broadcast_with_failover(stub, name="failover-unknown", first_broadcasts=False)
+
+    assert tx_hash == signed_hash
+    assert stub.sent == [signed_hash]
+
+
+def test_resend_answered_with_already_known_counts_as_sent():
+    stub = NodeStub(send_error="already known", remember=False)
+    tx_hash, signed_hash = _broadcast_with_failover(stub, name="failover-already-known", first_broadcasts=False)
+
+    assert tx_hash == signed_hash
+    assert stub.sent == [signed_hash]
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from logger import TelegramSink
+
+TOKEN = "123:test"
+
+
+class BotApiStub:
+    """
+    Local Bot API: records every sendMessage and answers the first `rate_limited` of them with 429.
+    """
+
+    def __init__(self, rate_limited: int = 0, retry_after: float = 0) -> None:
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.requests = []
+        self.messages = []
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.requests.append((time.monotonic(), payload))
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return web.json_response(
+                {"ok": False, "error_code": 429, "parameters": {"retry_after": self.retry_after}}, status=429
+            )
+        self.messages.append(payload)
+        return web.json_response({"ok": True})
+
+    async def start(self) -> TestServer:
+        app = web.Application()
+        app.router.add_post(f"/bot{TOKEN}/sendMessage", self.send_message)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+
+def _make_sink(server: TestServer, chat_ids=(1,), **kwargs) -> TelegramSink:
+    return TelegramSink(
+        token=TOKEN,
+        chat_ids=list(chat_ids),
+        api_url=str(server.make_url("")).rstrip("/"),
+        digest_interval=kwargs.pop("digest_interval", 0.05),
+        send_interval=kwargs.pop("send_interval", 0),
+        **kwargs,
+    )
+
+
+def test_full_queue_drops_the_oldest_messages():
+    stub = BotApiStub()
+
+    async def main():
+        server = await stub.start()
+        sink = _make_sink(server, queue_size=3)
+        for index in range(5):
+            sink(f"message {index}")
+        await sink.flush()
+        await server.close()
+
+    asyncio.run(main())
+
+    assert len(stub.messages) == 1
+    assert stub.messages[0]["text"].splitlines() == [
+        "🟡 2 messages were dropped",
+        "message 2",
+        "message 3",
+        "message 4",
+    ]
+
+
+def test_messages_are_sent_as_one_digest_per_chat():
+    stub = BotApiStub()
+
+    async def main():
+        server = await stub.start()
+        sink = _make_sink(server, chat_ids=(1, 2))
+        for index in range(50):
+            sink(f"message {index}")
+        # the caller only queues, nothing is sent before the digest interval
+        await asyncio.sleep(0)
+        assert not stub.requests
+        await asyncio.sleep(0.3)
+        await sink.flush()
+        await server.close()
+
+    asyncio.run(main())
+
+    assert [message["chat_id"] for message in stub.messages] == [1, 2]
+    assert stub.messages[0]["text"] == "\n".join(f"message {index}" for index in range(50))
+
+
+def test_rate_limited_request_is_retried_after_retry_after():
+    stub = BotApiStub(rate_limited=1, retry_after=0.2)
+
+    async def main():
+        server = await stub.start()
+        sink = _make_sink(server)
+        sink("message")
+        await sink.flush()
+        await server.close()
+
+    asyncio.run(main())
+
+    assert len(stub.requests) == 2
+    assert stub.requests[1][0] - stub.requests[0][0] >= 0.2
+    assert [message["text"] for message in stub.messages] == ["message"]
@@ -2,24 +2,21 @@ import asyncio
 import random
 from typing import List, Optional, Dict
 
-import aiohttp
-from tqdm import tqdm
-from web3 import AsyncWeb3
-from web3.types import Wei
-
-from config import PROXY_CHANGE_IP_URL, ETHEREUM_RPC_ENDPOINT
+from config import PROXY_CHANGE_IP_URL
 from core.chains import *
+from core.models.chain import Chain
 from core.models.token import Token
+from core.sessions import sessions
 from logger import logger
+from progress import dashboard
 
 
 async def change_ip() -> None:
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url=PROXY_CHANGE_IP_URL) as response:
-            if response.status == 200:
-                logger.debug(f"Successfully changed ip address")
-            else:
-                logger.warning(f"Couldn't change ip address")
+    async with sessions.get_session().get(url=PROXY_CHANGE_IP_URL) as response:
+        if response.status == 200:
+            logger.debug(f"Successfully changed ip address")
+        else:
+            logger.warning(f"Couldn't change ip address")
 
 
 def read_from_txt(file_path: str):
@@ -36,17 +33,16 @@ def custom_round(number: float, decimals: int) -> float:
     return int(number * 10 ** decimals) / 10 ** decimals
 
 
-async def sleep(delay_range: List[int], send_message: bool = True, pr_bar: bool = True) -> None:
+async def sleep(
+        delay_range: List[int], send_message: bool = True, pr_bar: bool = True, label: Optional[str] = None
+) -> None:
     delay = random.randint(*delay_range)
 
     if send_message:
         logger.info(f"Sleeping for {delay} seconds...")
 
     if pr_bar:
-        with tqdm(total=delay, desc="Waiting", unit="s", dynamic_ncols=True, colour="blue") as pbar:
-            for _ in range(delay):
-                await asyncio.sleep(delay=1)
-                pbar.update(1)
+        await dashboard.wait(delay=delay, label=label)
     else:
         await asyncio.sleep(delay=delay)
 
@@ -55,21 +51,9 @@ def find_token(tokens: Dict[str, Token], symbol: str) -> Optional[Token]:
     return tokens.get(symbol)
 
 
-def get_chain_by_name(name: str):
-    chains = [
-        ARBITRUM_CHAIN, BASE_CHAIN, BSC_CHAIN, OPTIMISM_CHAIN, POLYGON_CHAIN, LINEA_CHAIN, ZKERA_CHAIN, ETHEREUM_CHAIN
-    ]
-    for chain in chains:
-        if chain.name == name:
-            return chain
-
-
-def get_chains():
-    return [
-        ARBITRUM_CHAIN, BASE_CHAIN, BSC_CHAIN, OPTIMISM_CHAIN, POLYGON_CHAIN, LINEA_CHAIN, ZKERA_CHAIN, ETHEREUM_CHAIN
-    ]
+def get_chain_by_name(name: str) -> Optional[Chain]:
+    return CHAINS.get(name)
 
 
-async def get_chain_gas_fee() -> Wei:
-    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(ETHEREUM_RPC_ENDPOINT))
-    return await w3.eth.gas_price
+def get_chains() -> List[Chain]:
+    return list(CHAINS.values())